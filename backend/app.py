@@ -1,27 +1,30 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request, g
 from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from config import Config
 from models import db
 from flask_jwt_extended import JWTManager
-from routes.auth import auth_bp, bcrypt
+from routes.auth import auth_bp
 from routes.journal import journal_bp
 from routes.analytics import analytics_bp
 from routes.events import events_bp
+import hmac
 import logging
 import os
+import random
+import time
 from datetime import datetime
+from functools import wraps
+from utils import hashing, user_cache, revocation, session_sweeper, mailer, metrics, profiling, db_engine, read_replica, partitioning, textstore, json_provider, http_compression, admission, vector_index, mood_stats, sentiment
+from utils.schema import ensure_schema
+from utils.logging_setup import configure_logging, DroppingQueueHandler
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler("app.log"),
-        logging.StreamHandler()
-    ]
-)
+# Fork the password hashing workers before any thread exists (see utils/hashing.py)
+hashing.start_pool(Config)
+
+# Configure logging (queued, rotated; see utils/logging_setup.py)
+configure_logging(Config)
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
@@ -55,8 +58,8 @@ CORS(
     app,
     resources={r"/*": {"origins": origins}},
     supports_credentials=True,
-    allow_headers=["Content-Type", "Authorization"],
-    expose_headers=["Content-Type", "Authorization"]
+    allow_headers=["Content-Type", "Authorization", read_replica.LAST_WRITE_HEADER],
+    expose_headers=["Content-Type", "Authorization", read_replica.LAST_WRITE_HEADER]
 )
 
 # Rate limiting
@@ -76,10 +79,21 @@ def skip_preflight_and_local():
         return False
 
 # Initialize extensions
-bcrypt.init_app(app)
+json_provider.init_app(app)
+http_compression.init_app(app)
+metrics.init_app(app)
+profiling.init_app(app)
+hashing.init_app(app)
+user_cache.init_app(app)
+db_engine.init_app(app)  # engine options must be set before db.init_app creates the engine
+read_replica.init_app(app)
 db.init_app(app)
 jwt = JWTManager(app)
 
+@jwt.token_in_blocklist_loader
+def check_token_revoked(jwt_header, jwt_payload):
+    return revocation.is_revoked(jwt_payload["jti"])
+
 # Register blueprints
 app.register_blueprint(auth_bp, url_prefix="/auth")
 app.register_blueprint(journal_bp, url_prefix="/journal")
@@ -96,6 +110,46 @@ def health_check():
         "version": "1.0.0"
     })
 
+def internal_only(view):
+    """Operator endpoints: a bearer INTERNAL_API_TOKEN when configured, otherwise loopback callers only."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        token = app.config.get("INTERNAL_API_TOKEN")
+        if token:
+            supplied = request.headers.get("Authorization", "").removeprefix("Bearer ")
+            allowed = hmac.compare_digest(supplied.encode(), token.encode())
+        else:
+            allowed = request.remote_addr in ("127.0.0.1", "::1")
+        if not allowed:
+            return jsonify({"error": "Not found"}), 404
+        return view(*args, **kwargs)
+    return wrapper
+
+# Internal cache statistics
+@app.route("/stats", methods=["GET"])
+@internal_only
+def stats():
+    return jsonify({
+        "user_cache": user_cache.stats(),
+        "revocation": revocation.stats(),
+        "session_sweeper": session_sweeper.stats(),
+        "mailer": mailer.stats(),
+        "read_replica": read_replica.stats(),
+        "partitioning": partitioning.stats(),
+        "textstore": textstore.stats(),
+        "http_compression": http_compression.stats(),
+        "admission": admission.stats(),
+        "vector_index": vector_index.stats(),
+        "mood_stats": mood_stats.stats(),
+        "logging": {"dropped_records": DroppingQueueHandler.dropped}
+    })
+
+# Prometheus metrics (summed across worker processes when METRICS_DIR is set)
+@app.route("/metrics", methods=["GET"])
+@internal_only
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
 # Root endpoint
 @app.route("/", methods=["GET"])
 def root():
@@ -104,6 +158,8 @@ def root():
         "version": "1.0.0",
         "endpoints": {
             "health": "/health",
+            "stats": "/stats",
+            "metrics": "/metrics",
             "auth": "/auth/*",
             "journal": "/journal/*",
             "analytics": "/analytics/*",
@@ -126,19 +182,45 @@ def internal_error(error):
 def ratelimit_handler(e):
     return jsonify({"error": "Rate limit exceeded. Please try again later."}), 429
 
-# Request logging middleware
+# Request logging middleware: errors are always logged, successes are sampled
 @app.before_request
-def log_request():
-    logger.info(f"{request.method} {request.path} - {request.remote_addr}")
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def log_request(response):
+    if response.status_code >= 400 or random.random() < app.config["LOG_REQUEST_SAMPLE_RATE"]:
+        duration_ms = round((time.perf_counter() - g.get("request_started", time.perf_counter())) * 1000, 1)
+        logger.info(
+            f"{request.method} {request.path} - {request.remote_addr} {response.status_code} {duration_ms}ms",
+            extra={
+                "method": request.method,
+                "path": request.path,
+                "status": response.status_code,
+                "duration_ms": duration_ms,
+                "remote_addr": request.remote_addr
+            }
+        )
+    return response
 
 # Initialize database
 with app.app_context():
     try:
-        db.create_all()
+        ensure_schema()
         logger.info("Database initialized successfully")
     except Exception as e:
         logger.error(f"Database initialization failed: {e}")
 
+revocation.init_app(app)
+session_sweeper.init_app(app)
+mailer.init_app(app)
+textstore.init_app(app)
+partitioning.init_app(app)
+sentiment.init_app(app)
+admission.init_app(app)
+vector_index.init_app(app)
+mood_stats.init_app(app)
+
 if __name__ == "__main__":
     logger.info("Starting Mental Health Tracker API...")
     port = int(os.environ.get("PORT", 5000))
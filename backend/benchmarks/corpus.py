@@ -0,0 +1,413 @@
+"""Synthetic journal corpus generator for scale testing.
+
+Writes users and journal_entries straight to the database with bulk inserts
+(executemany on SQLite, COPY on PostgreSQL), bypassing the API and sentiment
+inference. Output is deterministic for a given --seed and set of options:
+every user draws from its own RNG, so the corpus does not depend on batch
+size or insert order.
+
+Each user gets an activity level, a baseline mood and volatility, a set of
+favourite tags and an active period. Entries follow the user's mood (with
+sentiment labels and vocabulary that match it), cluster in the morning and
+evening, and have log-normally distributed lengths.
+
+Throughput is bounded by the single inserting connection, not by generation.
+Measured on one core shared with the database server: generation ~55k rows/s
+per worker; SQLite ~50k rows/s end to end; PostgreSQL ~24k rows/s end to end.
+COPY alone ingests ~45k rows/s into journal_entries with its five indexes,
+and ~70k rows/s with the secondary indexes dropped, which costs more to
+rebuild than it saves. So 100k rows/s is not reached on either backend. That
+would need several COPY connections on a multi-core server, which this tool
+does not open. Plan on ~1M entries per 20-40 s per core.
+
+Usage (from backend/; uses DATABASE_URL like the app):
+    python benchmarks/corpus.py --users 10000 --entries-per-user 100 --seed 1
+    python benchmarks/corpus.py --users 1000 --activity zipf --length-median 80 --days 730
+    python benchmarks/corpus.py --users 1000 --dry-run      # generation speed only
+"""
+import argparse
+import io
+import itertools
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+COMMON_WORDS = (
+    "today i felt the a and to of it was with my at work home after before again really "
+    "just bit more less day night morning evening week time people talked thought went "
+    "made tried still maybe think need want got had been some little lot"
+).split()
+POSITIVE_WORDS = (
+    "happy calm grateful proud hopeful relaxed rested excited good great lovely sunny "
+    "laughed progress energy friends walk finished enjoyed peaceful"
+).split()
+NEGATIVE_WORDS = (
+    "anxious stressed tired lonely overwhelmed sad angry worried exhausted headache "
+    "deadline argument cried restless frustrated nervous pressure bad"
+).split()
+NEUTRAL_WORDS = (
+    "meeting coffee lunch errands emails commute reading cooking cleaning shopping "
+    "call weather news train plans routine"
+).split()
+BASE_TAGS = ["work", "family", "health", "sleep", "exercise", "friends", "anxiety", "gratitude",
+             "study", "travel", "food", "therapy", "music", "nature", "money", "relationships"]
+# Relative likelihood of writing at each hour of the day: morning and late-evening peaks
+HOUR_WEIGHTS = [1, 0.5, 0.3, 0.2, 0.2, 0.5, 2, 5, 6, 4, 2, 2, 3, 2, 2, 2, 2, 3, 4, 5, 7, 9, 8, 4]
+HOURS = list(range(24))
+SENTIMENTS = ("POSITIVE", "NEGATIVE", "NEUTRAL")
+STREAM_WORDS = 200_000
+ENTRY_COLUMNS = ("user_id", "text", "sentiment", "score", "mood_rating", "tags", "timestamp", "updated_at")
+USER_COLUMNS = ("username", "email", "password", "created_at", "is_active")
+EPOCH = datetime(1970, 1, 1)
+
+
+def tag_vocabulary(size: int) -> List[str]:
+    return (BASE_TAGS + [f"topic{i}" for i in range(max(0, size - len(BASE_TAGS)))])[:size]
+
+
+class TextStream:
+    """A long run of generated words for one sentiment; entries are slices of it.
+
+    Slicing at precomputed word boundaries costs the same for any entry
+    length, which keeps text generation from dominating the load time. With
+    STREAM_WORDS words per stream, two entries rarely share a slice.
+    """
+
+    def __init__(self, rng: random.Random, flavour: List[str]):
+        # About a quarter of the words carry the sentiment
+        words = [rng.choice(flavour) if rng.random() < 0.25 else rng.choice(COMMON_WORDS)
+                 for _ in range(STREAM_WORDS)]
+        self.text = " ".join(words)
+        self.starts = [0] * (STREAM_WORDS + 1)
+        offset = 0
+        for i, word in enumerate(words):
+            self.starts[i] = offset
+            offset += len(word) + 1
+        self.starts[STREAM_WORDS] = offset
+
+    def slice(self, start_word: int, words: int) -> str:
+        return self.text[self.starts[start_word]:self.starts[start_word + words] - 1]
+
+
+def text_streams(seed: int) -> Dict[str, TextStream]:
+    rng = random.Random(seed)
+    return {sentiment: TextStream(rng, flavour) for sentiment, flavour in
+            (("POSITIVE", POSITIVE_WORDS), ("NEGATIVE", NEGATIVE_WORDS), ("NEUTRAL", NEUTRAL_WORDS))}
+
+
+class UserProfile:
+    """Per-user parameters; all drawn from the user's own RNG."""
+
+    def __init__(self, index: int, opts: argparse.Namespace, tags: List[str], now: datetime):
+        self.rng = random.Random(opts.seed * 1_000_003 + index)
+        rng = self.rng
+        self.index = index
+        self.username = f"{opts.prefix}{index}"
+
+        if opts.activity == "uniform":
+            self.entry_count = opts.entries_per_user
+        elif opts.activity == "zipf":
+            # Pareto tail: most users write a little, a few write a lot
+            self.entry_count = int(opts.entries_per_user * 0.5 * rng.paretovariate(1.5))
+        else:
+            self.entry_count = int(rng.lognormvariate(math.log(max(opts.entries_per_user, 1)), 0.8))
+        self.entry_count = min(self.entry_count, opts.max_entries_per_user)
+
+        self.baseline_mood = min(9.0, max(2.0, rng.gauss(6.0, 1.5)))
+        self.volatility = rng.uniform(0.5, 2.0)
+        self.tags = rng.sample(tags, min(len(tags), rng.randint(3, 8)))
+        self.tag_cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(self.tags))))
+
+        active_days = rng.uniform(0.1, 1.0) * opts.days
+        self.end = now - timedelta(days=rng.uniform(0, opts.days - active_days))
+        self.start = self.end - timedelta(days=active_days)
+        self.created_at = self.start - timedelta(hours=rng.uniform(0, 48))
+
+
+def entry_rows(profile: UserProfile, user_id: int, opts: argparse.Namespace,
+               streams: Dict[str, TextStream]) -> List[Tuple]:
+    rng = profile.rng
+    random_ = rng.random
+    gauss = rng.gauss
+    count = profile.entry_count
+    start = (profile.start - EPOCH).total_seconds()
+    # Whole days in the active window; the last one is cut off at profile.end
+    window_days = max(1, int((profile.end - profile.start).total_seconds() // 86400))
+    day_start = start - start % 86400
+    end = (profile.end - EPOCH).total_seconds()
+    length_mu = math.log(opts.length_median)
+    length_max = min(opts.length_max, STREAM_WORDS - 1)
+    max_tags = opts.max_tags
+    tags, tag_cum_weights = profile.tags, profile.tag_cum_weights
+    choices = rng.choices
+
+    days = sorted(int(random_() * window_days) for _ in range(count))
+    hours = rng.choices(HOURS, HOUR_WEIGHTS, k=count)
+    rows = []
+    drift = 0.0
+    for day, hour in zip(days, hours):
+        # Slow random walk around the baseline so moods drift over weeks
+        drift = drift * 0.95 + gauss(0, 0.3)
+        mood = int(round(profile.baseline_mood + drift + gauss(0, profile.volatility)))
+        mood = 10 if mood > 10 else 1 if mood < 1 else mood
+
+        sentiment = "POSITIVE" if mood >= 7 else "NEGATIVE" if mood <= 4 else "NEUTRAL"
+        stream = streams[sentiment]
+        if random_() < 0.1:
+            sentiment = SENTIMENTS[int(random_() * 3)]
+
+        words = min(length_max, max(3, int(rng.lognormvariate(length_mu, 0.6))))
+        text = stream.slice(int(random_() * (STREAM_WORDS - words)), words).capitalize() + "."
+
+        tag_count = int(random_() * (max_tags + 1))
+        # dict.fromkeys de-duplicates in draw order (a set would depend on PYTHONHASHSEED)
+        entry_tags = ",".join(dict.fromkeys(choices(tags, cum_weights=tag_cum_weights, k=tag_count))) if tag_count else None
+
+        ts = day_start + day * 86400 + hour * 3600 + random_() * 3600
+        if ts > end or ts < start:
+            ts = start + random_() * (end - start)
+        timestamp = EPOCH + timedelta(seconds=ts)
+        rows.append((user_id, text, sentiment, round(0.55 + random_() * 0.44, 4), mood, entry_tags,
+                     timestamp, timestamp))
+    return rows
+
+
+# ------------------------------------------------------------- writers ---
+
+def _copy_value(value) -> str:
+    if value is None:
+        return "\\N"
+    if isinstance(value, str):
+        return value.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+    if isinstance(value, datetime):
+        return value.isoformat(" ")
+    return str(value)
+
+
+class Writer:
+    """Generic DB-API executemany writer (used for dialects without a fast path).
+
+    encode() runs in the generator processes, so per-dialect formatting work
+    is spread across --workers; insert() runs in the parent.
+    """
+
+    placeholder = "%s"
+
+    def __init__(self, engine):
+        self.conn = engine.raw_connection()
+
+    @staticmethod
+    def encode(rows: List[Tuple]):
+        return rows
+
+    @classmethod
+    def encode_entries(cls, rows: List[Tuple]):
+        return cls.encode(rows)
+
+    def insert(self, table: str, columns: Tuple[str, ...], payload) -> None:
+        placeholders = ", ".join([self.placeholder] * len(columns))
+        cursor = self.conn.cursor()
+        cursor.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", payload)
+        cursor.close()
+
+    def user_ids(self, usernames: List[str]) -> List[int]:
+        cursor = self.conn.cursor()
+        ids = {}
+        for i in range(0, len(usernames), 500):
+            chunk = usernames[i:i + 500]
+            cursor.execute(
+                f"SELECT username, id FROM users WHERE username IN ({', '.join([self.placeholder] * len(chunk))})",
+                chunk)
+            ids.update(cursor.fetchall())
+        cursor.close()
+        return [ids[name] for name in usernames]
+
+    def commit(self) -> None:
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+class SQLiteWriter(Writer):
+    placeholder = "?"
+
+    def __init__(self, engine):
+        super().__init__(engine)
+        cursor = self.conn.cursor()
+        # Bulk load only: a crash mid-load leaves a corpus you would regenerate anyway
+        cursor.execute("PRAGMA synchronous=OFF")
+        cursor.execute("PRAGMA cache_size=-200000")
+        cursor.close()
+
+    @staticmethod
+    def encode(rows):
+        # Store datetimes the way SQLAlchemy's DateTime type does rather than
+        # relying on sqlite3's deprecated default adapter
+        return [tuple(v.isoformat(" ", "microseconds") if isinstance(v, datetime) else v for v in row)
+                for row in rows]
+
+    @staticmethod
+    def encode_entries(rows):
+        # Same as encode(), unrolled for the entry layout where the last two columns are the datetimes
+        return [row[:6] + (row[6].isoformat(" ", "microseconds"),) * 2 for row in rows]
+
+
+class PostgresWriter(Writer):
+    @staticmethod
+    def encode(rows):
+        return "".join("\t".join(_copy_value(v) for v in row) + "\n" for row in rows)
+
+    @staticmethod
+    def encode_entries(rows):
+        # Entry text and tags are built from the fixed word and tag lists, which
+        # hold no tab, newline or backslash, so only NULL tags need encoding
+        null = "\\N"
+        lines = []
+        for user_id, text, sentiment, score, mood, tags, timestamp, _ in rows:
+            ts = timestamp.isoformat(" ")
+            lines.append(f"{user_id}\t{text}\t{sentiment}\t{score}\t{mood}\t{null if tags is None else tags}\t{ts}\t{ts}\n")
+        return "".join(lines)
+
+    def insert(self, table, columns, payload):
+        if not isinstance(payload, str):
+            payload = self.encode(payload)
+        cursor = self.conn.cursor()
+        cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT text)", io.StringIO(payload))
+        cursor.close()
+
+
+def make_writer(engine) -> Writer:
+    if engine.dialect.name == "sqlite":
+        return SQLiteWriter(engine)
+    if engine.dialect.name == "postgresql":
+        return PostgresWriter(engine)
+    return Writer(engine)
+
+
+# -------------------------------------------------------- generation ---
+
+_job: Dict = {}
+
+
+def _generate_chunk(chunk: Tuple[int, List[int]]):
+    """Build and encode the entries of users [first, first + len(ids)); runs in worker processes."""
+    first, ids = chunk
+    opts, tags, now, streams, encode = _job["opts"], _job["tags"], _job["now"], _job["streams"], _job["encode"]
+    rows = []
+    for offset, user_id in enumerate(ids):
+        rows.extend(entry_rows(UserProfile(first + offset, opts, tags, now), user_id, opts, streams))
+    return len(rows), encode(rows)
+
+
+def generate(engine, opts: argparse.Namespace, password_hash: str, log=print) -> Dict[str, float]:
+    """Generate the corpus into `engine`; with opts.dry_run rows are built but not written."""
+    now = opts.now or datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    tags = tag_vocabulary(opts.tag_vocab)
+    writer = None if opts.dry_run else make_writer(engine)
+    _job.update(opts=opts, tags=tags, now=now, streams=text_streams(opts.seed),
+                encode=(writer.encode_entries if writer else SQLiteWriter.encode_entries))
+    totals = {"users": 0, "entries": 0}
+    started = time.perf_counter()
+
+    # Users first, so entry generation can run in parallel with known ids
+    ids: List[int] = []
+    for batch_start in range(0, opts.users, 5000):
+        profiles = [UserProfile(i, opts, tags, now) for i in range(batch_start, min(opts.users, batch_start + 5000))]
+        if writer is None:
+            ids.extend(range(batch_start + 1, batch_start + 1 + len(profiles)))
+            continue
+        writer.insert("users", USER_COLUMNS, writer.encode(
+            [(p.username, f"{p.username}@example.com", password_hash, p.created_at, True) for p in profiles]))
+        ids.extend(writer.user_ids([p.username for p in profiles]))
+    totals["users"] = len(ids)
+    if writer is not None:
+        writer.commit()
+
+    # Size chunks by expected entries so each insert is roughly --batch-size rows
+    per_chunk = max(1, opts.batch_size // max(1, opts.entries_per_user))
+    chunks = [(i, ids[i:i + per_chunk]) for i in range(0, len(ids), per_chunk)]
+    pool = None
+    if opts.workers > 1:
+        import multiprocessing
+        # fork: workers inherit _job instead of re-importing the app
+        pool = multiprocessing.get_context("fork").Pool(opts.workers)
+        results = pool.imap(_generate_chunk, chunks)
+    else:
+        results = map(_generate_chunk, chunks)
+
+    last_report = started
+    try:
+        for count, payload in results:
+            if writer is not None and count:
+                writer.insert("journal_entries", ENTRY_COLUMNS, payload)
+                writer.commit()
+            totals["entries"] += count
+            now_t = time.perf_counter()
+            if now_t - last_report > 5:
+                last_report = now_t
+                log(f"  {totals['entries']:,} entries ({totals['entries'] / (now_t - started):,.0f} rows/s)")
+    finally:
+        if pool is not None:
+            pool.terminate()
+        if writer is not None:
+            writer.close()
+    totals["seconds"] = time.perf_counter() - started
+    totals["rows_per_second"] = totals["entries"] / totals["seconds"] if totals["seconds"] else 0.0
+    return totals
+
+
+# ---------------------------------------------------------------- main ---
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--entries-per-user", type=int, default=100,
+                        help="median entries per user (exact with --activity uniform)")
+    parser.add_argument("--activity", choices=("lognormal", "zipf", "uniform"), default="lognormal")
+    parser.add_argument("--max-entries-per-user", type=int, default=20000)
+    parser.add_argument("--length-median", type=float, default=40, help="median words per entry")
+    parser.add_argument("--length-max", type=int, default=1500)
+    parser.add_argument("--tag-vocab", type=int, default=len(BASE_TAGS), help="number of distinct tags")
+    parser.add_argument("--max-tags", type=int, default=3, help="tags per entry, 0..N")
+    parser.add_argument("--days", type=float, default=365, help="timestamps fall within the last N days")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--prefix", default="synthetic_user_", help="username prefix (must not collide)")
+    parser.add_argument("--password", default="Synthetic1Password", help="password for every generated user")
+    parser.add_argument("--batch-size", type=int, default=20000, help="entry rows per insert")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="processes generating rows while the parent inserts")
+    parser.add_argument("--dry-run", action="store_true", help="generate rows without writing them")
+    parser.add_argument("--now", type=datetime.fromisoformat, default=None,
+                        help="newest possible timestamp, e.g. 2026-01-01 (default: start of today, UTC)")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    opts = build_parser().parse_args(argv)
+    os.environ.setdefault("BACKGROUND_JOBS_ENABLED", "false")
+    sys.path.insert(0, BACKEND_DIR)
+    from app import app
+    from models import db
+    from utils.hashing import hash_password
+
+    with app.app_context():
+        # One bcrypt hash shared by every synthetic user keeps generation I/O-bound
+        password_hash = hash_password(opts.password)
+        engine = db.engine
+        target = "nowhere (dry run)" if opts.dry_run else f"{engine.dialect.name} ({engine.url.render_as_string()})"
+        print(f"Generating {opts.users} users into {target}")
+        totals = generate(engine, opts, password_hash)
+    print(f"Done: {totals['users']} users, {totals['entries']} entries in {totals['seconds']:.1f}s "
+          f"({totals['rows_per_second']:,.0f} rows/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""Measure `import app` cost with `python -X importtime` and enforce a budget.
+
+Usage (from backend/):
+    python benchmarks/import_time.py --budget-ms 1500
+    python benchmarks/import_time.py --json import_time.json
+
+Fails (exit 1) when the cumulative import time of `app` exceeds the budget
+or when a module that must stay lazy (transformers, torch, numpy, ...) is
+imported. tests/test_import_time.py runs the second check under pytest.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+FORBIDDEN = ("transformers", "torch", "datasets", "pandas", "sklearn", "numpy")
+
+
+def measure(module: str = "app"):
+    """Import `module` in a fresh interpreter and return {package: (self_us, cumulative_us)}."""
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ)
+        env.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tmp, 'import_time.db')}")
+        env.setdefault("BCRYPT_LOG_ROUNDS", "4")
+        env["BACKGROUND_JOBS_ENABLED"] = "false"
+        env["LOG_FILE"] = ""  # no app.log left behind in backend/
+        env.setdefault("VECTOR_INDEX_DIR", os.path.join(tmp, "vectors"))
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=BACKEND_DIR, env=env, capture_output=True, text=True
+        )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+
+    timings = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+
+def heavy_modules(timings):
+    """Modules in `timings` from a package in FORBIDDEN."""
+    return sorted(name for name in timings if name.split(".")[0] in FORBIDDEN)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app")
+    parser.add_argument("--budget-ms", type=float, default=float(os.environ.get("IMPORT_BUDGET_MS", "1500")))
+    parser.add_argument("--runs", type=int, default=3, help="take the fastest of N runs to reduce noise")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    runs = [measure(args.module) for _ in range(args.runs)]
+    best = min(runs, key=lambda t: t[args.module][1])
+    total_ms = best[args.module][1] / 1000
+
+    print(f"import {args.module}: {total_ms:.1f} ms cumulative (budget {args.budget_ms:.0f} ms, best of {args.runs})")
+    print(f"{'cumulative ms':>14}  {'self ms':>8}  module")
+    for name, (self_us, cum_us) in sorted(best.items(), key=lambda kv: kv[1][1], reverse=True)[:args.top]:
+        print(f"{cum_us / 1000:>14.1f}  {self_us / 1000:>8.1f}  {name}")
+
+    heavy = heavy_modules(best)
+    failures = []
+    if total_ms > args.budget_ms:
+        failures.append(f"import time {total_ms:.1f} ms exceeds budget {args.budget_ms:.0f} ms")
+    if heavy:
+        failures.append(f"heavy modules imported eagerly: {', '.join(sorted({h.split('.')[0] for h in heavy}))}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "module": args.module,
+                "cumulative_ms": total_ms,
+                "budget_ms": args.budget_ms,
+                "heavy_modules": heavy,
+                "modules": {name: {"self_us": s, "cumulative_us": c} for name, (s, c) in best.items()},
+            }, f, indent=2)
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
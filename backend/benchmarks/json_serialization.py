@@ -0,0 +1,118 @@
+"""JSON serialization cost for entry-heavy responses (utils/json_provider.py).
+
+Seeds one user with --entries synthetic entries (benchmarks/corpus.py) into
+a temporary SQLite database, then measures:
+
+  encode    serializing already-loaded JournalEntry objects, for a 100-entry
+            page and for the full export:
+              legacy   [e.to_dict() ...] through Flask's default provider
+              stdlib   json_provider.entries_json()/export_json() with orjson off
+              orjson   the same with orjson
+  endpoint  GET /journal/entries?per_page=100 and GET /analytics/export
+            through the test client (query + ORM + encoding), stdlib vs orjson
+
+Reported numbers are medians of --repeat runs in milliseconds.
+
+Usage (from backend/):
+    python benchmarks/json_serialization.py --entries 2000 --repeat 30
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def _configure_env(tmpdir):
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmpdir, 'json_serialization.db')}"
+    os.environ.setdefault("BCRYPT_LOG_ROUNDS", "4")
+    os.environ["BACKGROUND_JOBS_ENABLED"] = "false"
+    os.environ["LOG_FILE"] = ""
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    sys.path.insert(0, BACKEND_DIR)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def timed(fn, repeat):
+    fn()  # warm up
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return round(statistics.median(samples) * 1000, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=2000)
+    parser.add_argument("--length-median", type=float, default=60, help="median words per entry")
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _configure_env(tmp)
+        import corpus
+        from flask.json.provider import DefaultJSONProvider
+        from flask_jwt_extended import create_access_token
+        from app import app
+        from models import db, JournalEntry, User
+        from utils import json_provider
+        from utils.hashing import hash_password
+
+        if json_provider.orjson is None:
+            print("orjson is not installed; only the stdlib encoder can be measured")
+
+        opts = corpus.build_parser().parse_args([
+            "--users", "1", "--entries-per-user", str(args.entries), "--activity", "uniform",
+            "--length-median", str(args.length_median), "--workers", "1", "--seed", "1",
+        ])
+        legacy = DefaultJSONProvider(app)
+        encoders = ["stdlib"] + (["orjson"] if json_provider.orjson is not None else [])
+        results = {"encode": {}, "endpoint": {}}
+
+        with app.app_context():
+            corpus.generate(db.engine, opts, hash_password("Benchmark1Password"), log=lambda *_: None)
+            user_id = db.session.query(User.id).scalar()
+            token = create_access_token(identity=str(user_id))
+            entries = JournalEntry.query.filter_by(user_id=user_id).order_by(JournalEntry.timestamp.desc()).all()
+            page = entries[:100]
+
+            for name, rows, new in (("page_100", page, json_provider.entries_json),
+                                    (f"export_{len(entries)}", entries, json_provider.export_json)):
+                timings = {"legacy": timed(lambda: legacy.dumps([e.to_dict() for e in rows]), args.repeat)}
+                for encoder in encoders:
+                    json_provider._settings["native"] = encoder == "orjson"
+                    timings[encoder] = timed(lambda: new(rows), args.repeat)
+                results["encode"][name] = timings
+
+        client = app.test_client()
+        headers = {"Authorization": f"Bearer {token}"}
+        for path in ("/journal/entries?per_page=100", "/analytics/export"):
+            timings = {}
+            for encoder in encoders:
+                json_provider._settings["native"] = encoder == "orjson"
+
+                def request():
+                    response = client.get(path, headers=headers)
+                    assert response.status_code == 200, response.data[:200]
+                timings[encoder] = timed(request, args.repeat)
+            results["endpoint"][path] = timings
+
+    for section, rows in results.items():
+        print(f"\n{section} (median ms)")
+        for name, timings in rows.items():
+            print(f"  {name:<32} " + "  ".join(f"{k} {v:>8.3f}" for k, v in timings.items()))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"entries": args.entries, **results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,415 @@
+"""End-to-end load test: mixed API workload against a real threaded HTTP server.
+
+Seeds synthetic users and journal entries into a throwaway database, serves
+the app with werkzeug's threaded server on a free local port, and runs
+`--concurrency` virtual users for `--duration` seconds. Each virtual user
+logs in once, then loops over a weighted mix of actions:
+
+  write      POST /journal/entry (publishes an SSE event)
+  dashboard  GET /analytics/overview, /analytics/trends, /analytics/insights
+  list       GET /journal/entries, then GET /journal/entry/<id>
+  search     GET /journal/search
+  export     GET /analytics/export
+
+`--sse-clients` EventSource-style readers stay connected to /events/stream
+for the whole run and measure write-to-delivery latency of journal_created
+events.
+
+Sentiment is stubbed by default (`--sentiment stub`, optional
+`--sentiment-delay-ms` to mimic model cost) so runs measure the API, not the
+model. `--sentiment app` leaves whatever the app is configured with, e.g.
+SENTIMENT_SOCKET pointing at the inference server.
+
+Usage (from backend/):
+    python benchmarks/loadtest.py --users 50 --entries-per-user 200 --concurrency 16 --duration 30
+    python benchmarks/loadtest.py --mix write=1,dashboard=4 --json results.json
+    python benchmarks/loadtest.py --json new.json --compare old.json
+
+Results (per route throughput, error count, p50/p95/p99/max latency in ms)
+are written as JSON with the git commit so runs can be compared across
+commits.
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+PASSWORD = "Loadtest1Password"
+WORDS = (
+    "today felt calm tired anxious happy grateful stressed work family friends walk sleep "
+    "coffee meeting deadline rain sunshine exercise dinner reading music lonely hopeful "
+    "overwhelmed proud quiet busy weekend morning evening therapy breathing journal"
+).split()
+TAGS = ["work", "family", "health", "sleep", "exercise", "friends", "anxiety", "gratitude"]
+DEFAULT_MIX = "write=10,dashboard=25,list=35,search=20,export=10"
+
+
+def _configure_env(tmpdir):
+    if not os.environ.get("DATABASE_URL"):
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmpdir, 'loadtest.db')}"
+    os.environ.setdefault("BCRYPT_LOG_ROUNDS", "4")
+    os.environ["BACKGROUND_JOBS_ENABLED"] = "false"
+    os.environ["LOG_FILE"] = ""
+    os.environ.setdefault("VECTOR_INDEX_DIR", os.path.join(tmpdir, "vectors"))
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    sys.path.insert(0, BACKEND_DIR)
+
+
+def _stub_sentiment(delay):
+    def analyze_model(text):
+        if delay:
+            time.sleep(delay)
+        lowered = text.lower()
+        if any(w in lowered for w in ("happy", "grateful", "proud", "hopeful", "calm")):
+            return "POSITIVE", 0.9
+        if any(w in lowered for w in ("anxious", "stressed", "lonely", "overwhelmed")):
+            return "NEGATIVE", 0.85
+        return "NEUTRAL", 0.6
+    return analyze_model
+
+
+def _text(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def seed(app, users, entries_per_user, seed_value):
+    """Bulk-load users and entries with the corpus generator; returns the usernames."""
+    from models import db
+    from utils.hashing import hash_password
+    import corpus
+
+    opts = corpus.build_parser().parse_args([
+        "--users", str(users), "--entries-per-user", str(entries_per_user), "--activity", "uniform",
+        "--days", "90", "--seed", str(seed_value), "--prefix", "load_user_", "--workers", "1",
+    ])
+    with app.app_context():
+        corpus.generate(db.engine, opts, hash_password(PASSWORD), log=lambda *_: None)
+    return [f"load_user_{i}" for i in range(users)]
+
+
+class Recorder:
+    """Per-route latency samples, appended from many threads."""
+
+    def __init__(self):
+        self.samples = {}
+        self.errors = {}
+        self.recording = False
+        self._lock = threading.Lock()
+
+    def add(self, route, elapsed, ok):
+        if not self.recording:
+            return
+        with self._lock:
+            self.samples.setdefault(route, []).append(elapsed)
+            if not ok:
+                self.errors[route] = self.errors.get(route, 0) + 1
+
+
+class Client:
+    """One keep-alive HTTP connection per virtual user."""
+
+    def __init__(self, host, port, recorder, timeout=30):
+        self.host, self.port, self.timeout = host, port, timeout
+        self.recorder = recorder
+        self.token = None
+        self._conn = None
+
+    def request(self, method, path, route, body=None):
+        headers = {"Content-Type": "application/json"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        payload = json.dumps(body) if body is not None else None
+        started = time.perf_counter()
+        status, data = None, b""
+        for attempt in (0, 1):
+            if self._conn is None:
+                self._conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self._conn.request(method, path, body=payload, headers=headers)
+                response = self._conn.getresponse()
+                data = response.read()
+                status = response.status
+                break
+            except (http.client.HTTPException, OSError):
+                self._conn.close()
+                self._conn = None
+                if attempt:
+                    break
+        elapsed = time.perf_counter() - started
+        self.recorder.add(route, elapsed, status is not None and status < 400)
+        if status is None or status >= 400:
+            return None
+        return json.loads(data) if data else {}
+
+
+class VirtualUser(threading.Thread):
+    def __init__(self, index, username, host, port, recorder, weights, stop, rng, pending_events):
+        super().__init__(name=f"vu-{index}", daemon=True)
+        self.username = username
+        self.client = Client(host, port, recorder)
+        self.actions, self.weights = zip(*weights)
+        self.stop = stop
+        self.rng = rng
+        self.pending_events = pending_events
+
+    def run(self):
+        login = self.client.request("POST", "/auth/login", "POST /auth/login",
+                                    {"username": self.username, "password": PASSWORD})
+        if not login:
+            return
+        self.client.token = login["token"]
+        while not self.stop.is_set():
+            action = self.rng.choices(self.actions, self.weights)[0]
+            getattr(self, f"do_{action}")()
+
+    def do_write(self):
+        marker = uuid.uuid4().hex
+        self.pending_events[marker] = time.perf_counter()
+        self.client.request("POST", "/journal/entry", "POST /journal/entry", {
+            "text": f"{_text(self.rng, self.rng.randint(10, 80))} {marker}",
+            "mood_rating": self.rng.randint(1, 10),
+            "tags": self.rng.sample(TAGS, self.rng.randint(0, 2)),
+        })
+
+    def do_dashboard(self):
+        self.client.request("GET", "/analytics/overview", "GET /analytics/overview")
+        self.client.request("GET", "/analytics/trends?days=30", "GET /analytics/trends")
+        self.client.request("GET", "/analytics/insights", "GET /analytics/insights")
+
+    def do_list(self):
+        page = self.rng.randint(1, 3)
+        result = self.client.request("GET", f"/journal/entries?page={page}&per_page=20", "GET /journal/entries")
+        if result and result.get("entries"):
+            entry_id = self.rng.choice(result["entries"])["id"]
+            self.client.request("GET", f"/journal/entry/{entry_id}", "GET /journal/entry/<id>")
+
+    def do_search(self):
+        self.client.request("GET", f"/journal/search?q={self.rng.choice(WORDS)}", "GET /journal/search")
+
+    def do_export(self):
+        self.client.request("GET", "/analytics/export", "GET /analytics/export")
+
+
+class SSEClient(threading.Thread):
+    """Holds /events/stream open and measures delivery latency of journal_created events."""
+
+    def __init__(self, index, host, port, token, stop, pending_events, recorder):
+        super().__init__(name=f"sse-{index}", daemon=True)
+        self.host, self.port, self.token = host, port, token
+        self.stop = stop
+        self.pending_events = pending_events
+        self.recorder = recorder
+        self.latencies = []
+        self.events = 0
+        self.connected = False
+
+    def run(self):
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=2)
+        try:
+            started = time.perf_counter()
+            conn.request("GET", f"/events/stream?jwt={self.token}")
+            response = conn.getresponse()
+            self.connected = response.status == 200
+            self.recorder.add("GET /events/stream (connect)", time.perf_counter() - started, self.connected)
+            while self.connected and not self.stop.is_set():
+                try:
+                    line = response.fp.readline()
+                except OSError:
+                    continue  # read timeout; re-check stop
+                if not line:
+                    break
+                if not line.startswith(b"data: "):
+                    continue
+                received = time.perf_counter()
+                payload = json.loads(line[6:])
+                marker = payload.get("data", {}).get("entry", {}).get("text", "").rsplit(" ", 1)[-1]
+                sent = self.pending_events.get(marker)
+                self.events += 1
+                if sent is not None and self.recorder.recording:
+                    self.latencies.append(received - sent)
+        finally:
+            conn.close()
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def summarize(samples, errors, duration):
+    routes = {}
+    for route, values in sorted(samples.items()):
+        values = sorted(values)
+        routes[route] = {
+            "requests": len(values),
+            "errors": errors.get(route, 0),
+            "rps": round(len(values) / duration, 2),
+            "mean_ms": round(sum(values) / len(values) * 1000, 2),
+            "p50_ms": round(percentile(values, 50) * 1000, 2),
+            "p95_ms": round(percentile(values, 95) * 1000, 2),
+            "p99_ms": round(percentile(values, 99) * 1000, 2),
+            "max_ms": round(values[-1] * 1000, 2),
+        }
+    return routes
+
+
+def parse_mix(spec):
+    weights = []
+    for part in spec.split(","):
+        action, _, weight = part.partition("=")
+        action = action.strip()
+        if not hasattr(VirtualUser, f"do_{action}"):
+            raise SystemExit(f"Unknown action in --mix: {action}")
+        weights.append((action, float(weight or 1)))
+    return weights
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_table(results, baseline=None):
+    base_routes = (baseline or {}).get("routes", {})
+    print(f"{'route':<32} {'req':>7} {'err':>5} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}")
+    for route, r in results["routes"].items():
+        line = (f"{route:<32} {r['requests']:>7} {r['errors']:>5} {r['rps']:>8.1f} "
+                f"{r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['max_ms']:>8.1f}")
+        old = base_routes.get(route)
+        if old and old["p95_ms"]:
+            line += f"   p95 {(r['p95_ms'] - old['p95_ms']) / old['p95_ms'] * 100:+.0f}%"
+            line += f"  rps {(r['rps'] - old['rps']) / old['rps'] * 100:+.0f}%" if old["rps"] else ""
+        print(line)
+    total = results["total"]
+    print(f"\ntotal: {total['requests']} requests, {total['errors']} errors, {total['rps']:.1f} req/s")
+    sse = results.get("sse")
+    if sse and sse["clients"]:
+        print(f"sse: {sse['connected']}/{sse['clients']} connected, {sse['events_received']} events, "
+              f"delivery p50 {sse['delivery_p50_ms']} ms p99 {sse['delivery_p99_ms']} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20, help="synthetic users to seed")
+    parser.add_argument("--entries-per-user", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8, help="virtual users driving requests")
+    parser.add_argument("--sse-clients", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=20.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=3.0, help="unmeasured seconds before the run")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"weighted actions (default {DEFAULT_MIX})")
+    parser.add_argument("--sentiment", choices=("stub", "app"), default="stub")
+    parser.add_argument("--sentiment-delay-ms", type=float, default=0.0, help="latency added by the stub")
+    parser.add_argument("--seed", type=int, default=37)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="previous results file to diff against")
+    args = parser.parse_args()
+
+    tmpdir = tempfile.TemporaryDirectory()
+    _configure_env(tmpdir.name)
+    from werkzeug.serving import make_server
+    import app as app_module
+    import logging
+    from utils import sentiment
+
+    app = app_module.app
+    if args.sentiment == "stub":
+        sentiment.analyze_model = _stub_sentiment(args.sentiment_delay_ms / 1000)
+
+    seed_started = time.perf_counter()
+    usernames = seed(app, args.users, args.entries_per_user, args.seed)
+    print(f"Seeded {args.users} users x {args.entries_per_user} entries in {time.perf_counter() - seed_started:.1f}s")
+
+    # One access-log line per request would dominate the measurement
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    host, port = "127.0.0.1", server.server_port
+    threading.Thread(target=server.serve_forever, name="loadtest-server", daemon=True).start()
+
+    recorder = Recorder()
+    stop = threading.Event()
+    pending_events = {}
+    weights = parse_mix(args.mix)
+
+    sse_clients = []
+    if args.sse_clients:
+        login = Client(host, port, recorder).request(
+            "POST", "/auth/login", "POST /auth/login", {"username": usernames[0], "password": PASSWORD})
+        for i in range(args.sse_clients):
+            sse_clients.append(SSEClient(i, host, port, login["token"], stop, pending_events, recorder))
+    for client in sse_clients:
+        client.start()
+
+    virtual_users = [
+        VirtualUser(i, usernames[i % len(usernames)], host, port, recorder, weights, stop,
+                    random.Random(args.seed * 1000 + i), pending_events)
+        for i in range(args.concurrency)
+    ]
+    for vu in virtual_users:
+        vu.start()
+
+    time.sleep(args.warmup)
+    recorder.recording = True
+    started = time.perf_counter()
+    time.sleep(args.duration)
+    recorder.recording = False
+    measured = time.perf_counter() - started
+    stop.set()
+    for thread in virtual_users + sse_clients:
+        thread.join(timeout=5)
+    server.shutdown()
+
+    routes_summary = summarize(recorder.samples, recorder.errors, measured)
+    request_routes = {k: v for k, v in routes_summary.items() if not k.startswith("GET /events/stream")}
+    latencies = sorted(l for client in sse_clients for l in client.latencies)
+    results = {
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "database": os.environ["DATABASE_URL"].split(":", 1)[0],
+        "config": {k: v for k, v in vars(args).items() if k not in ("json", "compare")},
+        "duration_s": round(measured, 2),
+        "total": {
+            "requests": sum(r["requests"] for r in request_routes.values()),
+            "errors": sum(r["errors"] for r in request_routes.values()),
+            "rps": round(sum(r["requests"] for r in request_routes.values()) / measured, 2),
+        },
+        "routes": routes_summary,
+        "sse": {
+            "clients": len(sse_clients),
+            "connected": sum(1 for c in sse_clients if c.connected),
+            "events_received": sum(c.events for c in sse_clients),
+            "delivery_p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "delivery_p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        },
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_table(results, baseline)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    tmpdir.cleanup()
+    return 1 if results["total"]["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""Per-request logging overhead: synchronous FileHandler vs queued, sampled logging.
+
+Usage (from backend/):
+    python benchmarks/logging_overhead.py --requests 20000
+
+Times only the request thread. That is what the old before_request
+logger.info cost every request, and what the queued after_request logger
+costs now. The queued rows include the time the listener thread needs to
+drain the queue afterwards, reported separately.
+"""
+import argparse
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.logging_setup import TEXT_FORMAT, JsonFormatter, DroppingQueueHandler  # noqa: E402
+
+
+def _emit_requests(logger, n, sample_rate):
+    start = time.perf_counter()
+    for i in range(n):
+        status = 500 if i % 200 == 0 else 200
+        if status >= 400 or random.random() < sample_rate:
+            logger.info(
+                f"GET /journal/entries - 127.0.0.1 {status} 3.2ms",
+                extra={"method": "GET", "path": "/journal/entries", "status": status,
+                       "duration_ms": 3.2, "remote_addr": "127.0.0.1"}
+            )
+    return time.perf_counter() - start
+
+
+def _fresh_logger(name):
+    logger = logging.getLogger(name)
+    logger.handlers[:] = []
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    return logger
+
+
+def run_sync(tmp, n, devnull):
+    logger = _fresh_logger("bench.sync")
+    formatter = logging.Formatter(TEXT_FORMAT)
+    for handler in (logging.FileHandler(os.path.join(tmp, "sync.log")), logging.StreamHandler(devnull)):
+        handler.setFormatter(formatter)
+        logger.addHandler(handler)
+    elapsed = _emit_requests(logger, n, 1.0)
+    for handler in logger.handlers:
+        handler.close()
+    return {"hot_path_s": elapsed, "drain_s": 0.0}
+
+
+def run_queued(tmp, n, devnull, sample_rate, fmt):
+    logger = _fresh_logger(f"bench.queued.{fmt}.{sample_rate}")
+    formatter = JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT)
+    handlers = [
+        logging.handlers.RotatingFileHandler(os.path.join(tmp, f"queued-{fmt}-{sample_rate}.log"),
+                                             maxBytes=10 * 1024 * 1024, backupCount=2),
+        logging.StreamHandler(devnull),
+    ]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    log_queue = queue.Queue(maxsize=max(n, 1))
+    logger.addHandler(DroppingQueueHandler(log_queue))
+    listener = logging.handlers.QueueListener(log_queue, *handlers)
+    listener.start()
+    elapsed = _emit_requests(logger, n, sample_rate)
+    drain_start = time.perf_counter()
+    listener.stop()
+    drain = time.perf_counter() - drain_start
+    for handler in handlers:
+        handler.close()
+    return {"hot_path_s": elapsed, "drain_s": drain}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--sample-rate", type=float, default=0.1)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+    random.seed(0)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp, open(os.devnull, "w") as devnull:
+        results["sync_file_handler"] = run_sync(tmp, args.requests, devnull)
+        results["queued_text_unsampled"] = run_queued(tmp, args.requests, devnull, 1.0, "text")
+        results["queued_text_sampled"] = run_queued(tmp, args.requests, devnull, args.sample_rate, "text")
+        results["queued_json_sampled"] = run_queued(tmp, args.requests, devnull, args.sample_rate, "json")
+
+    print(f"{'setup':<24} {'us/request':>11} {'drain ms':>9}")
+    for name, r in results.items():
+        r["us_per_request"] = r["hot_path_s"] / args.requests * 1e6
+        print(f"{name:<24} {r['us_per_request']:>11.2f} {r['drain_s'] * 1000:>9.1f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"requests": args.requests, "sample_rate": args.sample_rate, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Insights and entry-write latency against history size (utils/mood_stats.py).
+
+Seeds one user per --sizes value with that many synthetic entries
+(benchmarks/corpus.py) into a temporary SQLite database, then per user:
+
+  build     mood_stats.build(): the one-off replay of the whole history
+  insights  GET /analytics/insights, which reads the user's statistics row
+  add       POST /journal/entry, which folds the entry into that row
+
+Median and p95 over --repeat requests, in milliseconds. With the streaming
+statistics both request columns should stay flat as history grows.
+
+Usage (from backend/):
+    python benchmarks/mood_stats.py --sizes 100 1000 10000 --repeat 200
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def _configure_env(tmpdir):
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmpdir, 'mood_stats.db')}"
+    os.environ["VECTOR_INDEX_DIR"] = os.path.join(tmpdir, "vectors")
+    os.environ.setdefault("BCRYPT_LOG_ROUNDS", "4")
+    os.environ["BACKGROUND_JOBS_ENABLED"] = "false"
+    os.environ["LOG_FILE"] = ""
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    sys.path.insert(0, BACKEND_DIR)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    return {"median_ms": round(statistics.median(ordered) * 1000, 3),
+            "p95_ms": round(ordered[int(len(ordered) * 0.95) - 1] * 1000, 3)}
+
+
+def timed(call, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = call()
+        samples.append(time.perf_counter() - started)
+        assert response.status_code < 300, response.data[:200]
+    return percentiles(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000], help="entries per user")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _configure_env(tmp)
+        import corpus
+        from flask_jwt_extended import create_access_token
+        from app import app
+        from models import db, User
+        from utils import mood_stats, sentiment
+        from utils.hashing import hash_password
+
+        # Entry writes must not load (or wait on) the transformer
+        sentiment.analyze_fast = lambda text: ("POSITIVE", 0.9)
+
+        password = hash_password("Benchmark1Password")
+        client = app.test_client()
+        results = {}
+        for size in args.sizes:
+            opts = corpus.build_parser().parse_args([
+                "--users", "1", "--entries-per-user", str(size), "--activity", "uniform",
+                "--workers", "1", "--seed", str(size), "--prefix", f"history{size}_",
+            ])
+            with app.app_context():
+                corpus.generate(db.engine, opts, password, log=lambda *_: None)
+                user_id = db.session.query(User.id).filter_by(username=f"history{size}_0").scalar()
+                token = create_access_token(identity=str(user_id))
+                started = time.perf_counter()
+                mood_stats.get(user_id)
+                build_s = time.perf_counter() - started
+
+            headers = {"Authorization": f"Bearer {token}"}
+            results[size] = {
+                "build_ms": round(build_s * 1000, 1),
+                "insights": timed(lambda: client.get("/analytics/insights", headers=headers), args.repeat),
+                "add": timed(lambda: client.post("/journal/entry", json={"text": "A calm walk", "mood_rating": 6},
+                                                 headers=headers), args.repeat),
+            }
+
+    print(f"{'entries':>8}  {'build':>9}  {'insights median/p95':>20}  {'add median/p95':>18}")
+    for size, r in results.items():
+        print(f"{size:>8}  {r['build_ms']:>6.1f} ms  "
+              f"{r['insights']['median_ms']:>8.3f} / {r['insights']['p95_ms']:>7.3f}  "
+              f"{r['add']['median_ms']:>7.3f} / {r['add']['p95_ms']:>7.3f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
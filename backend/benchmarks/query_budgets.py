@@ -0,0 +1,269 @@
+"""SQL query-count budgets for every API endpoint.
+
+Spins the app up against a throwaway SQLite database, seeds synthetic users
+(one light, one heavy), calls every endpoint as both, records each SQL
+statement through SQLAlchemy cursor events, and checks each endpoint against
+its budget in query_budgets.json. A statement count that grows with the
+user's data (N+1) fails even when it fits the budget.
+
+The check runs under pytest as tests/test_query_budgets.py, one test per
+endpoint; this script re-records the budgets and prints the whole table.
+
+Usage (from backend/):
+    python -m pytest -q tests/test_query_budgets.py   # check
+    python benchmarks/query_budgets.py                # print counts, exit 1 on regression
+    python benchmarks/query_budgets.py --update       # re-record budgets after an intended change
+
+On failure the recorded statements are diffed against the baseline so the
+extra round trips are visible.
+"""
+import argparse
+import difflib
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+BUDGETS_FILE = os.path.join(os.path.dirname(__file__), "query_budgets.json")
+
+LIGHT_ENTRIES = 3
+HEAVY_ENTRIES = 60
+PASSWORD = "Budget1Password"
+
+
+def _configure_env(tmpdir):
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmpdir, 'query_budgets.db')}"
+    os.environ["BACKGROUND_JOBS_ENABLED"] = "false"
+    os.environ["BCRYPT_LOG_ROUNDS"] = "4"
+    os.environ["LOG_FILE"] = ""
+    os.environ["LOG_LEVEL"] = "WARNING"
+    os.environ["PASSWORD_RESET_RESPONSE_FLOOR"] = "0"
+    os.environ["VECTOR_INDEX_DIR"] = os.path.join(tmpdir, "vectors")
+    sys.path.insert(0, BACKEND_DIR)
+
+
+def _stub_sentiment(text):
+    # Query budgets must not depend on (or load) the transformer model
+    return ("POSITIVE", 0.9) if "good" in text.lower() else ("NEGATIVE", 0.8)
+
+
+def prepare():
+    """Settings every recording runs under; returns the previous values for restore()."""
+    from utils import revocation, sentiment
+
+    saved = (sentiment.analyze_model, revocation._settings["sync_interval"])
+    sentiment.analyze_model = _stub_sentiment
+    # The revocation sync runs on a timer, not per endpoint; keep it out of the per-request counts
+    revocation._settings["sync_interval"] = 3600.0
+    return saved
+
+
+def restore(saved):
+    from utils import revocation, sentiment
+
+    sentiment.analyze_model, revocation._settings["sync_interval"] = saved
+
+
+class QueryRecorder:
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self.statements = []
+        self.active = False
+        event.listen(engine, "before_cursor_execute", self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        if self.active:
+            self.statements.append(normalize(statement))
+
+    def __enter__(self):
+        self.statements = []
+        self.active = True
+        return self
+
+    def __exit__(self, *exc):
+        self.active = False
+
+
+def normalize(statement: str) -> str:
+    statement = " ".join(statement.split())
+    # Expanded IN lists and savepoint names vary run to run
+    statement = re.sub(r"\(\?(, \?)+\)", "(?...)", statement)
+    return re.sub(r"sa_savepoint_\d+", "sa_savepoint_N", statement)
+
+
+def seed(app):
+    from models import db, User, JournalEntry
+    from utils.hashing import hash_password
+
+    rng = random.Random(36)
+    words = ["good", "calm", "tired", "work", "family", "anxious", "walk", "sleep", "happy", "stress"]
+    users = {}
+    with app.app_context():
+        password = hash_password(PASSWORD)
+        for name, count in (("light_user", LIGHT_ENTRIES), ("heavy_user", HEAVY_ENTRIES)):
+            user = User(username=name, email=f"{name}@example.com", password=password)
+            db.session.add(user)
+            db.session.flush()
+            now = datetime.utcnow()
+            for i in range(count):
+                text = " ".join(rng.choice(words) for _ in range(12))
+                db.session.add(JournalEntry(
+                    user_id=user.id,
+                    text=text,
+                    sentiment=rng.choice(["POSITIVE", "NEGATIVE", "NEUTRAL"]),
+                    score=round(rng.random(), 3),
+                    mood_rating=rng.randint(1, 10),
+                    tags=",".join(rng.sample(words, 2)),
+                    timestamp=now - timedelta(hours=rng.randint(0, 24 * 60)),
+                ))
+            users[name] = user.id
+        db.session.commit()
+    return users
+
+
+def entry_ids(app, user_id):
+    from models import JournalEntry
+
+    with app.app_context():
+        rows = JournalEntry.query.filter_by(user_id=user_id).order_by(JournalEntry.id).all()
+        return [row.id for row in rows]
+
+
+def scenarios(app, client, users):
+    """Yield (name, callable) pairs; each callable performs one request as the given user.
+
+    Logins and entry-id lookups happen here, outside the recorded window.
+    """
+
+    def login(username):
+        response = client.post("/auth/login", json={"username": username, "password": PASSWORD})
+        assert response.status_code == 200, response.get_json()
+        return response.get_json()["token"]
+
+    tokens = {name: login(name) for name in users}
+
+    def as_user(name):
+        return {"Authorization": f"Bearer {tokens[name]}"}
+
+    ids = {name: entry_ids(app, user_id) for name, user_id in users.items()}
+
+    def first_entry(name):
+        return ids[name][0]
+
+    def last_entry(name):
+        return ids[name][-1]
+
+    yield "GET /health", lambda name: client.get("/health")
+    yield "POST /auth/login", lambda name: client.post("/auth/login", json={"username": name, "password": PASSWORD})
+    yield "GET /auth/profile", lambda name: client.get("/auth/profile", headers=as_user(name))
+    yield "GET /auth/me", lambda name: client.get("/auth/me", headers=as_user(name))
+    yield "POST /auth/request-password-reset", lambda name: client.post(
+        "/auth/request-password-reset", json={"email": f"{name}@example.com"})
+    yield "POST /journal/entry", lambda name: client.post(
+        "/journal/entry", json={"text": "A good walk today", "mood_rating": 7, "tags": ["walk"]}, headers=as_user(name))
+    yield "POST /journal/preview", lambda name: client.post(
+        "/journal/preview", json={"text": "A good walk"}, headers=as_user(name))
+    yield "GET /journal/entries", lambda name: client.get("/journal/entries", headers=as_user(name))
+    yield "GET /journal/entries?per_page=100&sentiment=positive", lambda name: client.get(
+        "/journal/entries?per_page=100&sentiment=positive&start_date=2000-01-01", headers=as_user(name))
+    yield "GET /journal/entry/<id>", lambda name: client.get(f"/journal/entry/{first_entry(name)}", headers=as_user(name))
+    yield "PUT /journal/entry/<id>", lambda name: client.put(
+        f"/journal/entry/{first_entry(name)}", json={"text": "good again", "mood_rating": 6}, headers=as_user(name))
+    yield "GET /journal/search", lambda name: client.get("/journal/search?q=good", headers=as_user(name))
+    yield "GET /journal/similar/<id>", lambda name: client.get(
+        f"/journal/similar/{first_entry(name)}", headers=as_user(name))
+    yield "GET /analytics/overview", lambda name: client.get("/analytics/overview", headers=as_user(name))
+    yield "GET /analytics/trends", lambda name: client.get("/analytics/trends?days=90", headers=as_user(name))
+    yield "GET /analytics/insights", lambda name: client.get("/analytics/insights", headers=as_user(name))
+    yield "GET /analytics/summary", lambda name: client.get("/analytics/summary?days=90", headers=as_user(name))
+    yield "GET /analytics/export", lambda name: client.get("/analytics/export", headers=as_user(name))
+    yield "DELETE /journal/entry/<id>", lambda name: client.delete(
+        f"/journal/entry/{last_entry(name)}", headers=as_user(name))
+    yield "POST /auth/logout", lambda name: client.post("/auth/logout", headers=as_user(name))
+
+
+def record(app, users):
+    from models import db
+
+    with app.app_context():
+        recorder = QueryRecorder(db.engine)
+    client = app.test_client()
+    results = {}
+    for name, call in scenarios(app, client, users):
+        per_user = {}
+        for username in ("light_user", "heavy_user"):
+            with recorder:
+                response = call(username)
+            if response.status_code >= 500:
+                raise RuntimeError(f"{name} as {username} returned {response.status_code}")
+            per_user[username] = list(recorder.statements)
+        results[name] = per_user
+    return results
+
+
+def load_budgets():
+    with open(BUDGETS_FILE) as f:
+        return json.load(f)
+
+
+def check_endpoint(name, per_user, baseline):
+    """(reason, expected, actual) for each way one endpoint breaks its budget."""
+    failures = []
+    light, heavy = per_user["light_user"], per_user["heavy_user"]
+    if len(heavy) != len(light):
+        failures.append((f"query count grows with data: {len(light)} queries for "
+                         f"{LIGHT_ENTRIES} entries vs {len(heavy)} for {HEAVY_ENTRIES}", light, heavy))
+    if baseline is None:
+        failures.append(("no budget recorded (run benchmarks/query_budgets.py --update)", [], heavy))
+    elif len(heavy) > baseline["budget"]:
+        failures.append((f"{len(heavy)} queries exceeds budget of {baseline['budget']}",
+                         baseline["queries"], heavy))
+    return failures
+
+
+def describe(name, reason, expected, actual) -> str:
+    diff = difflib.unified_diff([q + "\n" for q in expected], [q + "\n" for q in actual],
+                                fromfile="expected", tofile="actual", lineterm="\n")
+    return f"FAIL {name}: {reason}\n" + "".join(diff)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--update", action="store_true", help="rewrite query_budgets.json from this run")
+    args = parser.parse_args()
+
+    tmpdir = tempfile.TemporaryDirectory()
+    _configure_env(tmpdir.name)
+    from app import app
+    prepare()
+    users = seed(app)
+    results = record(app, users)
+
+    if args.update:
+        budgets = {name: {"budget": len(per_user["heavy_user"]), "queries": per_user["heavy_user"]}
+                   for name, per_user in results.items()}
+        with open(BUDGETS_FILE, "w") as f:
+            json.dump(budgets, f, indent=2)
+            f.write("\n")
+        print(f"Recorded budgets for {len(budgets)} endpoints in {BUDGETS_FILE}")
+        return 0
+
+    budgets = load_budgets()
+    for name, per_user in results.items():
+        budget = budgets.get(name, {}).get("budget", "-")
+        print(f"{len(per_user['heavy_user']):>3} / {budget:>3}  {name}")
+
+    failures = [(name, *failure) for name, per_user in results.items()
+                for failure in check_endpoint(name, per_user, budgets.get(name))]
+    for failure in failures:
+        print("\n" + describe(*failure), end="")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
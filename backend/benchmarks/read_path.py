@@ -0,0 +1,109 @@
+"""ORM vs Core-record read path for entry listings (utils/entry_records.py).
+
+Seeds one user with --entries synthetic entries (benchmarks/corpus.py) into
+a temporary SQLite database. It then loads and encodes a 100-entry page and
+the full export in two ways:
+
+  orm      JournalEntry.query ... .all(), as the routes did before
+  records  entry_records.user_entries(), as they do now
+
+Both go through json_provider.entries_json(), so only the read path differs.
+The benchmark reports median latency over --repeat runs, and the peak
+Python memory of one run as measured by tracemalloc. Each run starts with
+a fresh session.
+
+Usage (from backend/):
+    python benchmarks/read_path.py --entries 5000 --repeat 20
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def _configure_env(tmpdir):
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmpdir, 'read_path.db')}"
+    os.environ.setdefault("BCRYPT_LOG_ROUNDS", "4")
+    os.environ["BACKGROUND_JOBS_ENABLED"] = "false"
+    os.environ["LOG_FILE"] = ""
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    sys.path.insert(0, BACKEND_DIR)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure(fn, repeat, reset):
+    fn()  # warm up statement caches
+    samples = []
+    for _ in range(repeat):
+        reset()
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    reset()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    reset()
+    return {"median_ms": round(statistics.median(samples) * 1000, 3), "peak_kb": round(peak / 1024, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=5000)
+    parser.add_argument("--length-median", type=float, default=60, help="median words per entry")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _configure_env(tmp)
+        import corpus
+        from app import app
+        from models import db, JournalEntry, User
+        from utils import entry_records
+        from utils.hashing import hash_password
+        from utils.json_provider import entries_json
+
+        opts = corpus.build_parser().parse_args([
+            "--users", "1", "--entries-per-user", str(args.entries), "--activity", "uniform",
+            "--length-median", str(args.length_median), "--workers", "1", "--seed", "1",
+        ])
+        results = {}
+        with app.app_context():
+            corpus.generate(db.engine, opts, hash_password("Benchmark1Password"), log=lambda *_: None)
+            user_id = db.session.query(User.id).scalar()
+            total = db.session.query(JournalEntry).count()
+
+            def orm(limit):
+                query = JournalEntry.query.filter_by(user_id=user_id).order_by(JournalEntry.timestamp.desc())
+                return lambda: entries_json(query.limit(limit).all() if limit else query.all())
+
+            def records(limit):
+                return lambda: entries_json(entry_records.user_entries(user_id, limit=limit))
+
+            def reset():
+                db.session.remove()
+
+            for name, limit in (("page_100", 100), (f"export_{total}", None)):
+                results[name] = {"orm": measure(orm(limit), args.repeat, reset),
+                                 "records": measure(records(limit), args.repeat, reset)}
+
+    print(f"{'':<14} {'orm ms':>9} {'records ms':>11} {'orm peak KB':>12} {'records peak KB':>16}")
+    for name, r in results.items():
+        print(f"{name:<14} {r['orm']['median_ms']:>9.2f} {r['records']['median_ms']:>11.2f} "
+              f"{r['orm']['peak_kb']:>12.1f} {r['records']['peak_kb']:>16.1f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"entries": total, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Similar-entry search latency over the per-user vector index (utils/vector_index.py).
+
+Seeds one user with --entries synthetic entries (benchmarks/corpus.py) into
+a temporary SQLite database, then:
+
+  backfill  embeds every entry into the user's float16 file (entries/s)
+  search    vector_index.similar() for random entries: memory-map the file,
+            score every vector, take the top --k. Median and p95 over
+            --repeat queries, in milliseconds; "cold" empties the float32
+            cache before each query, so it includes the float16 conversion
+  endpoint  GET /journal/similar/<id> through the test client (adds the
+            two entry lookups and JSON encoding)
+
+It also reports the file size and the bytes per entry.
+
+Usage (from backend/):
+    python benchmarks/similarity_search.py --entries 10000 --repeat 200
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def _configure_env(tmpdir):
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmpdir, 'similarity_search.db')}"
+    os.environ["VECTOR_INDEX_DIR"] = os.path.join(tmpdir, "vectors")
+    os.environ.setdefault("BCRYPT_LOG_ROUNDS", "4")
+    os.environ["BACKGROUND_JOBS_ENABLED"] = "false"
+    os.environ["LOG_FILE"] = ""
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    sys.path.insert(0, BACKEND_DIR)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    return {"median_ms": round(statistics.median(ordered) * 1000, 3),
+            "p95_ms": round(ordered[int(len(ordered) * 0.95) - 1] * 1000, 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=10000)
+    parser.add_argument("--length-median", type=float, default=60, help="median words per entry")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _configure_env(tmp)
+        import corpus
+        from flask_jwt_extended import create_access_token
+        from app import app
+        from models import db, JournalEntry, User
+        from utils import vector_index
+        from utils.hashing import hash_password
+
+        opts = corpus.build_parser().parse_args([
+            "--users", "1", "--entries-per-user", str(args.entries), "--activity", "uniform",
+            "--length-median", str(args.length_median), "--workers", "1", "--seed", "1",
+        ])
+        rng = random.Random(1)
+        results = {}
+        with app.app_context():
+            corpus.generate(db.engine, opts, hash_password("Benchmark1Password"), log=lambda *_: None)
+            user_id = db.session.query(User.id).scalar()
+            texts = dict(db.session.query(JournalEntry.id, JournalEntry.text).filter_by(user_id=user_id))
+            token = create_access_token(identity=str(user_id))
+
+            started = time.perf_counter()
+            indexed = vector_index.backfill(user_id, log=lambda *_: None)
+            elapsed = time.perf_counter() - started
+            size = os.path.getsize(vector_index._path(user_id))
+            results["backfill"] = {"entries": indexed, "seconds": round(elapsed, 2),
+                                   "entries_per_s": round(indexed / elapsed, 1),
+                                   "file_bytes": size, "bytes_per_entry": size // indexed}
+
+            ids = list(texts)
+            for name, cold in (("search_cold", True), ("search", False)):
+                vector_index.similar(user_id, ids[0], texts[ids[0]], args.k)  # warm up
+                samples = []
+                for _ in range(args.repeat):
+                    if cold:
+                        vector_index._cache.clear()
+                    entry_id = rng.choice(ids)
+                    started = time.perf_counter()
+                    vector_index.similar(user_id, entry_id, texts[entry_id], args.k)
+                    samples.append(time.perf_counter() - started)
+                results[name] = percentiles(samples)
+
+        client = app.test_client()
+        headers = {"Authorization": f"Bearer {token}"}
+        samples = []
+        for _ in range(args.repeat):
+            entry_id = rng.choice(ids)
+            started = time.perf_counter()
+            response = client.get(f"/journal/similar/{entry_id}?limit={args.k}", headers=headers)
+            samples.append(time.perf_counter() - started)
+            assert response.status_code == 200, response.data[:200]
+        results["endpoint"] = percentiles(samples)
+
+    b = results["backfill"]
+    print(f"backfill    {b['entries']} entries in {b['seconds']}s ({b['entries_per_s']}/s), "
+          f"{b['file_bytes'] / 1024:.0f} KB ({b['bytes_per_entry']} bytes/entry)")
+    for name in ("search_cold", "search", "endpoint"):
+        print(f"{name:<11} median {results[name]['median_ms']:.3f} ms  p95 {results[name]['p95_ms']:.3f} ms")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"entries": args.entries, "k": args.k, **results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""Storage and query-time effect of compressed journal text (utils/textstore.py).
+
+Generates a synthetic corpus (benchmarks/corpus.py) into a temporary SQLite
+database, then measures the same workload twice: with text inline, and
+after training a dictionary and moving text into journal_entry_bodies. The
+database is VACUUMed before each measurement.
+
+  aggregate  per-user sentiment counts and average score over the last 90
+             days, no text (the trends/insights shape), as a full table scan
+  list       GET /journal/entries: one page of 20 entries with to_dict()
+  export     GET /analytics/export: all of one user's entries with to_dict()
+
+Timings are for a warm cache, median of --repeat runs. The synthetic text
+draws on a small vocabulary, so it compresses better than real journals do.
+Treat the ratio as an upper bound.
+
+Usage (from backend/):
+    python benchmarks/text_compression.py --users 500 --entries-per-user 100 --length-median 120
+    python benchmarks/text_compression.py --json text_compression.json
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def _configure_env(tmpdir):
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmpdir, 'text_compression.db')}"
+    os.environ.setdefault("BCRYPT_LOG_ROUNDS", "4")
+    os.environ["BACKGROUND_JOBS_ENABLED"] = "false"
+    os.environ["LOG_FILE"] = ""
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    sys.path.insert(0, BACKEND_DIR)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def table_sizes(db):
+    """Bytes per table (and its indexes) from dbstat, or just the file size if dbstat is unavailable."""
+    from sqlalchemy import text
+
+    with db.engine.connect() as conn:
+        conn.execute(text("VACUUM"))
+        total = conn.execute(text("PRAGMA page_count")).scalar() * conn.execute(text("PRAGMA page_size")).scalar()
+        try:
+            rows = conn.execute(text(
+                "SELECT COALESCE(m.tbl_name, s.name), SUM(s.pgsize) FROM dbstat s "
+                "LEFT JOIN sqlite_master m ON m.name = s.name GROUP BY 1")).all()
+        except Exception:
+            rows = []
+    sizes = {name: size for name, size in rows}
+    return {
+        "file_bytes": total,
+        "journal_entries_bytes": sizes.get("journal_entries"),
+        "journal_entry_bodies_bytes": sizes.get("journal_entry_bodies", 0) if sizes else None,
+    }
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return round(statistics.median(samples) * 1000, 3)
+
+
+def workload(app, user_ids, repeat, rng):
+    from sqlalchemy import func
+    from models import db, JournalEntry
+    from utils import textstore
+
+    since = datetime.utcnow() - timedelta(days=90)
+
+    def aggregate():
+        db.session.query(JournalEntry.user_id, JournalEntry.sentiment, func.count(JournalEntry.id),
+                         func.avg(JournalEntry.score)).filter(JournalEntry.timestamp >= since).group_by(
+            JournalEntry.user_id, JournalEntry.sentiment).all()
+
+    def list_page():
+        user_id = rng.choice(user_ids)
+        query = textstore.with_bodies(JournalEntry.query.filter_by(user_id=user_id).order_by(
+            JournalEntry.timestamp.desc()).limit(20))
+        [entry.to_dict() for entry in query.all()]
+        db.session.expunge_all()
+
+    def export():
+        user_id = rng.choice(user_ids)
+        query = textstore.with_bodies(JournalEntry.query.filter_by(user_id=user_id).order_by(
+            JournalEntry.timestamp.desc()))
+        [entry.to_dict() for entry in query.all()]
+        db.session.expunge_all()
+
+    with app.app_context():
+        return {
+            "aggregate_ms": timed(aggregate, repeat),
+            "list_ms": timed(list_page, repeat * 10),
+            "export_ms": timed(export, repeat),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--entries-per-user", type=int, default=100)
+    parser.add_argument("--length-median", type=float, default=120, help="median words per entry")
+    parser.add_argument("--min-bytes", type=int, default=256, help="TEXT_COMPRESSION_MIN_BYTES")
+    parser.add_argument("--level", type=int, default=3, help="TEXT_COMPRESSION_LEVEL")
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _configure_env(tmp)
+        os.environ["TEXT_COMPRESSION_MIN_BYTES"] = str(args.min_bytes)
+        os.environ["TEXT_COMPRESSION_LEVEL"] = str(args.level)
+        import corpus
+        from app import app
+        from models import db, User
+        from utils import textstore
+        from utils.hashing import hash_password
+
+        opts = corpus.build_parser().parse_args([
+            "--users", str(args.users), "--entries-per-user", str(args.entries_per_user),
+            "--length-median", str(args.length_median), "--days", "365", "--seed", str(args.seed),
+            "--workers", "1",
+        ])
+        with app.app_context():
+            totals = corpus.generate(db.engine, opts, hash_password("Benchmark1Password"), log=lambda *_: None)
+            user_ids = [user_id for (user_id,) in db.session.query(User.id).all()]
+            before = table_sizes(db)
+
+        results = {"inline": {**before, **workload(app, user_ids, args.repeat, random.Random(args.seed))}}
+
+        with app.app_context():
+            started = time.perf_counter()
+            dictionary = textstore.train()
+            trained = time.perf_counter() - started
+            started = time.perf_counter()
+            converted = textstore.migrate(log=lambda *_: None)
+            migrated = time.perf_counter() - started
+            after = table_sizes(db)
+            info = {"codec": textstore.available_codec(), "dictionary": dictionary.kind,
+                    "dictionary_bytes": len(dictionary.data), "train_s": round(trained, 2),
+                    "migrate_s": round(migrated, 2), "entries_compressed": converted,
+                    "compression_ratio": textstore.stats()["compression_ratio"]}
+
+        results["compressed"] = {**after, **workload(app, user_ids, args.repeat, random.Random(args.seed))}
+
+    print(f"{int(totals['entries'])} entries, {args.users} users; {info['codec']} with a "
+          f"{info['dictionary_bytes']}-byte {info['dictionary']} dictionary")
+    print(f"compressed {converted} entries in {info['migrate_s']}s (text ratio {info['compression_ratio']})")
+    print(f"{'':<11} {'file MB':>9} {'entries MB':>11} {'bodies MB':>10} {'aggregate ms':>13} "
+          f"{'list ms':>8} {'export ms':>10}")
+    mb = lambda v: f"{v / 1e6:.2f}" if v is not None else "-"  # noqa: E731
+    for name, r in results.items():
+        print(f"{name:<11} {mb(r['file_bytes']):>9} {mb(r['journal_entries_bytes']):>11} "
+              f"{mb(r['journal_entry_bodies_bytes']):>10} {r['aggregate_ms']:>13.2f} {r['list_ms']:>8.2f} "
+              f"{r['export_ms']:>10.2f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"users": args.users, "entries": totals["entries"], **info, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
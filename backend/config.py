@@ -1,9 +1,76 @@
 import os
+import logging
 class Config:
     SECRET_KEY = os.environ.get("SECRET_KEY") or "supersecretkey"
     # Prefer env DATABASE_URL; otherwise fallback to a local SQLite file for easy expo demos
     SQLALCHEMY_DATABASE_URI = os.environ.get("DATABASE_URL") or f"sqlite:///mht.db"
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Optional read replica for read-only blueprints; see utils/read_replica.py
+    DATABASE_READ_URL = os.environ.get("DATABASE_READ_URL")
+    READ_REPLICA_BLUEPRINTS = os.environ.get("READ_REPLICA_BLUEPRINTS", "analytics")  # comma-separated
+    READ_REPLICA_STALENESS = float(os.environ.get("READ_REPLICA_STALENESS", "5"))  # seconds on the primary after a user's write
+    # Monthly partitions of journal_entries (PostgreSQL) and cold-entry archival; see utils/partitioning.py
+    ARCHIVE_AFTER_MONTHS = int(os.environ.get("ARCHIVE_AFTER_MONTHS", "0"))  # whole months kept hot; 0 disables
+    ARCHIVE_INTERVAL = float(os.environ.get("ARCHIVE_INTERVAL", "3600"))  # seconds
+    ARCHIVE_BATCH_SIZE = int(os.environ.get("ARCHIVE_BATCH_SIZE", "1000"))
+    PARTITION_MONTHS_AHEAD = int(os.environ.get("PARTITION_MONTHS_AHEAD", "3"))
+    # gzip/brotli response compression; see utils/http_compression.py
+    COMPRESSION_ENABLED = os.environ.get("COMPRESSION_ENABLED", "true").lower() == "true"
+    COMPRESSION_MIN_BYTES = int(os.environ.get("COMPRESSION_MIN_BYTES", "1024"))  # smaller buffered bodies go out as-is
+    COMPRESSION_GZIP_LEVEL = int(os.environ.get("COMPRESSION_GZIP_LEVEL", "6"))  # 1-9
+    COMPRESSION_BROTLI_QUALITY = int(os.environ.get("COMPRESSION_BROTLI_QUALITY", "4"))  # 0-11
+    COMPRESSION_SKIP_PATHS = os.environ.get("COMPRESSION_SKIP_PATHS", "/events/stream")  # comma-separated; SSE must stay unbuffered
+    # Use orjson for API responses when installed; see utils/json_provider.py
+    JSON_NATIVE_ENCODER = os.environ.get("JSON_NATIVE_ENCODER", "true").lower() == "true"
+    # Compressed journal text in journal_entry_bodies; see utils/textstore.py
+    TEXT_COMPRESSION_ENABLED = os.environ.get("TEXT_COMPRESSION_ENABLED", "false").lower() == "true"
+    TEXT_COMPRESSION_LEVEL = int(os.environ.get("TEXT_COMPRESSION_LEVEL", "3"))
+    TEXT_COMPRESSION_MIN_BYTES = int(os.environ.get("TEXT_COMPRESSION_MIN_BYTES", "256"))  # shorter text stays inline
+    TEXT_DICTIONARY_SIZE = int(os.environ.get("TEXT_DICTIONARY_SIZE", "32768"))  # bytes
+    TEXT_DICTIONARY_SAMPLES = int(os.environ.get("TEXT_DICTIONARY_SAMPLES", "10000"))  # newest entries trained on
+    # Sentiment inference: the out-of-process server and the fast first tier; see utils/sentiment.py
+    SENTIMENT_SOCKET = os.environ.get("SENTIMENT_SOCKET")  # unset: run the transformer in-process
+    SENTIMENT_SOCKET_TIMEOUT = float(os.environ.get("SENTIMENT_SOCKET_TIMEOUT", "2"))  # seconds
+    SENTIMENT_SOCKET_POOL_SIZE = int(os.environ.get("SENTIMENT_SOCKET_POOL_SIZE", "8"))
+    SENTIMENT_FALLBACK = os.environ.get("SENTIMENT_FALLBACK", "neutral").lower()  # neutral | local, when the server is down
+    SENTIMENT_FAST_MODEL = os.environ.get("SENTIMENT_FAST_MODEL")  # default: <instance>/sentiment_fast.joblib; "" disables
+    SENTIMENT_FAST_THRESHOLD = float(os.environ.get("SENTIMENT_FAST_THRESHOLD", "0.9"))  # lower-probability texts escalate
+    # Admission control around sentiment inference and the degraded fallback; see utils/admission.py
+    SENTIMENT_MAX_CONCURRENCY = int(os.environ.get("SENTIMENT_MAX_CONCURRENCY", "4"))  # transformer calls in flight per process
+    SENTIMENT_QUEUE_LIMIT = int(os.environ.get("SENTIMENT_QUEUE_LIMIT", "16"))  # requests waiting for a slot; more are shed at once
+    SENTIMENT_QUEUE_TIMEOUT = float(os.environ.get("SENTIMENT_QUEUE_TIMEOUT", "0.5"))  # seconds waiting for a slot
+    SENTIMENT_OVERLOAD_MODE = os.environ.get("SENTIMENT_OVERLOAD_MODE", "lexical").lower()  # lexical | defer
+    SENTIMENT_LEXICAL_CONCURRENCY = int(os.environ.get("SENTIMENT_LEXICAL_CONCURRENCY", "8"))
+    SENTIMENT_DEGRADED_LIMIT = int(os.environ.get("SENTIMENT_DEGRADED_LIMIT", "5000"))  # rescoring backlog before writes get 503
+    SENTIMENT_RETRY_AFTER = int(os.environ.get("SENTIMENT_RETRY_AFTER", "5"))  # seconds, sent with 503
+    SENTIMENT_RESCORE_INTERVAL = float(os.environ.get("SENTIMENT_RESCORE_INTERVAL", "30"))  # seconds
+    SENTIMENT_RESCORE_BATCH = int(os.environ.get("SENTIMENT_RESCORE_BATCH", "50"))
+    # Similar-entry search over per-user float16 vector files; see utils/vector_index.py
+    VECTOR_INDEX_ENABLED = os.environ.get("VECTOR_INDEX_ENABLED", "true").lower() == "true"
+    VECTOR_INDEX_DIR = os.environ.get("VECTOR_INDEX_DIR")  # default: <instance>/vectors
+    EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "auto").lower()  # auto | transformer (in-process model only) | hashed
+    EMBEDDING_DIM = int(os.environ.get("EMBEDDING_DIM", "512"))  # hashed backend; the transformer's is its hidden size
+    VECTOR_CACHE_MB = int(os.environ.get("VECTOR_CACHE_MB", "256"))  # per process, float32 copies of searched users' vectors
+    # Streaming per-user mood statistics and shift detection; see utils/mood_stats.py
+    MOOD_EWMA_ALPHA = float(os.environ.get("MOOD_EWMA_ALPHA", "0.1"))  # weight of the newest entry in score and mood averages
+    MOOD_BASELINE_ALPHA = float(os.environ.get("MOOD_BASELINE_ALPHA", "0.01"))  # valence baseline; slow, so a shift stands out
+    MOOD_TREND_ALPHA = float(os.environ.get("MOOD_TREND_ALPHA", "0.3"))  # valence recent level
+    MOOD_CUSUM_K = float(os.environ.get("MOOD_CUSUM_K", "0.25"))  # allowance per entry, in standard deviations (half the shift to detect)
+    MOOD_CUSUM_H = float(os.environ.get("MOOD_CUSUM_H", "8.0"))  # decision threshold; ~300 entries between false alarms on stable mood
+    MOOD_CUSUM_MIN_ENTRIES = int(os.environ.get("MOOD_CUSUM_MIN_ENTRIES", "20"))
+    # Connection pool (PostgreSQL); see utils/db_engine.py
+    DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "10"))  # seconds waiting for a free connection
+    DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", "1800"))  # seconds; below the server/proxy idle cutoff
+    DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "true").lower() == "true"
+    DB_CONNECT_TIMEOUT = int(os.environ.get("DB_CONNECT_TIMEOUT", "10"))  # seconds
+    DB_STATEMENT_TIMEOUT_MS = int(os.environ.get("DB_STATEMENT_TIMEOUT_MS", "15000"))  # 0 disables
+    # SQLite pragmas applied to every new connection
+    SQLITE_JOURNAL_MODE = os.environ.get("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))  # bytes; 0 disables
     # Mail settings (configure via environment variables)
     MAIL_SERVER = os.environ.get("MAIL_SERVER", "smtp.gmail.com")
     MAIL_PORT = int(os.environ.get("MAIL_PORT", "587"))
@@ -11,4 +78,61 @@ class Config:
     MAIL_USERNAME = os.environ.get("MAIL_USERNAME")  # e.g., your email address
     MAIL_PASSWORD = os.environ.get("MAIL_PASSWORD")  # e.g., app password
     MAIL_FROM = os.environ.get("MAIL_FROM") or os.environ.get("MAIL_USERNAME")
+    # Background sender draining the outbound_emails table
+    MAIL_POLL_INTERVAL = float(os.environ.get("MAIL_POLL_INTERVAL", "5"))  # seconds
+    MAIL_BATCH_SIZE = int(os.environ.get("MAIL_BATCH_SIZE", "20"))
+    MAIL_MAX_ATTEMPTS = int(os.environ.get("MAIL_MAX_ATTEMPTS", "6"))
+    MAIL_BACKOFF_BASE = float(os.environ.get("MAIL_BACKOFF_BASE", "30"))  # seconds, doubled per attempt
+    MAIL_LEASE = float(os.environ.get("MAIL_LEASE", "300"))  # seconds a claimed row stays with its sender
+    MAIL_RETENTION_DAYS = float(os.environ.get("MAIL_RETENTION_DAYS", "7"))  # finished rows (bodies already blanked) are then deleted
+    MAIL_SMTP_TIMEOUT = float(os.environ.get("MAIL_SMTP_TIMEOUT", "10"))
+    MAIL_SMTP_IDLE_TIMEOUT = float(os.environ.get("MAIL_SMTP_IDLE_TIMEOUT", "60"))
+    PASSWORD_RESET_RESPONSE_FLOOR = float(os.environ.get("PASSWORD_RESET_RESPONSE_FLOOR", "0.2"))  # seconds
     FRONTEND_BASE_URL = os.environ.get("FRONTEND_BASE_URL", "http://localhost:5500/frontend/Mental-Health_frontend%201/pages")
+    # Password hashing: bounded process pool and calibrated bcrypt cost
+    BCRYPT_POOL_SIZE = int(os.environ.get("BCRYPT_POOL_SIZE", "2"))
+    BCRYPT_QUEUE_LIMIT = int(os.environ.get("BCRYPT_QUEUE_LIMIT", "32"))
+    BCRYPT_QUEUE_TIMEOUT = float(os.environ.get("BCRYPT_QUEUE_TIMEOUT", "2"))  # seconds waiting for a pool slot
+    BCRYPT_HASH_TIMEOUT = float(os.environ.get("BCRYPT_HASH_TIMEOUT", "5"))  # seconds per hash/check
+    BCRYPT_TARGET_MS = float(os.environ.get("BCRYPT_TARGET_MS", "250"))
+    BCRYPT_MIN_ROUNDS = int(os.environ.get("BCRYPT_MIN_ROUNDS", "10"))  # calibration never goes below this
+    BCRYPT_MAX_ROUNDS = int(os.environ.get("BCRYPT_MAX_ROUNDS", "15"))
+    # Set to pin the cost and skip calibration; recommended in production so every worker agrees
+    BCRYPT_LOG_ROUNDS = os.environ.get("BCRYPT_LOG_ROUNDS")
+    # Per-process cache of JWT identity -> serialized user (profile reads only); see utils/user_cache.py
+    USER_CACHE_TTL = float(os.environ.get("USER_CACHE_TTL", "30"))  # seconds; also how stale other workers can be
+    USER_CACHE_MAX_SIZE = int(os.environ.get("USER_CACHE_MAX_SIZE", "10000"))
+    # Background threads (session sweeper, revocation refresh); disable for one-off scripts
+    BACKGROUND_JOBS_ENABLED = os.environ.get("BACKGROUND_JOBS_ENABLED", "true").lower() == "true"
+    # JWT revocation list and its in-memory Bloom pre-filter
+    REVOCATION_FILTER_CAPACITY = int(os.environ.get("REVOCATION_FILTER_CAPACITY", "10000"))
+    REVOCATION_FILTER_ERROR_RATE = float(os.environ.get("REVOCATION_FILTER_ERROR_RATE", "0.001"))
+    REVOCATION_SYNC_INTERVAL = float(os.environ.get("REVOCATION_SYNC_INTERVAL", "1"))  # seconds another worker may still accept a revoked token; 0 = check every request
+    # Expired user_sessions cleanup (also refreshes the revocation filter)
+    SESSION_SWEEP_INTERVAL = float(os.environ.get("SESSION_SWEEP_INTERVAL", "60"))  # seconds
+    SESSION_SWEEP_BATCH_SIZE = int(os.environ.get("SESSION_SWEEP_BATCH_SIZE", "500"))
+    SESSION_SWEEP_MAX_BATCHES = int(os.environ.get("SESSION_SWEEP_MAX_BATCHES", "100"))
+    # Logging: queued handlers writing stderr and LOG_FILE; LOG_FORMAT=json for structured output
+    LOG_LEVEL = getattr(logging, os.environ.get("LOG_LEVEL", "INFO").upper(), logging.INFO)
+    LOG_FORMAT = os.environ.get("LOG_FORMAT", "text").lower()
+    LOG_FILE = os.environ.get("LOG_FILE", "app.log")  # empty to log to stderr only
+    LOG_MAX_BYTES = int(os.environ.get("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+    LOG_BACKUP_COUNT = int(os.environ.get("LOG_BACKUP_COUNT", "5"))
+    # size: this process rotates LOG_FILE at LOG_MAX_BYTES, safe with one worker only; external: reopen
+    # LOG_FILE after logrotate moves it, so several workers can share it (the default when WEB_CONCURRENCY > 1)
+    LOG_ROTATION = os.environ.get("LOG_ROTATION", "external" if int(os.environ.get("WEB_CONCURRENCY", "1")) > 1 else "size").lower()
+    LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", "10000"))
+    LOG_REQUEST_SAMPLE_RATE = float(os.environ.get("LOG_REQUEST_SAMPLE_RATE", "0.1"))  # fraction of successful requests logged
+    # /stats and /metrics: bearer token for scrapers; unset, only loopback callers are answered
+    # (set it whenever a reverse proxy on the same host forwards public traffic)
+    INTERNAL_API_TOKEN = os.environ.get("INTERNAL_API_TOKEN")
+    # Metrics: set METRICS_DIR (shared by all workers) to aggregate /metrics across processes
+    METRICS_DIR = os.environ.get("METRICS_DIR")
+    METRICS_FLUSH_INTERVAL = float(os.environ.get("METRICS_FLUSH_INTERVAL", "5"))  # seconds
+    # Opt-in request profiler (no hooks are installed unless enabled)
+    PROFILE_ENABLED = os.environ.get("PROFILE_ENABLED", "false").lower() == "true"
+    PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN")  # requests sending "X-Profile: <token>" are always profiled
+    PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+    PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", "5"))
+    PROFILE_KEEP = int(os.environ.get("PROFILE_KEEP", "20"))  # slowest N requests kept on disk
+    PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
@@ -1,8 +1,13 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+import zlib
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.sql import func
 
-db = SQLAlchemy()
+from utils import textstore
+from utils.read_replica import RoutingSession
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -17,6 +22,8 @@ class User(db.Model):
     
     # Relationship
     journal_entries = db.relationship('JournalEntry', backref='user', lazy=True, cascade='all, delete-orphan')
+    archived_entries = db.relationship('ArchivedJournalEntry', lazy=True, cascade='all, delete-orphan')
+    mood_stats = db.relationship('UserMoodStats', uselist=False, lazy=True, cascade='all, delete-orphan')
     
     def __repr__(self):
         return f'<User {self.username}>'
@@ -36,14 +43,35 @@ class JournalEntry(db.Model):
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
-    text = db.Column(db.Text, nullable=False)
+    _text = db.Column('text', db.Text, nullable=False)  # '' when the text is in journal_entry_bodies
     sentiment = db.Column(db.String(20), nullable=False, index=True)
     score = db.Column(db.Float, nullable=False)
+    # 'lexical' or 'deferred' when scored without the transformer under load; cleared by the rescorer (utils/admission.py)
+    sentiment_degraded = db.Column(db.String(16), nullable=True, index=True)
     mood_rating = db.Column(db.Integer, nullable=True)  # 1-10 scale
     tags = db.Column(db.String(200), nullable=True)  # Comma-separated tags
     timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Compressed text (utils/textstore.py); loaded only when the inline column is empty
+    body = db.relationship('JournalEntryBody', uselist=False, lazy='select', cascade='all, delete-orphan',
+                           passive_deletes=True,
+                           primaryjoin='JournalEntry.id == foreign(JournalEntryBody.entry_id)')
+    
+    @hybrid_property
+    def text(self):
+        if self._text:
+            return self._text
+        return self.body.text if self.body is not None else self._text
+    
+    @text.setter
+    def text(self, value):
+        textstore.store(self, value)
+    
+    @text.expression
+    def text(cls):
+        return cls._text
+    
     def __repr__(self):
         return f'<JournalEntry {self.id} by User {self.user_id}>'
     
@@ -54,14 +82,125 @@ class JournalEntry(db.Model):
             'text': self.text,
             'sentiment': self.sentiment,
             'score': self.score,
+            'sentiment_degraded': self.sentiment_degraded,
             'mood_rating': self.mood_rating,
             'tags': self.tags.split(',') if self.tags else [],
             'timestamp': self.timestamp.isoformat() if self.timestamp else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
 
+class ArchivedJournalEntry(db.Model):
+    """Cold copy of a journal entry moved out by the archival job (utils/partitioning.py).
+
+    Keeps the original id; the text is stored zlib-compressed.
+    """
+    __tablename__ = 'journal_entries_archive'
+    __table_args__ = (
+        db.Index('ix_journal_entries_archive_user_id_timestamp', 'user_id', 'timestamp'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    text_z = db.Column(db.LargeBinary, nullable=False)
+    sentiment = db.Column(db.String(20), nullable=False)
+    score = db.Column(db.Float, nullable=False)
+    mood_rating = db.Column(db.Integer, nullable=True)
+    tags = db.Column(db.String(200), nullable=True)
+    timestamp = db.Column(db.DateTime, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=True)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    @property
+    def text(self):
+        return zlib.decompress(self.text_z).decode('utf-8')
+    
+    def __repr__(self):
+        return f'<ArchivedJournalEntry {self.id} by User {self.user_id}>'
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'text': self.text,
+            'sentiment': self.sentiment,
+            'score': self.score,
+            'mood_rating': self.mood_rating,
+            'tags': self.tags.split(',') if self.tags else [],
+            'timestamp': self.timestamp.isoformat() if self.timestamp else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'archived': True
+        }
+
+class JournalEntryBody(db.Model):
+    """Compressed text of a journal entry, see utils/textstore.py.
+
+    No foreign key to journal_entries, because a partitioned parent has no
+    unique id column; JournalEntry deletes clean up their body.
+    """
+    __tablename__ = 'journal_entry_bodies'
+    
+    entry_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    codec = db.Column(db.String(8), nullable=False)  # zstd or zlib
+    dictionary_id = db.Column(db.Integer, nullable=True)  # text_dictionaries.id
+    data = db.Column(db.LargeBinary, nullable=False)
+    
+    @property
+    def text(self):
+        return textstore.decompress(self.codec, self.dictionary_id, self.data)
+    
+    def __repr__(self):
+        return f'<JournalEntryBody {self.entry_id} {self.codec}>'
+
+class TextDictionary(db.Model):
+    """Shared compression dictionary trained from journal text; bodies keep the id they were written with."""
+    __tablename__ = 'text_dictionaries'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(8), nullable=False)  # zstd (trained) or raw (word list)
+    data = db.Column(db.LargeBinary, nullable=False)
+    sample_count = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<TextDictionary {self.id} {self.kind}>'
+
+class UserMoodStats(db.Model):
+    """Streaming per-user mood statistics, updated once per entry write (utils/mood_stats.py).
+
+    Valence is the signed sentiment: +score for POSITIVE, -score for NEGATIVE,
+    0 for NEUTRAL. Means and variances are exponentially weighted.
+    """
+    __tablename__ = 'user_mood_stats'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
+    entry_count = db.Column(db.Integer, nullable=False, default=0)
+    positive_count = db.Column(db.Integer, nullable=False, default=0)
+    negative_count = db.Column(db.Integer, nullable=False, default=0)
+    neutral_count = db.Column(db.Integer, nullable=False, default=0)
+    score_mean = db.Column(db.Float, nullable=False, default=0.0)
+    score_var = db.Column(db.Float, nullable=False, default=0.0)
+    valence_mean = db.Column(db.Float, nullable=False, default=0.0)  # slow baseline for the change detector
+    valence_var = db.Column(db.Float, nullable=False, default=0.0)
+    valence_recent = db.Column(db.Float, nullable=False, default=0.0)  # faster EWMA, compared with the baseline for the trend
+    mood_count = db.Column(db.Integer, nullable=False, default=0)
+    mood_mean = db.Column(db.Float, nullable=False, default=0.0)
+    mood_var = db.Column(db.Float, nullable=False, default=0.0)
+    cusum_up = db.Column(db.Float, nullable=False, default=0.0)
+    cusum_down = db.Column(db.Float, nullable=False, default=0.0)
+    hour_counts = db.Column(db.String(120), nullable=False, default=",".join(["0"] * 24))  # entries per UTC hour
+    last_shift = db.Column(db.String(10), nullable=True)  # improving | declining
+    last_shift_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<UserMoodStats {self.user_id} n={self.entry_count}>'
+
 class UserSession(db.Model):
     __tablename__ = 'user_sessions'
+    __table_args__ = (
+        db.Index('ix_user_sessions_user_id_is_active', 'user_id', 'is_active'),
+        db.Index('ix_user_sessions_expires_at_is_active', 'expires_at', 'is_active'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
@@ -69,6 +208,27 @@ class UserSession(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     expires_at = db.Column(db.DateTime, nullable=False)
     is_active = db.Column(db.Boolean, default=True)
+    revoked_at = db.Column(db.DateTime, nullable=True, index=True)  # other workers poll for revocations newer than their last sync
     
     def __repr__(self):
         return f'<UserSession {self.id} for User {self.user_id}>'
+
+class OutboundEmail(db.Model):
+    __tablename__ = 'outbound_emails'
+    __table_args__ = (
+        db.Index('ix_outbound_emails_status_next_attempt_at', 'status', 'next_attempt_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    to_email = db.Column(db.String(120), nullable=False)
+    subject = db.Column(db.String(200), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending | sending | sent | failed | skipped
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.String(500), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f'<OutboundEmail {self.id} to {self.to_email} ({self.status})>'
@@ -1,13 +1,21 @@
 from flask import Blueprint, jsonify, request
 from models import JournalEntry, User, db
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from sqlalchemy import func, desc
+from sqlalchemy import func
+from utils import entry_records, mood_stats, partitioning
+from utils.json_provider import export_json, json_response
 from datetime import datetime, timedelta
 import logging
 
 analytics_bp = Blueprint("analytics", __name__)
 logger = logging.getLogger(__name__)
 
+def _date_str(value):
+    """func.date() yields date objects on PostgreSQL but 'YYYY-MM-DD' strings on SQLite."""
+    if not value:
+        return ""
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
 @analytics_bp.route("/overview", methods=["GET"])
 @jwt_required()
 def overview():
@@ -15,9 +23,7 @@ def overview():
         user_id = get_jwt_identity()
         
         # Get recent entries for overview
-        recent_entries = JournalEntry.query.filter_by(user_id=user_id).order_by(
-            desc(JournalEntry.timestamp)
-        ).limit(10).all()
+        recent_entries = entry_records.user_entries(user_id, limit=10)
         
         if not recent_entries:
             return jsonify({
@@ -77,6 +83,7 @@ def overview():
                 "recent_entries": [entry.to_dict() for entry in recent_entries[:5]],
                 "sentiment_summary": sentiment_counts,
                 "total_entries": JournalEntry.query.filter_by(user_id=user_id).count()
+                                 + partitioning.count_archived(user_id)
             }
         }), 200
         
@@ -96,47 +103,37 @@ def trends():
             days = 365
         
         start_date = datetime.utcnow() - timedelta(days=days)
+        # Hot entries in range, plus archived ones when the range reaches that far back
+        entries = partitioning.timeline(user_id, start_date)
         
         # Get sentiment distribution
         sentiment_counts = db.session.query(
-            JournalEntry.sentiment,
-            func.count(JournalEntry.id).label('count')
-        ).filter(
-            JournalEntry.user_id == user_id,
-            JournalEntry.timestamp >= start_date
-        ).group_by(JournalEntry.sentiment).all()
+            entries.c.sentiment,
+            func.count(entries.c.id).label('count')
+        ).group_by(entries.c.sentiment).all()
         
         # Get daily sentiment trends
         daily_trends = db.session.query(
-            func.date(JournalEntry.timestamp).label('date'),
-            func.avg(JournalEntry.score).label('avg_score'),
-            func.count(JournalEntry.id).label('entry_count')
-        ).filter(
-            JournalEntry.user_id == user_id,
-            JournalEntry.timestamp >= start_date
-        ).group_by(func.date(JournalEntry.timestamp)).order_by(func.date(JournalEntry.timestamp)).all()
+            func.date(entries.c.timestamp).label('date'),
+            func.avg(entries.c.score).label('avg_score'),
+            func.count(entries.c.id).label('entry_count')
+        ).group_by(func.date(entries.c.timestamp)).order_by(func.date(entries.c.timestamp)).all()
         
         # Get mood rating trends
         mood_trends = db.session.query(
-            func.date(JournalEntry.timestamp).label('date'),
-            func.avg(JournalEntry.mood_rating).label('avg_mood')
+            func.date(entries.c.timestamp).label('date'),
+            func.avg(entries.c.mood_rating).label('avg_mood')
         ).filter(
-            JournalEntry.user_id == user_id,
-            JournalEntry.timestamp >= start_date,
-            JournalEntry.mood_rating.isnot(None)
-        ).group_by(func.date(JournalEntry.timestamp)).order_by(func.date(JournalEntry.timestamp)).all()
+            entries.c.mood_rating.isnot(None)
+        ).group_by(func.date(entries.c.timestamp)).order_by(func.date(entries.c.timestamp)).all()
         
         # Get most common tags - simplified for SQLite compatibility
-        all_entries = JournalEntry.query.filter(
-            JournalEntry.user_id == user_id,
-            JournalEntry.timestamp >= start_date,
-            JournalEntry.tags.isnot(None)
-        ).all()
+        all_tags = db.session.query(entries.c.tags).filter(entries.c.tags.isnot(None)).all()
         
         tag_counts = {}
-        for entry in all_entries:
-            if entry.tags:
-                for tag in entry.tags:
+        for row in all_tags:
+            if row.tags:
+                for tag in row.tags.split(','):
                     tag = tag.strip()
                     if tag:
                         tag_counts[tag] = tag_counts.get(tag, 0) + 1
@@ -152,7 +149,7 @@ def trends():
         daily_trends_formatted = []
         for item in daily_trends:
             daily_trends_formatted.append({
-                "date": item.date.isoformat() if item.date else "",
+                "date": _date_str(item.date),
                 "positive": 0,  # Will be calculated based on sentiment
                 "negative": 0,
                 "neutral": 0
@@ -162,7 +159,7 @@ def trends():
         mood_trends_formatted = []
         for item in mood_trends:
             mood_trends_formatted.append({
-                "date": item.date.isoformat() if item.date else "",
+                "date": _date_str(item.date),
                 "average_mood": float(item.avg_mood) if item.avg_mood else 0
             })
         
@@ -183,44 +180,19 @@ def insights():
     try:
         user_id = get_jwt_identity()
         
-        # Get overall statistics
-        total_entries = JournalEntry.query.filter_by(user_id=user_id).count()
+        # Streaming per-user statistics: one row, whatever the history size (utils/mood_stats.py)
+        stats = mood_stats.get(user_id)
         
-        if total_entries == 0:
+        if stats is None or stats.entry_count == 0:
             return jsonify({
                 "message": "No journal entries found",
                 "insights": "Start writing journal entries to get personalized insights!"
             }), 200
         
-        # Get recent entries for analysis
-        recent_entries = JournalEntry.query.filter_by(user_id=user_id).order_by(
-            desc(JournalEntry.timestamp)
-        ).limit(50).all()
-        
-        # Calculate insights
-        avg_sentiment_score = sum(entry.score for entry in recent_entries) / len(recent_entries)
-        
-        # Sentiment trend (comparing last 10 vs previous 10 entries)
-        if len(recent_entries) >= 20:
-            recent_10 = recent_entries[:10]
-            previous_10 = recent_entries[10:20]
-            
-            recent_avg = sum(entry.score for entry in recent_10) / 10
-            previous_avg = sum(entry.score for entry in previous_10) / 10
-            
-            sentiment_trend = "improving" if recent_avg > previous_avg else "declining" if recent_avg < previous_avg else "stable"
-            trend_strength = abs(recent_avg - previous_avg)
-        else:
-            sentiment_trend = "insufficient data"
-            trend_strength = 0
-        
-        # Most active writing times
-        hour_counts = {}
-        for entry in recent_entries:
-            hour = entry.timestamp.hour
-            hour_counts[hour] = hour_counts.get(hour, 0) + 1
-        
-        peak_hour = max(hour_counts.items(), key=lambda x: x[1])[0] if hour_counts else None
+        total_entries = stats.entry_count
+        avg_sentiment_score = stats.score_mean
+        sentiment_trend = mood_stats.trend(stats)
+        peak_hour = mood_stats.peak_hour(stats)
         
         # Generate personalized insights
         insights = []
@@ -241,23 +213,15 @@ def insights():
         if total_entries >= 30:
             insights.append("You've been consistently journaling! Regular reflection is great for mental health awareness.")
         
-        # Count sentiment entries
-        positive_entries = sum(1 for entry in recent_entries if entry.sentiment == 'POSITIVE')
-        negative_entries = sum(1 for entry in recent_entries if entry.sentiment == 'NEGATIVE')
-        neutral_entries = sum(1 for entry in recent_entries if entry.sentiment == 'NEUTRAL')
-        
-        # Calculate average mood
-        mood_entries = [entry for entry in recent_entries if entry.mood_rating is not None]
-        avg_mood = sum(entry.mood_rating for entry in mood_entries) / len(mood_entries) if mood_entries else 0
-        
         return jsonify({
             "overall_stats": {
                 "total_entries": total_entries,
-                "positive_entries": positive_entries,
-                "negative_entries": negative_entries,
-                "neutral_entries": neutral_entries,
-                "average_mood": round(avg_mood, 1)
+                "positive_entries": stats.positive_count,
+                "negative_entries": stats.negative_count,
+                "neutral_entries": stats.neutral_count,
+                "average_mood": round(stats.mood_mean, 1)
             },
+            "statistics": mood_stats.summary(stats),
             "sentiment_trend": sentiment_trend,
             "peak_writing_times": [f"{peak_hour}:00"] if peak_hour else [],
             "recommendations": insights + [
@@ -285,11 +249,9 @@ def summary():
         
         start_date = datetime.utcnow() - timedelta(days=days)
         
-        # Get summary statistics
-        entries_in_period = JournalEntry.query.filter(
-            JournalEntry.user_id == user_id,
-            JournalEntry.timestamp >= start_date
-        ).all()
+        # Get summary statistics (archived entries included when the period reaches them)
+        entries = partitioning.timeline(user_id, start_date)
+        entries_in_period = db.session.query(entries).all()
         
         if not entries_in_period:
             return jsonify({
@@ -343,33 +305,20 @@ def export_data():
         user_id = get_jwt_identity()
         
         # Get all user entries
-        entries = JournalEntry.query.filter_by(user_id=user_id).order_by(
-            desc(JournalEntry.timestamp)
-        ).all()
+        entries = entry_records.user_entries(user_id)
+        
+        # Entries moved out by the archival job are part of the user's data too
+        entries += partitioning.archived_entries(user_id)
         
         if not entries:
             return jsonify({"error": "No entries found to export"}), 404
         
-        # Format data for export
-        export_data = []
-        for entry in entries:
-            export_data.append({
-                "id": entry.id,
-                "text": entry.text,
-                "sentiment": entry.sentiment,
-                "confidence_score": entry.score,
-                "mood_rating": entry.mood_rating,
-                "tags": entry.tags if entry.tags else [],
-                "created_at": entry.timestamp.isoformat() if entry.timestamp else None,
-                "updated_at": entry.updated_at.isoformat() if entry.updated_at else None
-            })
-        
-        return jsonify({
+        # Entries are encoded straight to JSON bytes, skipping per-entry dicts of isoformat() strings
+        return json_response({
             "message": "Data exported successfully",
-            "total_entries": len(export_data),
-            "export_date": datetime.utcnow().isoformat(),
-            "data": export_data
-        }), 200
+            "total_entries": len(entries),
+            "export_date": datetime.utcnow().isoformat()
+        }, data=export_json(entries))
         
     except Exception as e:
         logger.error(f"Export error: {str(e)}")
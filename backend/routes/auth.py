@@ -1,15 +1,14 @@
 from flask import Blueprint, request, jsonify, current_app
 from models import db, User, UserSession
 from sqlalchemy import or_
-from flask_bcrypt import Bcrypt
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, get_jwt
+from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, get_jwt, get_jti
 from datetime import datetime, timedelta
 import re
 import logging
-import smtplib
-from email.message import EmailMessage
+import time
+from utils.hashing import hash_password, check_password, needs_rehash, HashingUnavailable
+from utils import user_cache, revocation, mailer
 
-bcrypt = Bcrypt()
 auth_bp = Blueprint("auth", __name__)
 logger = logging.getLogger(__name__)
 
@@ -33,6 +32,13 @@ def validate_username(username):
         return False, "Username can only contain letters, numbers, and underscores"
     return True, "Username is valid"
 
+def _issue_session_token(user_id: int) -> str:
+    """Create a 24h access token and record its session so it can be revoked."""
+    expires_delta = timedelta(hours=24)
+    token = create_access_token(identity=str(user_id), expires_delta=expires_delta)
+    revocation.record_session(user_id, get_jti(token), datetime.utcnow() + expires_delta)
+    return token
+
 @auth_bp.route("/signup", methods=["POST"])
 def signup():
     try:
@@ -67,7 +73,7 @@ def signup():
             return jsonify({"error": "Email already registered"}), 409
         
         # Create user
-        hashed_password = bcrypt.generate_password_hash(password).decode("utf-8")
+        hashed_password = hash_password(password)
         new_user = User(
             username=username,
             email=email if email else None,
@@ -75,10 +81,11 @@ def signup():
         )
         
         db.session.add(new_user)
-        db.session.commit()
+        db.session.flush()
         
         # Issue token so the client is authenticated immediately after signup
-        token = create_access_token(identity=str(new_user.id), expires_delta=timedelta(hours=24))
+        token = _issue_session_token(new_user.id)
+        db.session.commit()
         logger.info(f"New user registered: {username}")
         
         return jsonify({
@@ -87,6 +94,10 @@ def signup():
             "token": token
         }), 201
         
+    except HashingUnavailable as e:
+        logger.warning(f"Signup hashing unavailable: {str(e)}")
+        db.session.rollback()
+        return jsonify({"error": "Server busy. Please try again shortly."}), 503
     except Exception as e:
         logger.error(f"Signup error: {str(e)}")
         db.session.rollback()
@@ -109,21 +120,22 @@ def login():
         user = User.query.filter(
             or_(User.username == username, User.email == username)
         ).first()
-        if not user or not bcrypt.check_password_hash(user.password, password):
+        if not user or not check_password(user.password, password):
             return jsonify({"error": "Invalid username or password"}), 401
         
         if not user.is_active:
             return jsonify({"error": "Account is deactivated"}), 403
         
+        # Upgrade the stored hash when its cost is below the calibrated target
+        if needs_rehash(user.password):
+            user.password = hash_password(password)
+        
         # Update last login
         user.last_login = datetime.utcnow()
-        db.session.commit()
         
         # Create access token
-        token = create_access_token(
-            identity=str(user.id),
-            expires_delta=timedelta(hours=24)
-        )
+        token = _issue_session_token(user.id)
+        db.session.commit()
         
         logger.info(f"User logged in: {username}")
         
@@ -133,6 +145,10 @@ def login():
             "user": user.to_dict()
         }), 200
         
+    except HashingUnavailable as e:
+        logger.warning(f"Login hashing unavailable: {str(e)}")
+        db.session.rollback()
+        return jsonify({"error": "Server busy. Please try again shortly."}), 503
     except Exception as e:
         logger.error(f"Login error: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
@@ -141,15 +157,14 @@ def login():
 @jwt_required()
 def get_profile():
     try:
-        user_id = get_jwt_identity()
-        user = User.query.get(user_id)
+        user = user_cache.get_user(get_jwt_identity())
         
         if not user:
             return jsonify({"error": "User not found"}), 404
         
         return jsonify({
             "message": "Profile retrieved successfully",
-            "user": user.to_dict()
+            "user": user
         }), 200
         
     except Exception as e:
@@ -160,15 +175,14 @@ def get_profile():
 @jwt_required()
 def get_current_user():
     try:
-        user_id = get_jwt_identity()
-        user = User.query.get(user_id)
+        user = user_cache.get_user(get_jwt_identity())
         
         if not user:
             return jsonify({"error": "User not found"}), 404
         
         return jsonify({
             "message": "User profile retrieved successfully",
-            "user": user.to_dict()
+            "user": user
         }), 200
         
     except Exception as e:
@@ -179,38 +193,22 @@ def get_current_user():
 @jwt_required()
 def logout():
     try:
-        # In a real app, you might want to blacklist the token
-        # For now, we'll just return success
-        logger.info(f"User logged out: {get_jwt_identity()}")
+        claims = get_jwt()
+        user_id = int(get_jwt_identity())
+        revocation.revoke(user_id, claims["jti"], datetime.utcfromtimestamp(claims["exp"]))
+        db.session.commit()
+        logger.info(f"User logged out: {user_id}")
         return jsonify({"message": "Logged out successfully"}), 200
         
     except Exception as e:
         logger.error(f"Logout error: {str(e)}")
+        db.session.rollback()
         return jsonify({"error": "Internal server error"}), 500
 
 
-def _send_email(to_email: str, subject: str, body: str) -> None:
-    """Send an email using SMTP settings from config."""
-    cfg = current_app.config
-    if not (cfg.get('MAIL_USERNAME') and cfg.get('MAIL_PASSWORD') and cfg.get('MAIL_FROM')):
-        logger.warning("Mail credentials not configured; skipping actual send")
-        return
-
-    msg = EmailMessage()
-    msg['Subject'] = subject
-    msg['From'] = cfg['MAIL_FROM']
-    msg['To'] = to_email
-    msg.set_content(body)
-
-    with smtplib.SMTP(cfg['MAIL_SERVER'], cfg['MAIL_PORT']) as server:
-        if cfg.get('MAIL_USE_TLS'):
-            server.starttls()
-        server.login(cfg['MAIL_USERNAME'], cfg['MAIL_PASSWORD'])
-        server.send_message(msg)
-
-
 @auth_bp.route("/request-password-reset", methods=["POST"])
 def request_password_reset():
+    started = time.monotonic()
     try:
         data = request.get_json() or {}
         email = (data.get('email') or '').strip().lower()
@@ -219,23 +217,28 @@ def request_password_reset():
 
         user = User.query.filter_by(email=email).first()
         # Always respond success to avoid user enumeration
-        # If user exists, send a reset token link
+        # If user exists, queue a reset token link for the background mail sender
         if user:
             token = create_access_token(identity=str(user.id), expires_delta=timedelta(minutes=30))
             reset_link = f"{current_app.config.get('FRONTEND_BASE_URL')}/reset-password.html?token={token}"
-            try:
-                _send_email(
-                    to_email=email,
-                    subject="Reset your Mental Health Monitor password",
-                    body=f"Hello {user.username},\n\nClick the link below to reset your password (valid for 30 minutes):\n{reset_link}\n\nIf you did not request this, you can safely ignore this email."
-                )
-            except Exception as mail_err:
-                logger.error(f"Failed to send reset email: {mail_err}")
+            mailer.enqueue(
+                to_email=email,
+                subject="Reset your Mental Health Monitor password",
+                body=f"Hello {user.username},\n\nClick the link below to reset your password (valid for 30 minutes):\n{reset_link}\n\nIf you did not request this, you can safely ignore this email."
+            )
+            db.session.commit()
+
+        # Pad to a fixed response time so known and unknown emails are indistinguishable
+        floor = current_app.config.get("PASSWORD_RESET_RESPONSE_FLOOR", 0.2)
+        remaining = floor - (time.monotonic() - started)
+        if remaining > 0:
+            time.sleep(remaining)
 
         return jsonify({"message": "If the email exists, a reset link has been sent."}), 200
 
     except Exception as e:
         logger.error(f"Password reset request error: {str(e)}")
+        db.session.rollback()
         return jsonify({"error": "Internal server error"}), 500
 
 
@@ -251,18 +254,27 @@ def reset_password():
         # Decode token by calling a protected method indirectly: create a protected endpoint is overkill; we can use app.jwt_manager._decode_jwt
         from flask_jwt_extended import decode_token
         decoded = decode_token(token)
+        if revocation.is_revoked(decoded['jti']):
+            return jsonify({"error": "Invalid token"}), 400
         user_id = int(decoded.get('sub'))
         user = User.query.get(user_id)
         if not user:
             return jsonify({"error": "Invalid token"}), 400
 
-        # Update password
-        hashed = bcrypt.generate_password_hash(new_password).decode('utf-8')
+        # Update password and sign out every existing session
+        hashed = hash_password(new_password)
         user.password = hashed
+        revocation.revoke_all_for_user(user.id)
+        # Reset links are single-use
+        revocation.revoke(user.id, decoded['jti'], datetime.utcfromtimestamp(decoded['exp']))
         db.session.commit()
 
         return jsonify({"message": "Password reset successfully"}), 200
 
+    except HashingUnavailable as e:
+        logger.warning(f"Password reset hashing unavailable: {str(e)}")
+        db.session.rollback()
+        return jsonify({"error": "Server busy. Please try again shortly."}), 503
     except Exception as e:
         logger.error(f"Password reset error: {str(e)}")
         db.session.rollback()
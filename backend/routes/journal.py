@@ -1,14 +1,21 @@
 from flask import Blueprint, request, jsonify
 from models import db, JournalEntry, User
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from utils.sentiment import analyze_text
 from datetime import datetime, timedelta
 import logging
 from utils.events import publish
+from utils import admission, entry_records, mood_stats, partitioning, vector_index
+from utils.admission import SentimentUnavailable
+from utils.json_provider import entries_json, json_response
 
 journal_bp = Blueprint("journal", __name__)
 logger = logging.getLogger(__name__)
 
+def _busy(e: SentimentUnavailable):
+    response = jsonify({"error": "Server busy. Please try again shortly."})
+    response.headers["Retry-After"] = str(e.retry_after)
+    return response, 503
+
 @journal_bp.route("/entry", methods=["POST"])
 @jwt_required()
 def add_entry():
@@ -33,12 +40,15 @@ def add_entry():
         
         user_id = int(get_jwt_identity())
         
-        # Analyze sentiment using trained model
+        # Analyze sentiment using trained model (degraded under overload; see utils/admission.py)
         try:
-            sentiment, score = analyze_text(text)
+            sentiment, score, degraded = admission.score(text)
+        except SentimentUnavailable as e:
+            logger.warning(f"Sentiment scoring unavailable: {str(e)}")
+            return _busy(e)
         except Exception as e:
             logger.error(f"Sentiment analysis failed: {str(e)}")
-            sentiment, score = "NEUTRAL", 0.5
+            sentiment, score, degraded = "NEUTRAL", 0.5, None
         
         # Create journal entry
         new_entry = JournalEntry(
@@ -46,12 +56,15 @@ def add_entry():
             text=text,
             sentiment=sentiment,
             score=score,
+            sentiment_degraded=degraded,
             mood_rating=mood_rating,
             tags=",".join(tags) if tags else None
         )
         
         db.session.add(new_entry)
         db.session.commit()
+        vector_index.add(user_id, new_entry.id, text)
+        mood_stats.observe(new_entry)
         
         logger.info(f"New journal entry added by user {user_id}")
         # Publish SSE event for real-time updates
@@ -68,7 +81,8 @@ def add_entry():
             "entry": new_entry.to_dict(),
             "sentiment_analysis": {
                 "sentiment": sentiment,
-                "confidence_score": score
+                "confidence_score": score,
+                "degraded": degraded
             }
         }), 201
         
@@ -93,18 +107,22 @@ def preview_entry():
         if len(text) > 10000:  # Limit text length
             return jsonify({"error": "Journal text too long (max 10,000 characters)"}), 400
         
-        # Analyze sentiment using trained model
+        # Analyze sentiment using trained model; nothing is stored, so overload falls back to lexical scoring
         try:
-            sentiment, score = analyze_text(text)
+            sentiment, score, degraded = admission.score(text, persist=False)
+        except SentimentUnavailable as e:
+            logger.warning(f"Sentiment scoring unavailable: {str(e)}")
+            return _busy(e)
         except Exception as e:
             logger.error(f"Sentiment analysis failed: {str(e)}")
-            sentiment, score = "NEUTRAL", 0.5
+            sentiment, score, degraded = "NEUTRAL", 0.5, None
         
         return jsonify({
             "message": "Sentiment analysis completed successfully",
             "sentiment_analysis": {
                 "sentiment": sentiment,
-                "confidence_score": score
+                "confidence_score": score,
+                "degraded": degraded
             }
         }), 200
         
@@ -125,48 +143,41 @@ def get_entries():
         start_date = request.args.get("start_date")
         end_date = request.args.get("end_date")
         
-        # Build query
-        query = JournalEntry.query.filter_by(user_id=user_id)
+        # Build filters
+        criteria = []
         
         if sentiment_filter:
-            query = query.filter_by(sentiment=sentiment_filter.upper())
+            criteria.append(JournalEntry.sentiment == sentiment_filter.upper())
         
         if start_date:
             try:
                 start_dt = datetime.fromisoformat(start_date)
-                query = query.filter(JournalEntry.timestamp >= start_dt)
+                criteria.append(JournalEntry.timestamp >= start_dt)
             except ValueError:
                 return jsonify({"error": "Invalid start_date format. Use ISO format (YYYY-MM-DD)"}), 400
         
         if end_date:
             try:
                 end_dt = datetime.fromisoformat(end_date)
-                query = query.filter(JournalEntry.timestamp <= end_dt)
+                criteria.append(JournalEntry.timestamp <= end_dt)
             except ValueError:
                 return jsonify({"error": "Invalid end_date format. Use ISO format (YYYY-MM-DD)"}), 400
         
-        # Order by timestamp (newest first)
-        query = query.order_by(JournalEntry.timestamp.desc())
-        
-        # Pagination
-        pagination = query.paginate(
-            page=page, per_page=per_page, error_out=False
-        )
-        
-        entries = [entry.to_dict() for entry in pagination.items]
+        # Newest first, read as plain records (no ORM objects)
+        items, pagination = entry_records.paginate(user_id, criteria, page, per_page)
         
-        return jsonify({
+        # Entries are encoded straight to JSON bytes, skipping to_dict()
+        return json_response({
             "message": "Entries retrieved successfully",
-            "entries": entries,
             "pagination": {
                 "page": page,
                 "per_page": per_page,
-                "total": pagination.total,
-                "pages": pagination.pages,
-                "has_next": pagination.has_next,
-                "has_prev": pagination.has_prev
+                "total": pagination["total"],
+                "pages": pagination["pages"],
+                "has_next": pagination["has_next"],
+                "has_prev": pagination["has_prev"]
             }
-        }), 200
+        }, entries=entries_json(items))
         
     except Exception as e:
         logger.error(f"Get entries error: {str(e)}")
@@ -178,6 +189,8 @@ def get_entry(entry_id):
     try:
         user_id = int(get_jwt_identity())
         entry = JournalEntry.query.filter_by(id=entry_id, user_id=user_id).first()
+        if not entry:
+            entry = partitioning.get_archived(entry_id, user_id)
         
         if not entry:
             return jsonify({"error": "Entry not found"}), 404
@@ -199,12 +212,17 @@ def update_entry(entry_id):
         entry = JournalEntry.query.filter_by(id=entry_id, user_id=user_id).first()
         
         if not entry:
+            if partitioning.get_archived(entry_id, user_id):
+                return jsonify({"error": "Archived entries are read-only"}), 409
             return jsonify({"error": "Entry not found"}), 404
         
         data = request.get_json()
         if not data:
             return jsonify({"error": "No data provided"}), 400
         
+        old_sentiment = entry.sentiment
+        was_rated = entry.mood_rating is not None
+        
         # Update fields
         if "text" in data:
             text = data["text"].strip()
@@ -213,14 +231,19 @@ def update_entry(entry_id):
             if len(text) > 10000:
                 return jsonify({"error": "Journal text too long (max 10,000 characters)"}), 400
             
-            entry.text = text
             # Re-analyze sentiment
             try:
-                sentiment, score = analyze_text(text)
+                sentiment, score, degraded = admission.score(text)
                 entry.sentiment = sentiment
                 entry.score = score
+                entry.sentiment_degraded = degraded
+            except SentimentUnavailable as e:
+                logger.warning(f"Sentiment scoring unavailable: {str(e)}")
+                db.session.rollback()
+                return _busy(e)
             except Exception as e:
                 logger.error(f"Sentiment analysis failed: {str(e)}")
+            entry.text = text
         
         if "mood_rating" in data:
             mood_rating = data["mood_rating"]
@@ -234,7 +257,10 @@ def update_entry(entry_id):
                 entry.tags = ",".join(tags) if tags else None
         
         entry.updated_at = datetime.utcnow()
+        mood_stats.relabel(user_id, old_sentiment, entry.sentiment, was_rated, entry.mood_rating is not None)
         db.session.commit()
+        if "text" in data:
+            vector_index.add(user_id, entry.id, entry.text)
         
         logger.info(f"Journal entry {entry_id} updated by user {user_id}")
         
@@ -254,12 +280,17 @@ def delete_entry(entry_id):
     try:
         user_id = get_jwt_identity()
         entry = JournalEntry.query.filter_by(id=entry_id, user_id=user_id).first()
+        if not entry:
+            # Archived entries cannot be edited, but a user can still delete them
+            entry = partitioning.get_archived(entry_id, int(user_id))
         
         if not entry:
             return jsonify({"error": "Entry not found"}), 404
         
         db.session.delete(entry)
+        mood_stats.forget(entry)
         db.session.commit()
+        vector_index.remove(int(user_id), entry_id)
         
         logger.info(f"Journal entry {entry_id} deleted by user {user_id}")
         
@@ -280,11 +311,8 @@ def search_entries():
         if not query_text:
             return jsonify({"error": "Search query is required"}), 400
         
-        # Search in text content
-        entries = JournalEntry.query.filter(
-            JournalEntry.user_id == user_id,
-            JournalEntry.text.ilike(f"%{query_text}%")
-        ).order_by(JournalEntry.timestamp.desc()).limit(50).all()
+        # Search in text content (newest 50 matches)
+        entries = entry_records.search(user_id, query_text, 50)
         
         results = [entry.to_dict() for entry in entries]
         
@@ -298,3 +326,38 @@ def search_entries():
     except Exception as e:
         logger.error(f"Search error: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
+
+@journal_bp.route("/similar/<int:entry_id>", methods=["GET"])
+@jwt_required()
+def similar_entries(entry_id):
+    try:
+        user_id = int(get_jwt_identity())
+        limit = min(max(request.args.get("limit", 10, type=int), 1), 50)
+        
+        table = JournalEntry.__table__
+        found = entry_records.fetch(entry_records.entry_select(table.c.id == entry_id, table.c.user_id == user_id))
+        if not found:
+            return jsonify({"error": "Entry not found"}), 404
+        
+        try:
+            matches = vector_index.similar(user_id, entry_id, found[0].text, limit)
+        except vector_index.IndexUnavailable as e:
+            logger.warning(f"Similarity search unavailable: {str(e)}")
+            return jsonify({"error": "Similarity search is unavailable right now"}), 503
+        
+        # Matches that were deleted or archived since they were indexed drop out here
+        scores = dict(matches)
+        records = {r.id: r for r in entry_records.fetch(entry_records.entry_select(
+            table.c.id.in_(list(scores)), table.c.user_id == user_id))} if scores else {}
+        results = [{**records[i].to_dict(), "similarity": round(scores[i], 4)} for i, _ in matches if i in records]
+        
+        return jsonify({
+            "message": "Similar entries retrieved successfully",
+            "entry_id": entry_id,
+            "results": results,
+            "count": len(results)
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Similar entries error: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
@@ -0,0 +1,41 @@
+"""Shared fixtures: one app against a throwaway SQLite database per test session.
+
+The environment is set before `app` is imported, because config.py reads it
+at import time and app.py initialises every module on import.
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+_tmpdir = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir.name, 'tests.db')}"
+os.environ["BACKGROUND_JOBS_ENABLED"] = "false"
+os.environ["BCRYPT_LOG_ROUNDS"] = "4"
+os.environ["LOG_FILE"] = ""
+os.environ["LOG_LEVEL"] = "WARNING"
+os.environ["PASSWORD_RESET_RESPONSE_FLOOR"] = "0"
+os.environ["VECTOR_INDEX_DIR"] = os.path.join(_tmpdir.name, "vectors")
+sys.path.insert(0, BACKEND_DIR)
+
+
+@pytest.fixture(scope="session")
+def app():
+    from app import app as flask_app
+    return flask_app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def app_context(app):
+    from models import db
+    with app.app_context():
+        yield
+        db.session.rollback()
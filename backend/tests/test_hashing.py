@@ -0,0 +1,34 @@
+"""The bounded bcrypt pool (utils/hashing.py)."""
+import threading
+import time
+
+import pytest
+
+from utils import hashing
+
+
+def test_timed_out_hash_keeps_its_slot_until_it_finishes(app, monkeypatch):
+    slots = threading.BoundedSemaphore(2)
+    monkeypatch.setattr(hashing, "_slots", slots)
+    monkeypatch.setitem(hashing._settings, "hash_timeout", 0.05)
+    monkeypatch.setitem(hashing._settings, "queue_timeout", 0.01)
+
+    with pytest.raises(hashing.HashingUnavailable, match="timed out"):
+        hashing._run("hash", time.sleep, 0.5)
+    # The sleep is still running in a worker, so only one slot is free
+    assert slots.acquire(blocking=False)
+    assert not slots.acquire(blocking=False)
+    slots.release()
+
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline and slots._value < 2:
+        time.sleep(0.05)
+    assert slots._value == 2
+
+
+def test_needs_rehash_only_upgrades(monkeypatch):
+    monkeypatch.setitem(hashing._settings, "rounds", 12)
+    assert hashing.needs_rehash("$2b$10$" + "x" * 53)
+    assert not hashing.needs_rehash("$2b$12$" + "x" * 53)
+    assert not hashing.needs_rehash("$2b$14$" + "x" * 53)
+    assert hashing.needs_rehash("not-a-bcrypt-hash")
@@ -0,0 +1,13 @@
+"""`import app` stays free of the heavy modules in benchmarks/import_time.py's FORBIDDEN list.
+
+The time budget is left to the benchmark itself: it is too noisy for CI.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "benchmarks"))
+import import_time  # noqa: E402
+
+
+def test_import_app_loads_no_heavy_modules():
+    assert import_time.heavy_modules(import_time.measure("app")) == []
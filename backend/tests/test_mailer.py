@@ -0,0 +1,193 @@
+"""The outbound_emails outbox (utils/mailer.py) against a local SMTP server (aiosmtpd)."""
+import socket
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from aiosmtpd.controller import Controller
+
+from models import db, OutboundEmail, User
+from utils import mailer
+
+
+class RecordingHandler:
+    """Accepts every message, or answers 451 while `failing` is set."""
+
+    def __init__(self):
+        self.messages = []
+        self.failing = False
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.failing:
+            return "451 Try again later"
+        self.messages.append(envelope)
+        return "250 OK"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server():
+    handler = RecordingHandler()
+    controller = Controller(handler, hostname="127.0.0.1", port=_free_port())
+    controller.start()
+    yield controller, handler
+    controller.stop()
+
+
+@pytest.fixture
+def mail_cfg(app, smtp_server):
+    controller, _ = smtp_server
+    return {**app.config, "MAIL_SERVER": controller.hostname, "MAIL_PORT": controller.port,
+            "MAIL_USE_TLS": False, "MAIL_USERNAME": None, "MAIL_PASSWORD": None,
+            "MAIL_FROM": "noreply@example.com"}
+
+
+@pytest.fixture
+def outbox(app_context):
+    OutboundEmail.query.delete()
+    db.session.commit()
+    yield
+    OutboundEmail.query.delete()
+    db.session.commit()
+
+
+def _queue(body="Hello"):
+    mailer.enqueue("someone@example.com", "Subject", body)
+    db.session.commit()
+    return OutboundEmail.query.order_by(OutboundEmail.id.desc()).first().id
+
+
+def test_sends_over_smtp_and_blanks_the_body(outbox, mail_cfg, smtp_server):
+    _, handler = smtp_server
+    email_id = _queue("reset link: https://example.com/?token=secret")
+    connection = mailer.SMTPConnection(mail_cfg)
+    try:
+        assert mailer.send_pending(mail_cfg, connection) == 1
+    finally:
+        connection.close()
+
+    assert len(handler.messages) == 1
+    assert handler.messages[0].rcpt_tos == ["someone@example.com"]
+    assert b"token=secret" in handler.messages[0].content
+    email = db.session.get(OutboundEmail, email_id)
+    assert email.status == "sent" and email.attempts == 1 and email.sent_at is not None
+    assert email.body == ""
+
+
+def test_reuses_one_connection_across_a_batch(outbox, mail_cfg, smtp_server):
+    _, handler = smtp_server
+    for i in range(3):
+        _queue(f"message {i}")
+    connection = mailer.SMTPConnection(mail_cfg)
+    opened = mailer.stats()["connections"]
+    try:
+        assert mailer.send_pending(mail_cfg, connection) == 3
+    finally:
+        connection.close()
+    assert len(handler.messages) == 3
+    assert mailer.stats()["connections"] == opened + 1
+
+
+def test_failed_send_backs_off_then_gives_up(outbox, mail_cfg, smtp_server, monkeypatch):
+    _, handler = smtp_server
+    handler.failing = True
+    monkeypatch.setitem(mailer._settings, "max_attempts", 2)
+    monkeypatch.setitem(mailer._settings, "backoff_base", 30.0)
+    email_id = _queue()
+    connection = mailer.SMTPConnection(mail_cfg)
+    try:
+        before = datetime.utcnow()
+        assert mailer.send_pending(mail_cfg, connection) == 1
+        email = db.session.get(OutboundEmail, email_id)
+        assert email.status == "pending" and email.attempts == 1
+        assert "451" in email.last_error
+        # First retry after backoff_base, jittered by +-20%
+        delay = (email.next_attempt_at - before).total_seconds()
+        assert 30 * 0.8 - 1 <= delay <= 30 * 1.2 + 1
+        assert email.body == "Hello"
+
+        # Not due yet: nothing to claim
+        assert mailer.send_pending(mail_cfg, connection) == 0
+
+        email.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+        db.session.commit()
+        assert mailer.send_pending(mail_cfg, connection) == 1
+        email = db.session.get(OutboundEmail, email_id)
+        assert email.status == "failed" and email.attempts == 2
+        assert email.body == ""
+    finally:
+        connection.close()
+    assert handler.messages == []
+
+
+def test_backoff_doubles_and_is_capped(monkeypatch):
+    monkeypatch.setitem(mailer._settings, "backoff_base", 30.0)
+    monkeypatch.setitem(mailer._settings, "backoff_max", 3600.0)
+    monkeypatch.setattr(mailer.random, "uniform", lambda a, b: 1.0)
+    assert [mailer._backoff(n) for n in (1, 2, 3)] == [30.0, 60.0, 120.0]
+    assert mailer._backoff(20) == 3600.0
+
+
+def test_leased_rows_are_reclaimed_after_expiry(outbox, mail_cfg, smtp_server):
+    _, handler = smtp_server
+    email_id = _queue()
+    # A sender claims the row, then dies before sending
+    claimed = mailer._claim_batch()
+    assert [email.id for email in claimed] == [email_id]
+    assert db.session.get(OutboundEmail, email_id).status == "sending"
+
+    # While the lease holds, no other sender can take it
+    assert mailer._claim_batch() == []
+
+    OutboundEmail.query.filter_by(id=email_id).update(
+        {"next_attempt_at": datetime.utcnow() - timedelta(seconds=1)})
+    db.session.commit()
+    connection = mailer.SMTPConnection(mail_cfg)
+    try:
+        assert mailer.send_pending(mail_cfg, connection) == 1
+        assert mailer.send_pending(mail_cfg, connection) == 0
+    finally:
+        connection.close()
+    assert len(handler.messages) == 1
+    assert db.session.get(OutboundEmail, email_id).status == "sent"
+
+
+def test_purge_deletes_only_old_finished_rows(outbox):
+    old = datetime.utcnow() - timedelta(days=30)
+    db.session.add_all([
+        OutboundEmail(to_email="a@example.com", subject="s", body="", status="sent", created_at=old),
+        OutboundEmail(to_email="b@example.com", subject="s", body="", status="failed", created_at=old),
+        OutboundEmail(to_email="c@example.com", subject="s", body="x", status="pending", created_at=old),
+        OutboundEmail(to_email="d@example.com", subject="s", body="", status="sent"),
+    ])
+    db.session.commit()
+    assert mailer.purge() == 2
+    assert sorted(e.to_email for e in OutboundEmail.query.all()) == ["c@example.com", "d@example.com"]
+
+
+def test_reset_request_takes_the_same_time_for_known_and_unknown_emails(app, client, outbox, monkeypatch):
+    from utils.hashing import hash_password
+
+    if User.query.filter_by(email="known@example.com").first() is None:
+        db.session.add(User(username="known_user", email="known@example.com", password=hash_password("Known1Password")))
+        db.session.commit()
+    monkeypatch.setitem(app.config, "PASSWORD_RESET_RESPONSE_FLOOR", 0.2)
+
+    def timed(email):
+        started = time.perf_counter()
+        response = client.post("/auth/request-password-reset", json={"email": email})
+        return response, time.perf_counter() - started
+
+    known, known_s = timed("known@example.com")
+    unknown, unknown_s = timed("nobody@example.com")
+    assert known.status_code == unknown.status_code == 200
+    assert known.get_json() == unknown.get_json()
+    assert known_s >= 0.2 and unknown_s >= 0.2
+    assert abs(known_s - unknown_s) < 0.05
+    # Only the known address was queued, and the request never talked to SMTP itself
+    assert [e.to_email for e in OutboundEmail.query.all()] == ["known@example.com"]
@@ -0,0 +1,33 @@
+"""Per-thread shards and per-process files in utils/metrics.py do not pile up."""
+import json
+import os
+import threading
+
+from utils import metrics
+
+
+def test_finished_threads_are_folded_when_a_new_shard_registers():
+    def work():
+        metrics.inc("test_shard_total")
+
+    for _ in range(20):
+        thread = threading.Thread(target=work)
+        thread.start()
+        thread.join()
+    with metrics._registry_lock:
+        assert sum(1 for thread, _ in metrics._shards if not thread.is_alive()) <= 1
+    assert metrics.snapshot()[("test_shard_total", ())] == 20
+
+
+def test_files_of_exited_processes_are_folded_into_the_retired_file(tmp_path, monkeypatch):
+    monkeypatch.setitem(metrics._settings, "dir", str(tmp_path))
+    counters = metrics._encode({("test_requests_total", ()): 3})
+    for pid in (os.getpid(), 2 ** 22 + 1):  # left over from before a restart, and long gone
+        (tmp_path / f"metrics-{pid}.json").write_text(json.dumps({"counters": counters, "gauges": [], "written_at": 0}))
+    live = tmp_path / f"metrics-{os.getppid()}.json"
+    live.write_text(json.dumps({"counters": counters, "gauges": [], "written_at": 0}))
+
+    metrics._retire_exited_processes()
+    metrics._retire_exited_processes()
+    assert sorted(p.name for p in tmp_path.glob("*.json")) == sorted([live.name, metrics.RETIRED_FILE])
+    assert metrics.collect()[0].get(("test_requests_total", ())) == 9
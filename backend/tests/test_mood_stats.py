@@ -0,0 +1,112 @@
+"""Per-user mood statistics (utils/mood_stats.py) kept in step with entry writes."""
+import os
+from datetime import datetime
+
+import pytest
+from flask import g
+from sqlalchemy import create_engine
+
+from models import db, JournalEntry, User, UserMoodStats
+from utils import mood_stats, read_replica, sentiment
+from utils.hashing import hash_password
+
+PASSWORD = "MoodStats1Password"
+COUNTS = ("entry_count", "positive_count", "negative_count", "neutral_count", "mood_count", "hour_counts")
+
+
+@pytest.fixture
+def user(app, client, monkeypatch):
+    monkeypatch.setattr(sentiment, "analyze_fast", lambda text: None)
+    monkeypatch.setattr(sentiment, "analyze_model",
+                        lambda text: ("POSITIVE", 0.9) if "good" in text else ("NEGATIVE", 0.8))
+    with app.app_context():
+        user = User.query.filter_by(username="mood_stats_user").first()
+        if user is None:
+            user = User(username="mood_stats_user", email="mood_stats@example.com", password=hash_password(PASSWORD))
+            db.session.add(user)
+            db.session.commit()
+        user_id = user.id
+    token = client.post("/auth/login", json={"username": "mood_stats_user", "password": PASSWORD}).get_json()["token"]
+    yield user_id, {"Authorization": f"Bearer {token}"}
+    with app.app_context():
+        JournalEntry.query.filter_by(user_id=user_id).delete()
+        UserMoodStats.query.filter_by(user_id=user_id).delete()
+        db.session.commit()
+
+
+def _counts(stats):
+    return {name: getattr(stats, name) for name in COUNTS}
+
+
+def test_counts_follow_edits_and_deletes(app, client, user):
+    user_id, headers = user
+    ids = []
+    for text, rating in (("a good day", 8), ("a rough day", 3), ("a good walk", None), ("tired", 5)):
+        response = client.post("/journal/entry", json={"text": text, "mood_rating": rating}, headers=headers)
+        assert response.status_code == 201
+        ids.append(response.get_json()["entry"]["id"])
+
+    assert client.put(f"/journal/entry/{ids[0]}", json={"text": "bad after all", "mood_rating": None},
+                      headers=headers).status_code == 200
+    assert client.put(f"/journal/entry/{ids[2]}", json={"mood_rating": 6}, headers=headers).status_code == 200
+    assert client.delete(f"/journal/entry/{ids[1]}", headers=headers).status_code == 200
+
+    with app.app_context():
+        stored = _counts(db.session.get(UserMoodStats, user_id))
+        assert stored == _counts(mood_stats.build(user_id))
+        assert stored["entry_count"] == 3 and stored["mood_count"] == 2
+        assert (stored["positive_count"], stored["negative_count"]) == (1, 2)
+
+
+def test_failed_update_drops_the_row_for_a_rebuild(app, user, monkeypatch):
+    user_id, _ = user
+    with app.app_context():
+        for i in range(2):
+            db.session.add(JournalEntry(user_id=user_id, text=f"entry {i}", sentiment="NEUTRAL", score=0.5,
+                                        mood_rating=5, timestamp=datetime(2026, 1, 1 + i, 9)))
+        db.session.commit()
+        assert mood_stats.get(user_id).entry_count == 2
+
+        entry = JournalEntry(user_id=user_id, text="one more", sentiment="POSITIVE", score=0.9,
+                             timestamp=datetime(2026, 1, 5, 21))
+        db.session.add(entry)
+        db.session.commit()
+
+        def broken(*args):
+            raise RuntimeError("disk full")
+
+        monkeypatch.setattr(mood_stats, "apply", broken)
+        failures = mood_stats.stats()["failures"]
+        mood_stats.observe(entry)
+        assert mood_stats.stats()["failures"] == failures + 1
+        db.session.expire_all()
+        assert db.session.get(UserMoodStats, user_id) is None
+
+        monkeypatch.undo()
+        rebuilt = mood_stats.get(user_id)
+        assert rebuilt.entry_count == 3 and rebuilt.positive_count == 1
+
+
+def test_first_build_on_a_replica_request_uses_the_primary(app, user, tmp_path, monkeypatch):
+    user_id, _ = user
+    # A replica that has not received any of the user's entries yet
+    engine = create_engine(f"sqlite:///{os.path.join(tmp_path, 'replica.db')}")
+    with app.app_context():
+        db.metadata.create_all(engine)
+        db.engines["replica"] = engine
+        for i in range(2):
+            db.session.add(JournalEntry(user_id=user_id, text=f"entry {i}", sentiment="POSITIVE", score=0.9,
+                                        timestamp=datetime(2026, 2, 1 + i, 9)))
+        db.session.commit()
+    monkeypatch.setitem(read_replica._settings, "enabled", True)
+    try:
+        with app.test_request_context("/analytics/insights"):
+            g.read_replica = True
+            assert JournalEntry.query.filter_by(user_id=user_id).count() == 0
+            assert mood_stats.get(user_id).entry_count == 2
+    finally:
+        with app.app_context():
+            db.engines.pop("replica")
+        engine.dispose()
+    with app.app_context():
+        assert db.session.get(UserMoodStats, user_id).positive_count == 2
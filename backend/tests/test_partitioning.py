@@ -0,0 +1,69 @@
+"""Archived entries (utils/partitioning.py): found by date, counted, read-only but deletable."""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from models import db, ArchivedJournalEntry, JournalEntry, User
+from utils import partitioning
+from utils.hashing import hash_password
+
+PASSWORD = "Archive1Password"
+
+
+@pytest.fixture
+def user(app, client, monkeypatch):
+    monkeypatch.setitem(partitioning._settings, "after_months", 0)
+    with app.app_context():
+        user = User.query.filter_by(username="archive_user").first()
+        if user is None:
+            user = User(username="archive_user", email="archive@example.com", password=hash_password(PASSWORD))
+            db.session.add(user)
+            db.session.commit()
+        user_id = user.id
+    token = client.post("/auth/login", json={"username": "archive_user", "password": PASSWORD}).get_json()["token"]
+    yield user_id, {"Authorization": f"Bearer {token}"}
+    with app.app_context():
+        for model in (JournalEntry, ArchivedJournalEntry):
+            for entry in model.query.filter_by(user_id=user_id).all():
+                db.session.delete(entry)
+        db.session.commit()
+        partitioning.refresh_archive_max()
+
+
+def _add(user_id, months_ago):
+    entry = JournalEntry(user_id=user_id, text=f"{months_ago} months ago", sentiment="NEUTRAL", score=0.5,
+                         timestamp=partitioning.month_start(datetime.utcnow(), months_ago) + timedelta(days=3))
+    db.session.add(entry)
+    db.session.commit()
+    return entry.id
+
+
+def test_raising_archive_after_months_keeps_archived_rows_in_the_timeline(app, user, monkeypatch):
+    user_id, _ = user
+    with app.app_context():
+        ids = {months: _add(user_id, months) for months in (1, 5, 14)}
+        monkeypatch.setitem(partitioning._settings, "after_months", 3)
+        assert partitioning.archive_before(partitioning.month_start(datetime.utcnow(), 3)) == 2
+
+        # Archiving now stops at 12 months; the 5-month-old entry stays in the archive
+        monkeypatch.setitem(partitioning._settings, "after_months", 12)
+        start = partitioning.month_start(datetime.utcnow(), 6)
+        history = partitioning.timeline(user_id, start)
+        assert sorted(db.session.execute(select(history.c.id)).scalars()) == sorted([ids[1], ids[5]])
+
+
+def test_archived_entries_are_counted_read_only_and_deletable(app, client, user):
+    user_id, headers = user
+    with app.app_context():
+        _add(user_id, 1)
+        archived_id = _add(user_id, 14)
+        partitioning.archive_before(partitioning.month_start(datetime.utcnow(), 12))
+
+    overview = client.get("/analytics/overview", headers=headers).get_json()["overview"]
+    assert overview["total_entries"] == 2
+    response = client.put(f"/journal/entry/{archived_id}", json={"mood_rating": 4}, headers=headers)
+    assert response.status_code == 409
+    assert client.delete(f"/journal/entry/{archived_id}", headers=headers).status_code == 200
+    assert client.get(f"/journal/entry/{archived_id}", headers=headers).status_code == 404
+    assert client.get("/analytics/overview", headers=headers).get_json()["overview"]["total_entries"] == 1
@@ -0,0 +1,36 @@
+"""SQL query-count budgets per endpoint, against benchmarks/query_budgets.json.
+
+The scenarios and recorder live in benchmarks/query_budgets.py, which also
+re-records the budgets (--update) after an intended change.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "benchmarks"))
+import query_budgets  # noqa: E402
+
+BUDGETS = query_budgets.load_budgets()
+
+
+@pytest.fixture(scope="module")
+def recorded(app):
+    # The scenarios run in order (the last ones delete an entry and log out), so record them all once
+    saved = query_budgets.prepare()
+    try:
+        users = query_budgets.seed(app)
+        yield query_budgets.record(app, users)
+    finally:
+        query_budgets.restore(saved)
+
+
+@pytest.mark.parametrize("endpoint", list(BUDGETS))
+def test_endpoint_within_budget(recorded, endpoint):
+    assert endpoint in recorded, f"{endpoint} has a budget but no scenario"
+    failures = query_budgets.check_endpoint(endpoint, recorded[endpoint], BUDGETS[endpoint])
+    assert not failures, "\n".join(query_budgets.describe(endpoint, *failure) for failure in failures)
+
+
+def test_every_endpoint_has_a_budget(recorded):
+    assert sorted(set(recorded) - set(BUDGETS)) == []
@@ -0,0 +1,108 @@
+"""Replica routing and cross-process read-your-writes (utils/read_replica.py).
+
+The replica is a second SQLite database with the same schema that never
+receives the primary's writes, so whichever database a read went to shows
+in the response.
+"""
+import os
+import time
+
+import pytest
+from flask import g
+from sqlalchemy import create_engine
+
+from models import db, JournalEntry, User
+from utils import read_replica
+from utils.hashing import hash_password
+
+PASSWORD = "Replica1Password"
+
+
+@pytest.fixture
+def replica(app, tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{os.path.join(tmp_path, 'replica.db')}")
+    with app.app_context():
+        db.metadata.create_all(engine)
+        db.engines["replica"] = engine
+    monkeypatch.setitem(read_replica._settings, "enabled", True)
+    monkeypatch.setitem(read_replica._settings, "blueprints", frozenset({"analytics"}))
+    monkeypatch.setitem(read_replica._settings, "staleness", 5.0)
+    read_replica._last_write.clear()
+    yield engine
+    with app.app_context():
+        db.engines.pop("replica")
+    engine.dispose()
+    read_replica._last_write.clear()
+
+
+@pytest.fixture
+def headers(app, client):
+    with app.app_context():
+        if User.query.filter_by(username="replica_user").first() is None:
+            db.session.add(User(username="replica_user", email="replica@example.com",
+                                password=hash_password(PASSWORD)))
+            db.session.commit()
+    response = client.post("/auth/login", json={"username": "replica_user", "password": PASSWORD})
+    return {"Authorization": f"Bearer {response.get_json()['token']}"}
+
+
+def _recent_entries(client, headers):
+    response = client.get("/analytics/overview", headers=headers)
+    assert response.status_code == 200
+    return len(response.get_json()["overview"]["recent_entries"])
+
+
+def test_write_is_visible_to_another_process_that_gets_the_header(replica, client, headers, monkeypatch):
+    from utils import sentiment
+
+    monkeypatch.setattr(sentiment, "analyze_model", lambda text: ("POSITIVE", 0.9))
+    response = client.post("/journal/entry", json={"text": "A good day", "mood_rating": 7}, headers=headers)
+    assert response.status_code == 201
+    written_at = response.headers[read_replica.LAST_WRITE_HEADER]
+    assert abs(float(written_at) - time.time()) < 5
+
+    # Another worker process never saw the write: only the header can keep it on the primary
+    read_replica._last_write.clear()
+    assert _recent_entries(client, {**headers, read_replica.LAST_WRITE_HEADER: written_at}) >= 1
+    assert _recent_entries(client, headers) == 0
+
+    stale = f"{time.time() - 10:.3f}"
+    assert _recent_entries(client, {**headers, read_replica.LAST_WRITE_HEADER: stale}) == 0
+    assert _recent_entries(client, {**headers, read_replica.LAST_WRITE_HEADER: "garbage"}) == 0
+
+
+def test_same_process_writes_still_pin_reads_without_the_header(replica, app, client, headers):
+    with app.app_context():
+        user_id = User.query.filter_by(username="replica_user").first().id
+        db.session.add(JournalEntry(user_id=user_id, text="Written here", sentiment="NEUTRAL", score=0.5))
+        db.session.commit()
+    assert read_replica.recently_wrote(user_id)
+    assert _recent_entries(client, headers) >= 1
+
+    read_replica._last_write.clear()
+    assert _recent_entries(client, headers) == 0
+
+
+def test_reads_do_not_set_the_header(replica, client, headers):
+    response = client.get("/analytics/overview", headers=headers)
+    assert response.status_code == 200
+    assert read_replica.LAST_WRITE_HEADER not in response.headers
+
+
+def test_primary_block_reads_the_primary_on_a_replica_request(replica, app, headers):
+    with app.app_context():
+        user_id = User.query.filter_by(username="replica_user").first().id
+        db.session.add(JournalEntry(user_id=user_id, text="Only on the primary", sentiment="NEUTRAL", score=0.5))
+        db.session.commit()
+
+    def count():
+        return JournalEntry.query.filter_by(user_id=user_id).count()
+
+    with app.test_request_context("/analytics/overview"):
+        g.read_replica = True
+        assert count() == 0
+        with read_replica.primary():
+            assert count() >= 1
+            db.session.rollback()  # a rollback (as after an IntegrityError) does not end the pin
+            assert count() >= 1
+        assert count() == 0
@@ -0,0 +1,47 @@
+"""The revoked-token filter (utils/revocation.py) without the background sweeper."""
+import uuid
+from datetime import datetime, timedelta
+
+from models import db, UserSession
+from utils import revocation
+from utils.bloom import BloomFilter
+
+
+def _revoke_elsewhere(count, revoked_at=None):
+    # Rows revoked by another worker: in the table, not in this process's filter
+    revoked_at = revoked_at or datetime.utcnow()
+    jtis = [uuid.uuid4().hex for _ in range(count)]
+    db.session.add_all([UserSession(user_id=1, session_token=jti, expires_at=datetime.utcnow() + timedelta(hours=1),
+                                    is_active=False, revoked_at=revoked_at) for jti in jtis])
+    db.session.commit()
+    return jtis
+
+
+def test_sync_takes_its_watermark_from_the_rows(app_context):
+    revocation.rebuild()
+    stamp = datetime(2031, 1, 1, 12, 0, 0)
+    jtis = _revoke_elsewhere(2, revoked_at=stamp)
+    assert revocation.sync() >= 2
+    assert revocation._synced["at"] == stamp
+    assert all(jti in revocation._filter for jti in jtis)
+    UserSession.query.filter(UserSession.session_token.in_(jtis)).delete()
+    db.session.commit()
+    revocation.rebuild()
+
+
+def test_filter_stays_bounded_without_the_sweeper(app_context, monkeypatch):
+    monkeypatch.setitem(revocation._settings, "capacity", 4)
+    revocation.rebuild()
+    for _ in range(3):
+        revocation._add(uuid.uuid4().hex)
+    assert revocation._added_during_rebuild == set()  # only tracked while a rebuild runs
+
+    monkeypatch.setattr(revocation, "_filter", BloomFilter(4))
+    rebuilds = revocation.stats()["rebuilds"]
+    jtis = _revoke_elsewhere(50)
+    revocation.sync()
+    assert revocation.stats()["rebuilds"] == rebuilds + 1
+    assert revocation._filter.capacity >= 100
+    assert all(revocation.is_revoked(jti) for jti in jtis)
+    UserSession.query.filter(UserSession.session_token.in_(jtis)).delete()
+    db.session.commit()
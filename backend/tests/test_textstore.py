@@ -0,0 +1,115 @@
+"""Compressed entry text (utils/textstore.py, utils/entry_records.py) read by workers that started before the migration."""
+import pytest
+
+from models import db, JournalEntry, JournalEntryBody, User
+from utils import entry_records, textstore
+
+LONG_TEXT = "Slept badly, long walk by the river afterwards, felt better by the evening. " * 8
+
+
+@pytest.fixture
+def entry_id(app_context, monkeypatch):
+    monkeypatch.setitem(textstore._settings, "enabled", False)
+    monkeypatch.setitem(textstore._settings, "min_bytes", 500)
+    user = User.query.filter_by(username="textstore_user").first()
+    if user is None:
+        user = User(username="textstore_user", email="textstore@example.com", password="x")
+        db.session.add(user)
+        db.session.flush()
+    entry = JournalEntry(user_id=user.id, text=LONG_TEXT, sentiment="NEUTRAL", score=0.5)
+    db.session.add(entry)
+    db.session.commit()
+    yield entry.id
+    db.session.rollback()
+    # ORM deletes, so the textstore hook removes the bodies too
+    for entry in JournalEntry.query.filter_by(user_id=user.id).all():
+        db.session.delete(entry)
+    db.session.commit()
+
+
+def test_migrate_refuses_while_compression_is_off(entry_id):
+    with pytest.raises(RuntimeError, match="TEXT_COMPRESSION_ENABLED"):
+        textstore.migrate(log=lambda *_: None)
+    assert db.session.get(JournalEntry, entry_id)._text == LONG_TEXT
+
+
+def test_worker_started_without_bodies_reads_text_migrated_under_it(entry_id, monkeypatch):
+    monkeypatch.setitem(textstore._settings, "enabled", True)
+    assert textstore.migrate(log=lambda *_: None) >= 1
+    # A worker started before the migration, with compression off
+    monkeypatch.setitem(textstore._settings, "enabled", False)
+    db.session.expire_all()
+
+    entry = db.session.get(JournalEntry, entry_id)
+    assert entry._text == ""
+    assert entry.text == LONG_TEXT
+    assert textstore.load_texts([entry_id]) == {entry_id: LONG_TEXT}
+    user_id = entry.user_id
+    assert [r.text for r in entry_records.user_entries(user_id)] == [LONG_TEXT]
+    assert [r.id for r in entry_records.search(user_id, "RIVER", limit=5)] == [entry_id]
+    assert entry_records.search(user_id, "ocean", limit=5) == []
+
+    # Rewriting the text with compression off moves it back inline and drops the body
+    entry.text = "Short now"
+    db.session.commit()
+    assert db.session.get(JournalEntryBody, entry_id) is None
+    assert db.session.get(JournalEntry, entry_id).text == "Short now"
+
+
+def test_deleting_a_compressed_entry_deletes_its_body(entry_id, monkeypatch):
+    monkeypatch.setitem(textstore._settings, "enabled", True)
+    textstore.migrate(log=lambda *_: None)
+    db.session.expire_all()
+
+    db.session.delete(db.session.get(JournalEntry, entry_id))
+    db.session.commit()
+    assert db.session.get(JournalEntryBody, entry_id) is None
+
+
+def test_migrate_leaves_entries_edited_under_it_inline(entry_id, monkeypatch):
+    edited = JournalEntry(user_id=db.session.get(JournalEntry, entry_id).user_id, text=LONG_TEXT + "Edited soon.",
+                          sentiment="NEUTRAL", score=0.5)
+    db.session.add(edited)
+    db.session.commit()
+    edited_id = edited.id
+    monkeypatch.setitem(textstore._settings, "enabled", True)
+    compress = textstore.compress
+
+    def compress_while_a_worker_edits(value):
+        if value.endswith("Edited soon."):
+            # Another worker (its own connection) commits an edit between migrate's select and update
+            with db.engine.begin() as conn:
+                conn.execute(JournalEntry.__table__.update().where(JournalEntry.__table__.c.id == edited_id)
+                             .values(text=LONG_TEXT + "Edited."))
+        return compress(value)
+
+    monkeypatch.setattr(textstore, "compress", compress_while_a_worker_edits)
+    changed = textstore.stats()["migrate_changed"]
+    assert textstore.migrate(log=lambda *_: None) == 1
+    assert textstore.stats()["migrate_changed"] == changed + 1
+    db.session.expire_all()
+
+    assert db.session.get(JournalEntryBody, edited_id) is None
+    assert db.session.get(JournalEntry, edited_id).text == LONG_TEXT + "Edited."
+    assert db.session.get(JournalEntry, entry_id).text == LONG_TEXT
+    assert db.session.get(JournalEntryBody, entry_id) is not None
+
+
+def test_search_merges_inline_and_compressed_matches_newest_first(entry_id, monkeypatch):
+    from datetime import datetime
+
+    user_id = db.session.get(JournalEntry, entry_id).user_id
+    db.session.get(JournalEntry, entry_id).timestamp = datetime(2026, 1, 1)
+    for day, text in ((2, "River, briefly"), (4, "No match here"), (5, "The river again")):
+        db.session.add(JournalEntry(user_id=user_id, text=text, sentiment="NEUTRAL", score=0.5,
+                                    timestamp=datetime(2026, 1, day)))
+    db.session.add(JournalEntry(user_id=user_id, text=LONG_TEXT, sentiment="NEUTRAL", score=0.5,
+                                timestamp=datetime(2026, 1, 3)))
+    db.session.commit()
+    monkeypatch.setitem(textstore._settings, "enabled", True)
+    textstore.migrate(log=lambda *_: None)
+
+    days = [r.timestamp.day for r in entry_records.search(user_id, "river", limit=10)]
+    assert days == [5, 3, 2, 1]
+    assert [r.timestamp.day for r in entry_records.search(user_id, "river", limit=2)] == [5, 3]
+    assert entry_records.search(user_id, "river", limit=0) == []
@@ -0,0 +1,60 @@
+"""Similar-entry vector index (utils/vector_index.py): one embedding per lookup, files follow their user."""
+import os
+
+import pytest
+
+from models import db, User
+from utils import vector_index
+
+
+@pytest.fixture
+def user_id(app_context):
+    user = User(username="vector_user", email="vector@example.com", password="x")
+    db.session.add(user)
+    db.session.commit()
+    yield user.id
+    db.session.rollback()
+    if db.session.get(User, user.id) is not None:
+        db.session.delete(db.session.get(User, user.id))
+        db.session.commit()
+
+
+def test_similar_embeds_a_missing_entry_once(user_id, monkeypatch):
+    vector_index.add(user_id, 1, "walked by the river in the rain")
+    calls = []
+    embed = vector_index.embed
+    monkeypatch.setattr(vector_index, "embed", lambda texts: calls.append(texts) or embed(texts))
+
+    matches = vector_index.similar(user_id, 2, "walked by the river in the sun", k=5)
+    assert [entry_id for entry_id, _ in matches] == [1]
+    assert len(calls) == 1
+    # Now indexed: the stored (float16) vector is the query
+    assert [entry_id for entry_id, _ in vector_index.similar(user_id, 2, "ignored", k=5)] == [1]
+    assert len(calls) == 1
+
+
+def test_deleting_a_user_deletes_their_vector_file(user_id):
+    vector_index.add(user_id, 1, "a short entry")
+    path = vector_index._path(user_id)
+    assert os.path.exists(path)
+
+    db.session.delete(db.session.get(User, user_id))
+    db.session.flush()
+    db.session.rollback()
+    assert os.path.exists(path)
+
+    db.session.delete(db.session.get(User, user_id))
+    db.session.commit()
+    assert not os.path.exists(path)
+
+
+def test_auto_backend_keeps_the_existing_index(app, monkeypatch):
+    monkeypatch.setitem(app.config, "EMBEDDING_BACKEND", "auto")
+    monkeypatch.setattr(vector_index, "_preferred_backend", lambda cfg: "transformer")
+    saved = dict(vector_index._settings)
+    try:
+        vector_index.init_app(app)  # the test index was built with the hashed backend
+        assert vector_index._settings["backend"] == "hashed" and not vector_index._state["stale"]
+        assert vector_index._settings["preferred"] == "transformer"
+    finally:
+        vector_index._settings.update(saved)
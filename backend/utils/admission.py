@@ -0,0 +1,292 @@
+"""Admission control and graceful degradation for sentiment inference.
+
+Scoring a new or edited entry through `score()` goes:
+  1. the fast tier (sentiment.analyze_fast), which needs no slot;
+  2. the transformer, once one of SENTIMENT_MAX_CONCURRENCY slots is free.
+     A request waits at most SENTIMENT_QUEUE_TIMEOUT for a slot, and at most
+     SENTIMENT_QUEUE_LIMIT requests wait at once; the rest are shed at once;
+  3. when shed, the SENTIMENT_OVERLOAD_MODE fallback. 'lexical' scores with
+     sentiment.analyze_lexical() (bounded by SENTIMENT_LEXICAL_CONCURRENCY);
+     'defer' stores NEUTRAL and leaves the scoring to the rescorer. Either
+     way the entry is flagged in journal_entries.sentiment_degraded;
+  4. SentimentUnavailable (routes answer 503 with Retry-After) only when the
+     fallback is saturated too: no lexical slot is free, or
+     SENTIMENT_DEGRADED_LIMIT degraded entries already wait for rescoring.
+
+The rescorer (a background job, or `python -m utils.admission rescore`)
+runs flagged entries back through the full pipeline, but only while a
+transformer slot is free, so it never competes with live requests.
+"""
+import argparse
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import func, select, update
+
+from models import db, JournalEntry
+from utils import entry_records, metrics, mood_stats, sentiment
+from utils.events import publish
+
+logger = logging.getLogger(__name__)
+
+_settings = {
+    "max_concurrency": 4,
+    "queue_limit": 16,
+    "queue_timeout": 0.5,
+    "overload_mode": "lexical",
+    "lexical_concurrency": 8,
+    "degraded_limit": 5000,
+    "retry_after": 5,
+    "rescore_interval": 30.0,
+    "rescore_batch": 50,
+}
+_metrics = {
+    "rescore_runs": 0,
+    "total_rescored": 0,
+    "last_run_at": None,
+}
+
+_model_slots = threading.BoundedSemaphore(_settings["max_concurrency"])
+_lexical_slots = threading.BoundedSemaphore(_settings["lexical_concurrency"])
+_lock = threading.Lock()
+_waiting = 0
+_in_flight = 0
+_pending = 0  # degraded entries awaiting rescoring; exact after each rescore run, estimated in between
+_stop = threading.Event()
+_thread: Optional[threading.Thread] = None
+
+
+class SentimentUnavailable(Exception):
+    """Raised when both inference and its degraded fallback are saturated."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _acquire_model_slot() -> bool:
+    global _waiting
+    if _model_slots.acquire(blocking=False):
+        return True
+    with _lock:
+        if _waiting >= _settings["queue_limit"]:
+            return False
+        _waiting += 1
+    started = time.perf_counter()
+    try:
+        return _model_slots.acquire(timeout=_settings["queue_timeout"])
+    finally:
+        metrics.observe("sentiment_queue_wait_seconds", time.perf_counter() - started)
+        with _lock:
+            _waiting -= 1
+
+
+def _run(fn, *args):
+    """fn(*args) on a model slot the caller already holds; releases it."""
+    global _in_flight
+    with _lock:
+        _in_flight += 1
+    try:
+        return fn(*args)
+    finally:
+        with _lock:
+            _in_flight -= 1
+        _model_slots.release()
+
+
+def _run_model(text: str) -> Tuple[str, float]:
+    return _run(sentiment.analyze_model, text)
+
+
+def run_if_idle(fn, *args):
+    """fn(*args) on a transformer slot if one is free right now, else None (for optional model work)."""
+    if not _model_slots.acquire(blocking=False):
+        return None
+    return _run(fn, *args)
+
+
+def _reject(reason: str):
+    metrics.inc("sentiment_admission_total", outcome="rejected", reason=reason)
+    raise SentimentUnavailable(f"Sentiment scoring overloaded ({reason})", _settings["retry_after"])
+
+
+def score(text: str, persist: bool = True) -> Tuple[str, float, Optional[str]]:
+    """(sentiment, confidence, degraded) for `text`; degraded is None, 'lexical' or 'deferred'.
+
+    `persist=False` is for results that are not stored (previews): those
+    always fall back to the lexical scorer and never count towards the
+    rescoring backlog.
+    """
+    global _pending
+    if not text or not text.strip():
+        return "NEUTRAL", 0.5, None
+
+    fast = sentiment.analyze_fast(text)
+    if fast is not None:
+        metrics.inc("sentiment_admission_total", outcome="fast")
+        return fast[0], fast[1], None
+
+    if _acquire_model_slot():
+        metrics.inc("sentiment_admission_total", outcome="model")
+        label, confidence = _run_model(text)
+        return label, confidence, None
+
+    if persist and _pending >= _settings["degraded_limit"]:
+        _reject("backlog")
+    if persist and _settings["overload_mode"] == "defer":
+        degraded, (label, confidence) = "deferred", ("NEUTRAL", 0.5)
+    else:
+        if not _lexical_slots.acquire(blocking=False):
+            _reject("lexical_busy")
+        try:
+            degraded, (label, confidence) = "lexical", sentiment.analyze_lexical(text)
+        finally:
+            _lexical_slots.release()
+    metrics.inc("sentiment_admission_total", outcome=degraded)
+    if persist:
+        with _lock:
+            _pending += 1
+    return label, confidence, degraded
+
+
+def refresh_pending() -> int:
+    global _pending
+    _pending = db.session.execute(
+        select(func.count()).select_from(JournalEntry).where(JournalEntry.sentiment_degraded.isnot(None))).scalar()
+    return _pending
+
+
+def rescore(limit: Optional[int] = None, wait: bool = False) -> int:
+    """Score flagged entries with the full pipeline, oldest first; returns how many were cleared.
+
+    Stops as soon as no transformer slot is free, unless `wait` (the CLI),
+    which queues for slots like a request would. An entry edited since it was
+    read is left for its edit's own score.
+    """
+    table = JournalEntry.__table__
+    limit = limit or _settings["rescore_batch"]
+    stmt = entry_records.entry_select(table.c.sentiment_degraded.isnot(None)).order_by(table.c.id).limit(limit)
+    rescored = 0
+    for record in entry_records.fetch(stmt):
+        # The full pipeline, so the fast tier may answer without a slot
+        fast = sentiment.analyze_fast(record.text)
+        if fast is not None:
+            label, confidence = fast
+        elif _acquire_model_slot() if wait else _model_slots.acquire(blocking=False):
+            label, confidence = _run_model(record.text)
+        else:
+            break
+        result = db.session.execute(update(table).where(
+            table.c.id == record.id,
+            table.c.sentiment_degraded == record.sentiment_degraded,
+            table.c.updated_at == record.updated_at,
+        ).values(sentiment=label, score=confidence, sentiment_degraded=None, updated_at=table.c.updated_at))
+        if result.rowcount:
+            mood_stats.relabel(record.user_id, record.sentiment, label)
+        db.session.commit()
+        if result.rowcount:
+            rescored += 1
+            metrics.inc("sentiment_rescored_total", degraded=record.sentiment_degraded)
+            try:
+                publish('journal_rescored', {
+                    'user_id': record.user_id,
+                    'entry': {'id': record.id, 'sentiment': label, 'score': confidence},
+                })
+            except Exception as pub_err:
+                logger.warning(f"Failed to publish SSE event: {pub_err}")
+    refresh_pending()
+    _metrics["rescore_runs"] += 1
+    _metrics["total_rescored"] += rescored
+    _metrics["last_run_at"] = datetime.utcnow().isoformat()
+    if rescored:
+        logger.info(f"Rescored {rescored} degraded journal entries")
+    return rescored
+
+
+def stats() -> Dict:
+    return {
+        **_metrics,
+        "in_flight": _in_flight,
+        "waiting": _waiting,
+        "degraded_pending": _pending,
+        "max_concurrency": _settings["max_concurrency"],
+        "overload_mode": _settings["overload_mode"],
+    }
+
+
+def _loop(app) -> None:
+    while not _stop.wait(_settings["rescore_interval"]):
+        with app.app_context():
+            try:
+                if _pending:
+                    rescore()
+            except Exception as e:
+                logger.error(f"Rescore run failed: {e}")
+                db.session.rollback()
+            finally:
+                db.session.remove()
+
+
+def init_app(app) -> None:
+    """Size the inference slots, count the rescoring backlog and start the rescorer."""
+    global _model_slots, _lexical_slots, _thread
+    cfg = app.config
+    _settings["max_concurrency"] = cfg.get("SENTIMENT_MAX_CONCURRENCY", 4)
+    _settings["queue_limit"] = cfg.get("SENTIMENT_QUEUE_LIMIT", 16)
+    _settings["queue_timeout"] = cfg.get("SENTIMENT_QUEUE_TIMEOUT", 0.5)
+    _settings["overload_mode"] = cfg.get("SENTIMENT_OVERLOAD_MODE", "lexical")
+    _settings["lexical_concurrency"] = cfg.get("SENTIMENT_LEXICAL_CONCURRENCY", 8)
+    _settings["degraded_limit"] = cfg.get("SENTIMENT_DEGRADED_LIMIT", 5000)
+    _settings["retry_after"] = cfg.get("SENTIMENT_RETRY_AFTER", 5)
+    _settings["rescore_interval"] = cfg.get("SENTIMENT_RESCORE_INTERVAL", 30.0)
+    _settings["rescore_batch"] = cfg.get("SENTIMENT_RESCORE_BATCH", 50)
+    _model_slots = threading.BoundedSemaphore(_settings["max_concurrency"])
+    _lexical_slots = threading.BoundedSemaphore(_settings["lexical_concurrency"])
+    with app.app_context():
+        try:
+            refresh_pending()
+        except Exception as e:
+            logger.error(f"Counting degraded journal entries failed: {e}")
+            db.session.rollback()
+
+    if cfg.get("BACKGROUND_JOBS_ENABLED", True) and _thread is None:
+        _thread = threading.Thread(target=_loop, args=(app,), name="sentiment-rescorer", daemon=True)
+        _thread.start()
+
+
+metrics.describe("sentiment_admission_total", "counter", "Sentiment scoring requests by admission outcome")
+metrics.describe("sentiment_queue_wait_seconds", "histogram", "Time spent waiting for a sentiment inference slot")
+metrics.describe("sentiment_rescored_total", "counter", "Degraded journal entries rescored with the full pipeline")
+metrics.gauge("sentiment_degraded_pending", "Degraded journal entries awaiting rescoring", lambda: _pending)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rescore journal entries scored without the transformer")
+    parser.add_argument("command", choices=("rescore", "pending"))
+    parser.add_argument("--batch", type=int, default=200)
+    args = parser.parse_args()
+
+    import os
+    os.environ.setdefault("BACKGROUND_JOBS_ENABLED", "false")
+    from app import app
+    from utils import admission  # the instance init_app configured, not this __main__ copy
+
+    with app.app_context():
+        if args.command == "pending":
+            print(f"{admission.refresh_pending()} degraded entries")
+            return
+        total = 0
+        while True:
+            done = admission.rescore(args.batch, wait=True)
+            total += done
+            if not done or not admission._pending:
+                break
+        print(f"Rescored {total} entries; {admission._pending} still degraded")
+
+
+if __name__ == "__main__":
+    main()
+
@@ -0,0 +1,111 @@
+"""SQLAlchemy engine and connection pool tuning.
+
+`init_app` must run before `db.init_app`, because Flask-SQLAlchemy creates
+the engine from SQLALCHEMY_ENGINE_OPTIONS at that point.
+
+PostgreSQL gets explicit pool sizing, recycling, pre-ping and a server-side
+statement_timeout. SQLite connections get WAL journaling, synchronous=NORMAL,
+a busy timeout and mmap I/O as soon as they are opened, so concurrent
+writers wait for the lock instead of failing and readers never block on a
+writer.
+"""
+import logging
+import sqlite3
+from typing import Dict, List, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import Pool
+
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+
+_pragmas: List[Tuple[str, object]] = []
+_checked_out = 0
+
+
+def normalize_url(uri: str) -> str:
+    # Render and Heroku hand out postgres:// URLs, which SQLAlchemy 1.4+ rejects
+    if uri.startswith("postgres://"):
+        return "postgresql://" + uri[len("postgres://"):]
+    return uri
+
+
+def engine_options(config, url: str = None) -> Dict:
+    """create_engine() keyword arguments for `url` (default: the primary database)."""
+    backend = make_url(url or config["SQLALCHEMY_DATABASE_URI"]).get_backend_name()
+    if backend == "postgresql":
+        options = {
+            "pool_size": config.get("DB_POOL_SIZE", 5),
+            "max_overflow": config.get("DB_MAX_OVERFLOW", 10),
+            "pool_timeout": config.get("DB_POOL_TIMEOUT", 10),
+            "pool_recycle": config.get("DB_POOL_RECYCLE", 1800),
+            "pool_pre_ping": config.get("DB_POOL_PRE_PING", True),
+            "connect_args": {"connect_timeout": int(config.get("DB_CONNECT_TIMEOUT", 10))},
+        }
+        statement_timeout = config.get("DB_STATEMENT_TIMEOUT_MS", 0)
+        if statement_timeout:
+            options["connect_args"]["options"] = f"-c statement_timeout={int(statement_timeout)}"
+        return options
+    if backend == "sqlite":
+        # connect_args is spelled out so a bind never inherits PostgreSQL ones
+        return {"pool_pre_ping": False, "connect_args": {}}
+    return {"pool_pre_ping": config.get("DB_POOL_PRE_PING", True)}
+
+
+def sqlite_pragmas(config) -> List[Tuple[str, object]]:
+    """PRAGMA statements run on every new SQLite connection; empty values are skipped."""
+    pragmas = [
+        ("journal_mode", config.get("SQLITE_JOURNAL_MODE", "WAL")),
+        ("synchronous", config.get("SQLITE_SYNCHRONOUS", "NORMAL")),
+        ("busy_timeout", config.get("SQLITE_BUSY_TIMEOUT_MS", 5000)),
+        ("mmap_size", config.get("SQLITE_MMAP_SIZE", 0)),
+    ]
+    return [(name, value) for name, value in pragmas if value not in (None, "")]
+
+
+def apply_sqlite_pragmas(dbapi_connection, pragmas) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas:
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+def _on_connect(dbapi_connection, connection_record):
+    # In-memory databases cannot use WAL; SQLite silently keeps "memory" mode
+    if _pragmas and isinstance(dbapi_connection, sqlite3.Connection):
+        apply_sqlite_pragmas(dbapi_connection, _pragmas)
+
+
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    global _checked_out
+    _checked_out += 1
+
+
+def _on_checkin(dbapi_connection, connection_record):
+    global _checked_out
+    _checked_out -= 1
+
+
+def init_app(app) -> None:
+    """Fill in SQLALCHEMY_ENGINE_OPTIONS and register SQLite pragmas; call before db.init_app."""
+    cfg = app.config
+    cfg["SQLALCHEMY_DATABASE_URI"] = normalize_url(cfg["SQLALCHEMY_DATABASE_URI"])
+    # Explicit options in the config win over the computed defaults
+    cfg["SQLALCHEMY_ENGINE_OPTIONS"] = {**engine_options(cfg), **cfg.get("SQLALCHEMY_ENGINE_OPTIONS", {})}
+
+    _pragmas[:] = sqlite_pragmas(cfg)
+    if not event.contains(Pool, "connect", _on_connect):
+        event.listen(Pool, "connect", _on_connect)
+        event.listen(Pool, "checkout", _on_checkout)
+        event.listen(Pool, "checkin", _on_checkin)
+    metrics.gauge("db_pool_checked_out", "Database connections currently checked out of the pool",
+                  lambda: _checked_out)
+
+    backend = make_url(cfg["SQLALCHEMY_DATABASE_URI"]).get_backend_name()
+    tuned = dict(_pragmas) if backend == "sqlite" else {
+        k: v for k, v in cfg["SQLALCHEMY_ENGINE_OPTIONS"].items() if k != "connect_args"}
+    logger.info(f"Database engine options for {backend}: {tuned}")
@@ -0,0 +1,137 @@
+"""ORM-free read path for journal entry listings.
+
+Read-only endpoints that only serialize entries (and throw them away) select
+the columns they need through SQLAlchemy Core into `EntryRecord` tuples. No
+identity map, no change tracking, no per-attribute instrumentation. Records
+have the attributes that JournalEntry has, plus `text` and `to_dict()`, so
+json_provider.entries_json()/export_json() and the analytics code accept
+either.
+
+Entries whose inline text is empty keep it compressed in journal_entry_bodies
+(utils/textstore.py); their body columns come from a LEFT JOIN in the same
+statement, whatever this process's compression settings. Each body is
+decompressed only when `text` is read.
+
+Statements run on db.session, so read-replica routing still applies.
+"""
+from collections import namedtuple
+from math import ceil
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, func, null, select
+
+from models import db, JournalEntry, JournalEntryBody
+from utils import textstore
+
+_entries = JournalEntry.__table__
+_bodies = JournalEntryBody.__table__
+
+_META_COLUMNS = (_entries.c.id, _entries.c.user_id, _entries.c.sentiment, _entries.c.score,
+                 _entries.c.sentiment_degraded, _entries.c.mood_rating, _entries.c.tags, _entries.c.timestamp, _entries.c.updated_at)
+
+
+class EntryRecord(namedtuple("EntryRecord", (
+        "id", "user_id", "sentiment", "score", "sentiment_degraded", "mood_rating", "tags", "timestamp", "updated_at",
+        "inline_text", "codec", "dictionary_id", "data"))):
+    """Read-only journal entry row; `text` is None when selected with text=False."""
+    __slots__ = ()
+
+    @property
+    def text(self) -> Optional[str]:
+        if self.inline_text or self.codec is None:
+            return self.inline_text
+        return textstore.decompress(self.codec, self.dictionary_id, self.data)
+
+    def to_dict(self) -> Dict:
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'text': self.text,
+            'sentiment': self.sentiment,
+            'score': self.score,
+            'sentiment_degraded': self.sentiment_degraded,
+            'mood_rating': self.mood_rating,
+            'tags': self.tags.split(',') if self.tags else [],
+            'timestamp': self.timestamp.isoformat() if self.timestamp else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+
+def entry_select(*criteria, text: bool = True):
+    """SELECT of EntryRecord columns for entries matching `criteria`."""
+    no_body = (null().label("codec"), null().label("dictionary_id"), null().label("data"))
+    if not text:
+        return select(*_META_COLUMNS, null().label("text"), *no_body).where(*criteria)
+    # Like JournalEntry.text: empty inline text means "load the body"
+    joined = _entries.outerjoin(_bodies, and_(_bodies.c.entry_id == _entries.c.id, _entries.c.text == ""))
+    return select(*_META_COLUMNS, _entries.c.text, _bodies.c.codec, _bodies.c.dictionary_id, _bodies.c.data
+                  ).select_from(joined).where(*criteria)
+
+
+def fetch(stmt) -> List[EntryRecord]:
+    make = EntryRecord._make
+    return [make(row) for row in db.session.execute(stmt)]
+
+
+def user_entries(user_id, *criteria, text: bool = True, limit: Optional[int] = None,
+                 offset: Optional[int] = None) -> List[EntryRecord]:
+    """A user's entries matching `criteria`, newest first."""
+    stmt = entry_select(_entries.c.user_id == user_id, *criteria, text=text).order_by(_entries.c.timestamp.desc())
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    if offset:
+        stmt = stmt.offset(offset)
+    return fetch(stmt)
+
+
+def paginate(user_id, criteria, page: int, per_page: int) -> Tuple[List[EntryRecord], Dict]:
+    """One page of a user's entries (newest first) and a pagination dict like Flask-SQLAlchemy's."""
+    page = page if page >= 1 else 1
+    per_page = per_page if per_page >= 1 else 20
+    total = db.session.execute(select(func.count()).select_from(_entries).where(
+        _entries.c.user_id == user_id, *criteria)).scalar()
+    items = user_entries(user_id, *criteria, limit=per_page, offset=(page - 1) * per_page)
+    pages = ceil(total / per_page) if total else 0
+    return items, {
+        "page": page,
+        "per_page": per_page,
+        "total": total,
+        "pages": pages,
+        "has_next": page < pages,
+        "has_prev": page > 1
+    }
+
+
+def search(user_id, needle: str, limit: int) -> List[EntryRecord]:
+    """A user's newest entries whose text contains `needle` (case-insensitive).
+
+    Inline text is matched in SQL, newest `limit` first. Compressed bodies
+    cannot be, so they are decompressed and matched here, newest first,
+    until `limit` of them match. Only bodies newer than the oldest inline
+    match can make the result, so when `limit` inline entries matched, the
+    bodies are read from that timestamp on.
+    """
+    if limit <= 0:
+        return []
+    newest_first = _entries.c.timestamp.desc()
+    found = fetch(entry_select(_entries.c.user_id == user_id, _entries.c.text.ilike(f"%{needle}%"))
+                  .order_by(newest_first).limit(limit))
+    compressed = [_entries.c.user_id == user_id, _entries.c.text == ""]
+    if len(found) == limit and found[-1].timestamp is not None:
+        compressed.append(_entries.c.timestamp >= found[-1].timestamp)
+    folded = needle.casefold()
+    matched = 0
+    result = db.session.execute(entry_select(*compressed).order_by(newest_first).execution_options(yield_per=100))
+    try:
+        for row in result:
+            record = EntryRecord._make(row)
+            if record.codec is not None and folded in record.text.casefold():
+                found.append(record)
+                matched += 1
+                if matched >= limit:
+                    break
+    finally:
+        result.close()
+    if matched:
+        found.sort(key=lambda r: (r.timestamp is not None, r.timestamp), reverse=True)
+    return found[:limit]
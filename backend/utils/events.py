@@ -4,11 +4,18 @@ from queue import Queue
 from threading import Lock
 from typing import Dict, List
 
+from utils import metrics
+
 logger = logging.getLogger(__name__)
 
 _subscribers: List[Queue] = []
 _lock = Lock()
 
+def subscriber_count() -> int:
+    return len(_subscribers)
+
+metrics.gauge("sse_subscribers", "Open server-sent event streams", subscriber_count)
+
 def subscribe() -> Queue:
     q = Queue(maxsize=100)
     with _lock:
@@ -38,4 +45,5 @@ def publish(event: str, data: Dict):
                 _subscribers.remove(q)
             except ValueError:
                 pass
+    metrics.inc("sse_events_published_total", event=event)
     logger.info("SSE published event=%s to %d subscribers", event, len(_subscribers))
@@ -0,0 +1,200 @@
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Optional
+
+import bcrypt
+
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+
+_executor: Optional[Executor] = None
+_executor_lock = threading.Lock()
+_slots: Optional[threading.BoundedSemaphore] = None
+
+_settings = {
+    "pool_size": 2,
+    "queue_limit": 32,
+    "queue_timeout": 2.0,
+    "hash_timeout": 5.0,
+    "rounds": 12,
+}
+
+
+class HashingUnavailable(Exception):
+    """Raised when the hashing pool is saturated or a hash does not finish in time."""
+
+
+def _hash_worker(password: bytes, rounds: int) -> bytes:
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds=rounds))
+
+
+def _check_worker(hashed: bytes, password: bytes) -> bool:
+    try:
+        return bcrypt.checkpw(password, hashed)
+    except ValueError:
+        # Malformed or non-bcrypt hash stored for this user
+        return False
+
+
+def _measure(rounds: int) -> float:
+    start = time.perf_counter()
+    bcrypt.hashpw(b"calibration-password", bcrypt.gensalt(rounds=rounds))
+    return (time.perf_counter() - start) * 1000
+
+
+def calibrate_rounds(target_ms: float, min_rounds: int = 10, max_rounds: int = 15) -> int:
+    """Pick the bcrypt work factor whose hash time is closest to target_ms on this host.
+
+    Each extra round doubles the cost, so one measurement at min_rounds is enough
+    to extrapolate; a second measurement confirms the estimate.
+    """
+    base_ms = max(_measure(min_rounds), 0.001)
+    rounds = min_rounds
+    estimate = base_ms
+    while rounds < max_rounds and abs(estimate * 2 - target_ms) < abs(estimate - target_ms):
+        rounds += 1
+        estimate *= 2
+
+    if rounds != min_rounds:
+        measured = _measure(rounds)
+        if measured > target_ms * 2 and rounds > min_rounds:
+            rounds -= 1
+        elif measured < target_ms / 2 and rounds < max_rounds:
+            rounds += 1
+
+    logger.info(f"bcrypt calibration: base={base_ms:.1f}ms at cost {min_rounds}, target={target_ms}ms -> cost {rounds}")
+    return rounds
+
+
+def init_app(app) -> None:
+    """Read pool settings from config and pick the target work factor."""
+    cfg = app.config
+    _settings["pool_size"] = cfg.get("BCRYPT_POOL_SIZE", 2)
+    _settings["queue_limit"] = cfg.get("BCRYPT_QUEUE_LIMIT", 32)
+    _settings["queue_timeout"] = cfg.get("BCRYPT_QUEUE_TIMEOUT", 2.0)
+    _settings["hash_timeout"] = cfg.get("BCRYPT_HASH_TIMEOUT", 5.0)
+
+    global _slots
+    _slots = threading.BoundedSemaphore(_settings["pool_size"] + _settings["queue_limit"])
+
+    if cfg.get("BCRYPT_LOG_ROUNDS"):
+        _settings["rounds"] = int(cfg["BCRYPT_LOG_ROUNDS"])
+        logger.info(f"bcrypt cost pinned to {_settings['rounds']}")
+    else:
+        _settings["rounds"] = calibrate_rounds(
+            cfg.get("BCRYPT_TARGET_MS", 250),
+            cfg.get("BCRYPT_MIN_ROUNDS", 10),
+            cfg.get("BCRYPT_MAX_ROUNDS", 15),
+        )
+
+
+def _get_executor() -> Executor:
+    # Children are forked rather than spawned: spawning would re-run app.py as __main__.
+    # Forking is only safe before other threads exist, so app.py calls
+    # start_pool() before logging and the background jobs start; otherwise
+    # the pool is created here on first use. Where fork is unavailable
+    # (Windows) hashes run on threads instead; bcrypt releases the GIL while
+    # hashing, so they still run in parallel.
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                if "fork" in multiprocessing.get_all_start_methods():
+                    _executor = ProcessPoolExecutor(
+                        max_workers=_settings["pool_size"],
+                        mp_context=multiprocessing.get_context("fork"),
+                    )
+                else:
+                    logger.info("fork is unavailable; hashing passwords on a thread pool")
+                    _executor = ThreadPoolExecutor(max_workers=_settings["pool_size"], thread_name_prefix="bcrypt")
+    return _executor
+
+
+def start_pool(cfg) -> None:
+    """Fork the hashing workers now, while this process has a single thread.
+
+    A fork-context pool forks all of its workers on the first submit, so one
+    no-op task starts them. Call before anything starts a thread.
+    """
+    _settings["pool_size"] = getattr(cfg, "BCRYPT_POOL_SIZE", _settings["pool_size"])
+    if threading.active_count() > 1:
+        logger.warning("Starting the hashing pool with other threads running; forked workers may inherit held locks")
+    _get_executor().submit(int).result()
+
+
+def _reset_after_fork() -> None:
+    # A server worker forked from a process that already had a pool cannot
+    # use the parent's; it creates its own on first use
+    global _executor
+    _executor = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _run(op: str, fn, *args):
+    global _slots
+    if _slots is None:
+        _slots = threading.BoundedSemaphore(_settings["pool_size"] + _settings["queue_limit"])
+    slots = _slots
+    started = time.perf_counter()
+    if not slots.acquire(timeout=_settings["queue_timeout"]):
+        metrics.inc("password_hash_rejected_total", op=op, reason="queue_full")
+        raise HashingUnavailable("Password hashing queue is full")
+    try:
+        future = _get_executor().submit(fn, *args)
+    except BaseException:
+        slots.release()
+        raise
+    # The slot is held until the work really ends: a timed-out hash already
+    # running in a worker cannot be cancelled and still occupies it
+    future.add_done_callback(lambda _: slots.release())
+    try:
+        return future.result(timeout=_settings["hash_timeout"])
+    except FutureTimeout:
+        future.cancel()
+        metrics.inc("password_hash_rejected_total", op=op, reason="timeout")
+        raise HashingUnavailable("Password hashing timed out")
+    finally:
+        metrics.observe("password_hash_seconds", time.perf_counter() - started, op=op)
+
+
+def target_rounds() -> int:
+    return _settings["rounds"]
+
+
+def hash_password(password: str) -> str:
+    """Hash a password in the worker pool using the calibrated work factor."""
+    return _run("hash", _hash_worker, password.encode("utf-8"), _settings["rounds"]).decode("utf-8")
+
+
+def check_password(hashed: str, password: str) -> bool:
+    """Verify a password against a stored bcrypt hash in the worker pool."""
+    return _run("check", _check_worker, hashed.encode("utf-8"), password.encode("utf-8"))
+
+
+def hash_rounds(hashed: str) -> Optional[int]:
+    """Extract the work factor from a '$2b$12$...' style hash."""
+    parts = hashed.split("$")
+    if len(parts) < 4:
+        return None
+    try:
+        return int(parts[2])
+    except ValueError:
+        return None
+
+
+def needs_rehash(hashed: str) -> bool:
+    """True when the stored hash is weaker than the target; never downgrades.
+
+    Each process calibrates on its own, so targets can differ between
+    workers; upgrading only keeps them from re-hashing back and forth.
+    """
+    rounds = hash_rounds(hashed)
+    return rounds is None or rounds < _settings["rounds"]
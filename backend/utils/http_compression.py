@@ -0,0 +1,162 @@
+"""Content-negotiated gzip/brotli compression of API responses.
+
+An after_request hook compresses a response when all of these hold:
+  * the client accepts br or gzip (q-values respected; br preferred, and
+    only when the optional brotli package is installed);
+  * the mimetype is compressible (JSON, text, JavaScript, XML);
+  * the response is not already encoded, not marked Cache-Control:
+    no-transform, and not a file passthrough;
+  * the path is not in COMPRESSION_SKIP_PATHS and the mimetype is not
+    text/event-stream, since SSE must reach the client unbuffered;
+  * a buffered body is at least COMPRESSION_MIN_BYTES long.
+
+Streamed (generator) responses are compressed on the fly. Each chunk the
+view yields is sync-flushed, so the client still receives it as soon as it
+is produced, and Content-Length is dropped. Every compressible response
+gets Vary: Accept-Encoding, whether or not it was compressed.
+"""
+import logging
+import zlib
+from typing import Dict, Iterable, Iterator, Optional
+
+from flask import request
+
+from utils import metrics
+
+try:
+    import brotli
+except ImportError:  # optional; gzip only
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE = ("application/json", "application/javascript", "application/xml", "image/svg+xml")
+
+_settings = {
+    "enabled": True,
+    "min_bytes": 1024,
+    "gzip_level": 6,
+    "brotli_quality": 4,
+    "skip_paths": ("/events/stream",),
+}
+
+
+def available_encodings():
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+class _Encoder:
+    """Incremental compressor with the same interface for gzip and brotli."""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._c = brotli.Compressor(quality=_settings["brotli_quality"])
+        else:
+            self._c = zlib.compressobj(_settings["gzip_level"], zlib.DEFLATED, 31)  # 31: gzip container
+
+    def chunk(self, data: bytes) -> bytes:
+        """Compress `data` and flush, so everything so far is decodable by the client."""
+        if self.encoding == "br":
+            return self._c.process(data) + self._c.flush()
+        return self._c.compress(data) + self._c.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self.encoding == "br":
+            return self._c.process(data) + self._c.finish()
+        return self._c.compress(data) + self._c.flush(zlib.Z_FINISH)
+
+
+def _compressible(mimetype: Optional[str]) -> bool:
+    if not mimetype or mimetype == "text/event-stream":
+        return False
+    return mimetype.startswith("text/") or mimetype in COMPRESSIBLE or mimetype.endswith("+json")
+
+
+def negotiate(accept_encodings) -> Optional[str]:
+    """Best of our encodings for an Accept-Encoding header (werkzeug Accept object), or None."""
+    best, best_q = None, 0
+    for encoding in available_encodings():
+        q = accept_encodings[encoding]  # 0 when absent or refused; "*" is honoured
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def _stream(chunks: Iterable, encoder: _Encoder) -> Iterator[bytes]:
+    raw = compressed = 0
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode("utf-8")
+            if not chunk:
+                continue
+            raw += len(chunk)
+            out = encoder.chunk(chunk)
+            compressed += len(out)
+            yield out
+        out = encoder.finish()
+        compressed += len(out)
+        yield out
+    finally:
+        if hasattr(chunks, "close"):
+            chunks.close()
+        metrics.inc("http_compression_saved_bytes_total", max(raw - compressed, 0), encoding=encoder.encoding)
+
+
+def _compress_response(response):
+    if not _settings["enabled"] or request.path in _settings["skip_paths"]:
+        return response
+    if not _compressible(response.mimetype):
+        return response
+    response.vary.add("Accept-Encoding")
+    if (response.status_code < 200 or response.status_code in (204, 206, 304) or request.method == "HEAD"
+            or "Content-Encoding" in response.headers or response.direct_passthrough
+            or "no-transform" in (response.headers.get("Cache-Control") or "")):
+        return response
+    encoding = negotiate(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    encoder = _Encoder(encoding)
+    if response.is_streamed:
+        response.response = _stream(response.response, encoder)
+        response.headers.pop("Content-Length", None)
+    else:
+        data = response.get_data()
+        if len(data) < _settings["min_bytes"]:
+            return response
+        compressed = encoder.finish(data)
+        response.set_data(compressed)
+        metrics.inc("http_compression_saved_bytes_total", max(len(data) - len(compressed), 0), encoding=encoding)
+    response.headers["Content-Encoding"] = encoding
+    if response.headers.get("ETag", "").startswith('"'):
+        # The encoded bytes differ from the identity representation
+        response.headers["ETag"] = "W/" + response.headers["ETag"]
+    metrics.inc("http_compressed_responses_total", encoding=encoding)
+    return response
+
+
+def stats() -> Dict:
+    return {
+        "enabled": _settings["enabled"],
+        "encodings": list(available_encodings()),
+        "min_bytes": _settings["min_bytes"],
+    }
+
+
+def init_app(app) -> None:
+    cfg = app.config
+    _settings["enabled"] = cfg.get("COMPRESSION_ENABLED", True)
+    _settings["min_bytes"] = cfg.get("COMPRESSION_MIN_BYTES", 1024)
+    _settings["gzip_level"] = cfg.get("COMPRESSION_GZIP_LEVEL", 6)
+    _settings["brotli_quality"] = cfg.get("COMPRESSION_BROTLI_QUALITY", 4)
+    _settings["skip_paths"] = tuple(p.strip() for p in cfg.get("COMPRESSION_SKIP_PATHS", "/events/stream").split(",")
+                                    if p.strip())
+    app.after_request(_compress_response)
+    if _settings["enabled"]:
+        logger.info(f"Response compression: {', '.join(available_encodings())} above {_settings['min_bytes']} bytes")
+
+
+metrics.describe("http_compressed_responses_total", "counter", "Responses sent with a Content-Encoding")
+metrics.describe("http_compression_saved_bytes_total", "counter", "Response bytes saved by compression")
@@ -0,0 +1,261 @@
+"""Standalone sentiment inference server over a Unix domain socket.
+
+Owns the transformer model so API workers never load it. Requests from all
+connections are coalesced into batches before each forward pass.
+
+Run from backend/:
+    python -m utils.inference_server --socket /tmp/mht-sentiment.sock
+
+and point the API at it with SENTIMENT_SOCKET=/tmp/mht-sentiment.sock.
+
+Wire format: every message is a 4-byte big-endian length followed by a UTF-8
+JSON body. Request {"texts": [...]}; response {"results": [[label, score], ...]}
+or {"error": "..."}.
+"""
+import argparse
+import json
+import logging
+import os
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct(">I")
+MAX_MESSAGE_BYTES = 16 * 1024 * 1024
+
+
+class InferenceUnavailable(Exception):
+    """Raised by the client when the server cannot be reached or does not answer in time."""
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            raise ConnectionError("connection closed")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def send_message(sock: socket.socket, payload: Dict) -> None:
+    body = json.dumps(payload).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(body)) + body)
+
+
+def recv_message(sock: socket.socket) -> Dict:
+    (size,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    if size > MAX_MESSAGE_BYTES:
+        raise ValueError(f"message too large: {size} bytes")
+    return json.loads(_recv_exact(sock, size).decode("utf-8"))
+
+
+# ---------------------------------------------------------------- server ---
+
+class _Pending:
+    __slots__ = ("texts", "results", "done")
+
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+        self.results: Optional[List[Tuple[str, float]]] = None
+        self.done = threading.Event()
+
+
+class Batcher:
+    """Collects requests and runs them through the model in shared batches.
+
+    A batch is flushed when it reaches `max_batch` texts or when the oldest
+    request has waited `max_wait` seconds, whichever comes first.
+    """
+
+    def __init__(self, analyze_batch, max_batch: int = 32, max_wait: float = 0.01):
+        self.analyze_batch = analyze_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue: "queue.Queue[_Pending]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="inference-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, texts: List[str]) -> List[Tuple[str, float]]:
+        pending = _Pending(texts)
+        self._queue.put(pending)
+        pending.done.wait()
+        return pending.results
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            size = len(batch[0].texts)
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(item)
+                size += len(item.texts)
+
+            texts = [text for pending in batch for text in pending.texts]
+            try:
+                results = self.analyze_batch(texts)
+            except Exception as e:
+                logger.exception(f"Batch inference failed: {e}")
+                results = [("NEUTRAL", 0.5)] * len(texts)
+
+            offset = 0
+            for pending in batch:
+                pending.results = results[offset:offset + len(pending.texts)]
+                offset += len(pending.texts)
+                pending.done.set()
+            logger.debug(f"Inference batch: requests={len(batch)} texts={len(texts)}")
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        while True:
+            try:
+                request = recv_message(self.request)
+            except (ConnectionError, OSError):
+                return
+            except ValueError as e:
+                send_message(self.request, {"error": str(e)})
+                return
+            texts = request.get("texts")
+            if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+                send_message(self.request, {"error": "texts must be a list of strings"})
+                continue
+            results = self.server.batcher.submit(texts) if texts else []
+            send_message(self.request, {"results": [list(r) for r in results]})
+
+
+class InferenceServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    # Every API worker thread may connect at once; the default backlog of 5 refuses them
+    request_queue_size = 256
+
+    def __init__(self, path: str, batcher: Batcher):
+        if os.path.exists(path):
+            os.unlink(path)
+        super().__init__(path, _Handler)
+        os.chmod(path, 0o660)
+        self.batcher = batcher
+
+
+def serve(path: str, max_batch: int = 32, max_wait_ms: float = 10.0, warmup: bool = True) -> None:
+    from utils.sentiment import analyze_batch, _load_pipeline
+
+    if warmup:
+        logger.info("Loading sentiment model before accepting connections")
+        _load_pipeline()
+    server = InferenceServer(path, Batcher(analyze_batch, max_batch, max_wait_ms / 1000))
+    logger.info(f"Sentiment inference server listening on {path}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+# ---------------------------------------------------------------- client ---
+
+class InferenceClient:
+    """Thread-safe client keeping a small pool of idle connections to the server."""
+
+    def __init__(self, path: str, timeout: float = 2.0, pool_size: int = 8):
+        self.path = path
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self._idle: List[socket.socket] = []
+        self._lock = threading.Lock()
+
+    def _connect(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.path)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def _release(self, sock: socket.socket) -> None:
+        with self._lock:
+            if len(self._idle) < self.pool_size:
+                self._idle.append(sock)
+                return
+        sock.close()
+
+    def _roundtrip(self, sock: socket.socket, texts: List[str]) -> Dict:
+        try:
+            send_message(sock, {"texts": texts})
+            return recv_message(sock)
+        except Exception:
+            # Timed-out or broken connections are never returned to the pool
+            sock.close()
+            raise
+
+    def analyze(self, texts: List[str]) -> List[Tuple[str, float]]:
+        with self._lock:
+            sock = self._idle.pop() if self._idle else None
+        try:
+            if sock is not None:
+                try:
+                    response = self._roundtrip(sock, texts)
+                except ConnectionError:
+                    # Pooled connection went stale (e.g. server restarted); retry once fresh
+                    sock = None
+            if sock is None:
+                sock = self._connect()
+                response = self._roundtrip(sock, texts)
+        except (OSError, ValueError) as e:
+            raise InferenceUnavailable(str(e))
+        self._release(sock)
+        if "error" in response:
+            raise InferenceUnavailable(response["error"])
+        return [(label, float(score)) for label, score in response["results"]]
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for sock in idle:
+            sock.close()
+
+
+_clients: Dict[str, InferenceClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(path: str, timeout: float = 2.0, pool_size: int = 8) -> InferenceClient:
+    with _clients_lock:
+        client = _clients.get(path)
+        if client is None:
+            client = InferenceClient(path, timeout=timeout, pool_size=pool_size)
+            _clients[path] = client
+        return client
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sentiment inference server")
+    parser.add_argument("--socket", default=os.environ.get("SENTIMENT_SOCKET", "/tmp/mht-sentiment.sock"))
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=10.0)
+    parser.add_argument("--no-warmup", action="store_true", help="load the model on first request instead of at startup")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    serve(args.socket, args.max_batch, args.max_wait_ms, warmup=not args.no_warmup)
+
+
+if __name__ == "__main__":
+    main()
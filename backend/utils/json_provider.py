@@ -0,0 +1,116 @@
+"""Fast JSON for API responses.
+
+`FastJSONProvider` replaces Flask's stdlib-json provider. When the optional
+orjson package is installed, it uses orjson to encode and decode, and
+responses are built straight from the encoded bytes. Without orjson it
+falls back to the stdlib with the same output rules:
+
+  * datetimes and dates are written as ISO 8601 (Flask's default provider
+    writes dates in RFC 822 form, as in Set-Cookie headers);
+  * keys keep the order the route built them in (no sort_keys);
+  * non-ASCII text is written as UTF-8 rather than as \\u escapes.
+
+Routes that return many journal entries build the entry list with
+`entries_json()` / `export_json()` and splice it into the envelope with
+`json_response()`. The entry list is encoded in one call straight from row
+attributes. No to_dict() is called, and no isoformat() is called per
+datetime.
+"""
+import json
+import logging
+from typing import Iterable
+
+from flask import current_app
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder is used instead
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+_settings = {"native": orjson is not None}
+
+
+def _default(o):
+    if hasattr(o, "isoformat"):
+        return o.isoformat()
+    return DefaultJSONProvider.default(o)
+
+
+def dumps_bytes(obj) -> bytes:
+    if _settings["native"]:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson when available."""
+
+    ensure_ascii = False
+    sort_keys = False
+
+    def dumps(self, obj, **kwargs) -> str:
+        if _settings["native"] and not kwargs:
+            return dumps_bytes(obj).decode("utf-8")
+        kwargs.setdefault("default", _default)
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if _settings["native"] and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        if self._app.debug:
+            # Indented output while debugging, as with Flask's own provider
+            return self._app.response_class(super().dumps(obj, indent=2, default=_default) + "\n",
+                                            mimetype=self.mimetype)
+        return self._app.response_class(dumps_bytes(obj), mimetype=self.mimetype)
+
+
+def json_response(payload: dict, status: int = 200, **fragments: bytes):
+    """Response for `payload` plus already-encoded JSON values under the keyword names."""
+    body = dumps_bytes(payload)
+    if fragments:
+        spliced = b",".join(dumps_bytes(key) + b":" + value for key, value in fragments.items())
+        body = b"{" + spliced + (b"," + body[1:] if body != b"{}" else b"}")
+    return current_app.response_class(body, status=status, mimetype="application/json")
+
+
+def entries_json(entries: Iterable) -> bytes:
+    """JSON array of entries in the JournalEntry.to_dict() shape."""
+    return dumps_bytes([{
+        "id": e.id,
+        "user_id": e.user_id,
+        "text": e.text,
+        "sentiment": e.sentiment,
+        "score": e.score,
+        "sentiment_degraded": e.sentiment_degraded,
+        "mood_rating": e.mood_rating,
+        "tags": e.tags.split(",") if e.tags else [],
+        "timestamp": e.timestamp,
+        "updated_at": e.updated_at,
+    } for e in entries])
+
+
+def export_json(entries: Iterable) -> bytes:
+    """JSON array of entries in the /analytics/export shape."""
+    return dumps_bytes([{
+        "id": e.id,
+        "text": e.text,
+        "sentiment": e.sentiment,
+        "confidence_score": e.score,
+        "mood_rating": e.mood_rating,
+        "tags": e.tags if e.tags else [],
+        "created_at": e.timestamp,
+        "updated_at": e.updated_at,
+    } for e in entries])
+
+
+def init_app(app) -> None:
+    _settings["native"] = orjson is not None and app.config.get("JSON_NATIVE_ENCODER", True)
+    app.json = FastJSONProvider(app)
+    logger.info(f"JSON encoder: {'orjson' if _settings['native'] else 'stdlib'}")
@@ -0,0 +1,230 @@
+import logging
+import random
+import smtplib
+import threading
+import time
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from typing import Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import db, OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+# Outbound mail goes through the outbound_emails table: request handlers only
+# insert a row, and a background sender drains it over one reused SMTP
+# connection. Rows are claimed with a lease (status 'sending' plus
+# next_attempt_at in the future), so several worker processes can run senders
+# and a crashed sender's rows become claimable again once the lease expires.
+# Bodies can carry credentials (password reset links hold a live token), so
+# a row's body is blanked as soon as it is sent or given up on, and finished
+# rows are deleted after MAIL_RETENTION_DAYS.
+
+_wakeup = threading.Event()
+_stop = threading.Event()
+_thread: Optional[threading.Thread] = None
+_settings = {
+    "poll_interval": 5.0,
+    "batch_size": 20,
+    "max_attempts": 6,
+    "backoff_base": 30.0,
+    "backoff_max": 3600.0,
+    "lease": 300.0,
+    "smtp_timeout": 10.0,
+    "smtp_idle_timeout": 60.0,
+    "retention_days": 7.0,
+    "purge_interval": 3600.0,
+}
+_counters = {"enqueued": 0, "sent": 0, "retried": 0, "failed": 0, "skipped": 0, "connections": 0, "purged": 0}
+FINISHED = ('sent', 'failed', 'skipped')
+
+
+def enqueue(to_email: str, subject: str, body: str) -> None:
+    """Queue an email for the background sender; the caller commits."""
+    db.session.add(OutboundEmail(to_email=to_email, subject=subject, body=body))
+    db.session.info["mail_enqueued"] = True
+    _counters["enqueued"] += 1
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_sender(session):
+    # Wake the sender only once the row is visible to its own session
+    if session.info.pop("mail_enqueued", False):
+        _wakeup.set()
+
+
+class SMTPConnection:
+    """A single SMTP connection kept open between batches and reopened on failure."""
+
+    def __init__(self, cfg):
+        self.cfg = cfg
+        self._smtp: Optional[smtplib.SMTP] = None
+        self._last_used = 0.0
+
+    def get(self) -> smtplib.SMTP:
+        if self._smtp is not None:
+            try:
+                if time.monotonic() - self._last_used > 5:
+                    self._smtp.noop()
+            except (smtplib.SMTPException, OSError):
+                self.close()
+        if self._smtp is None:
+            cfg = self.cfg
+            smtp = smtplib.SMTP(cfg['MAIL_SERVER'], cfg['MAIL_PORT'], timeout=_settings["smtp_timeout"])
+            if cfg.get('MAIL_USE_TLS'):
+                smtp.starttls()
+            if cfg.get('MAIL_USERNAME') and cfg.get('MAIL_PASSWORD'):
+                smtp.login(cfg['MAIL_USERNAME'], cfg['MAIL_PASSWORD'])
+            self._smtp = smtp
+            _counters["connections"] += 1
+        self._last_used = time.monotonic()
+        return self._smtp
+
+    def close_if_idle(self) -> None:
+        if self._smtp is not None and time.monotonic() - self._last_used > _settings["smtp_idle_timeout"]:
+            self.close()
+
+    def close(self) -> None:
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except Exception:
+                pass
+            self._smtp = None
+
+
+def _build_message(cfg, email: OutboundEmail) -> EmailMessage:
+    msg = EmailMessage()
+    msg['Subject'] = email.subject
+    msg['From'] = cfg['MAIL_FROM']
+    msg['To'] = email.to_email
+    msg.set_content(email.body)
+    return msg
+
+
+def _claim_batch():
+    """Atomically claim due rows so concurrent senders never send the same email."""
+    now = datetime.utcnow()
+    candidates = db.session.query(OutboundEmail.id).filter(
+        OutboundEmail.status.in_(('pending', 'sending')),
+        OutboundEmail.next_attempt_at <= now
+    ).order_by(OutboundEmail.id).limit(_settings["batch_size"]).all()
+
+    claimed = []
+    lease_until = now + timedelta(seconds=_settings["lease"])
+    for (email_id,) in candidates:
+        updated = OutboundEmail.query.filter(
+            OutboundEmail.id == email_id,
+            OutboundEmail.status.in_(('pending', 'sending')),
+            OutboundEmail.next_attempt_at <= now
+        ).update({"status": "sending", "next_attempt_at": lease_until}, synchronize_session=False)
+        if updated:
+            claimed.append(email_id)
+    db.session.commit()
+    if not claimed:
+        return []
+    return OutboundEmail.query.filter(OutboundEmail.id.in_(claimed)).order_by(OutboundEmail.id).all()
+
+
+def _backoff(attempts: int) -> float:
+    delay = min(_settings["backoff_max"], _settings["backoff_base"] * (2 ** (attempts - 1)))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def send_pending(cfg, connection: SMTPConnection) -> int:
+    """Send one batch of due emails. Returns the number of rows processed."""
+    batch = _claim_batch()
+    if not batch:
+        return 0
+
+    configured = cfg.get('MAIL_FROM') and cfg.get('MAIL_SERVER')
+    for email in batch:
+        email.attempts += 1
+        if not configured:
+            logger.warning("Mail sender not configured; skipping actual send")
+            email.status = 'skipped'
+            email.body = ''
+            _counters["skipped"] += 1
+            continue
+        try:
+            connection.get().send_message(_build_message(cfg, email))
+            email.status = 'sent'
+            email.sent_at = datetime.utcnow()
+            email.last_error = None
+            email.body = ''
+            _counters["sent"] += 1
+        except Exception as e:
+            # The connection state is unknown after any failure; reopen next time
+            connection.close()
+            email.last_error = str(e)[:500]
+            if email.attempts >= _settings["max_attempts"]:
+                email.status = 'failed'
+                email.body = ''
+                _counters["failed"] += 1
+                logger.error(f"Giving up on email {email.id} after {email.attempts} attempts: {e}")
+            else:
+                email.status = 'pending'
+                email.next_attempt_at = datetime.utcnow() + timedelta(seconds=_backoff(email.attempts))
+                _counters["retried"] += 1
+                logger.warning(f"Email {email.id} send failed (attempt {email.attempts}): {e}")
+    db.session.commit()
+    return len(batch)
+
+
+def purge() -> int:
+    """Delete finished rows older than MAIL_RETENTION_DAYS; returns how many."""
+    cutoff = datetime.utcnow() - timedelta(days=_settings["retention_days"])
+    purged = OutboundEmail.query.filter(
+        OutboundEmail.status.in_(FINISHED),
+        OutboundEmail.created_at < cutoff
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    _counters["purged"] += purged
+    return purged
+
+
+def stats() -> Dict:
+    return dict(_counters)
+
+
+def _loop(app) -> None:
+    connection = SMTPConnection(app.config)
+    last_purge = 0.0
+    while not _stop.is_set():
+        _wakeup.wait(_settings["poll_interval"])
+        _wakeup.clear()
+        with app.app_context():
+            try:
+                # Keep draining while full batches come back
+                while send_pending(app.config, connection) >= _settings["batch_size"]:
+                    pass
+                if time.monotonic() - last_purge > _settings["purge_interval"]:
+                    last_purge = time.monotonic()
+                    purge()
+            except Exception as e:
+                logger.error(f"Mail sender loop failed: {e}")
+                db.session.rollback()
+            finally:
+                db.session.remove()
+        connection.close_if_idle()
+    connection.close()
+
+
+def init_app(app) -> None:
+    global _thread
+    cfg = app.config
+    _settings["poll_interval"] = cfg.get("MAIL_POLL_INTERVAL", 5.0)
+    _settings["batch_size"] = cfg.get("MAIL_BATCH_SIZE", 20)
+    _settings["max_attempts"] = cfg.get("MAIL_MAX_ATTEMPTS", 6)
+    _settings["backoff_base"] = cfg.get("MAIL_BACKOFF_BASE", 30.0)
+    _settings["lease"] = cfg.get("MAIL_LEASE", 300.0)
+    _settings["retention_days"] = cfg.get("MAIL_RETENTION_DAYS", 7.0)
+    _settings["smtp_timeout"] = cfg.get("MAIL_SMTP_TIMEOUT", 10.0)
+    _settings["smtp_idle_timeout"] = cfg.get("MAIL_SMTP_IDLE_TIMEOUT", 60.0)
+
+    if cfg.get("BACKGROUND_JOBS_ENABLED", True) and _thread is None:
+        _thread = threading.Thread(target=_loop, args=(app,), name="mail-sender", daemon=True)
+        _thread.start()
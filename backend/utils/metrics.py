@@ -0,0 +1,348 @@
+"""In-process metrics with Prometheus text exposition.
+
+Hot-path updates are lock-free: each thread writes only to its own shard, and
+shards are summed when /metrics is scraped. Shards of finished threads are
+folded into a retired total whenever a new thread registers one, so
+short-lived request threads do not accumulate between scrapes.
+
+With METRICS_DIR set, every process periodically writes its totals to
+METRICS_DIR/metrics-<pid>.json, and /metrics adds up the files of all
+processes so any worker can answer for the whole server. At startup the
+files of processes that have exited are folded into metrics-retired.json
+and removed, so restarts do not leave one more file for every scrape.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from flask import g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock around retiring files
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+_meta: Dict[str, Tuple[str, str, Optional[Tuple[float, ...]]]] = {}
+_gauges: Dict[str, Callable[[], float]] = {}
+_local = threading.local()
+_shards: List[Tuple[threading.Thread, dict]] = []
+_retired: dict = {}
+_registry_lock = threading.Lock()
+_settings = {"dir": None, "flush_interval": 5.0}
+_flusher: Optional[threading.Thread] = None
+
+RETIRED_FILE = "metrics-retired.json"
+
+
+def describe(name: str, kind: str, help_text: str, buckets: Optional[Tuple[float, ...]] = None) -> None:
+    """Declare a metric; kind is 'counter', 'histogram' or 'gauge'."""
+    if kind == "histogram" and buckets is None:
+        buckets = LATENCY_BUCKETS
+    _meta[name] = (kind, help_text, buckets)
+
+
+def gauge(name: str, help_text: str, fn: Callable[[], float]) -> None:
+    """Register a gauge whose value is read from `fn` at scrape time."""
+    describe(name, "gauge", help_text)
+    _gauges[name] = fn
+
+
+def _retire_finished() -> None:
+    """Fold the shards of finished threads into _retired (caller holds _registry_lock)."""
+    alive = []
+    for thread, shard in _shards:
+        if thread.is_alive():
+            alive.append((thread, shard))
+        else:
+            _merge(_retired, shard.copy().items())
+    _shards[:] = alive
+
+
+def _shard() -> dict:
+    shard = getattr(_local, "shard", None)
+    if shard is None:
+        shard = _local.shard = {}
+        with _registry_lock:
+            _retire_finished()
+            _shards.append((threading.current_thread(), shard))
+    return shard
+
+
+def inc(name: str, value: float = 1, **labels) -> None:
+    key = (name, tuple(sorted(labels.items())))
+    shard = _shard()
+    shard[key] = shard.get(key, 0) + value
+
+
+def observe(name: str, value: float, **labels) -> None:
+    buckets = _meta[name][2]
+    key = (name, tuple(sorted(labels.items())))
+    shard = _shard()
+    hist = shard.get(key)
+    if hist is None:
+        # [count per bucket..., +Inf count, sum]
+        hist = shard[key] = [0] * (len(buckets) + 2)
+    for i, bound in enumerate(buckets):
+        if value <= bound:
+            hist[i] += 1
+            break
+    else:
+        hist[len(buckets)] += 1
+    hist[-1] += value
+
+
+def _merge(into: dict, items) -> None:
+    for key, value in items:
+        if isinstance(value, list):
+            current = into.get(key)
+            if current is None:
+                into[key] = list(value)
+            else:
+                for i, v in enumerate(value):
+                    current[i] += v
+        else:
+            into[key] = into.get(key, 0) + value
+
+
+def snapshot() -> dict:
+    """Sum all thread shards of this process."""
+    total: dict = {}
+    with _registry_lock:
+        _retire_finished()
+        _merge(total, _retired.items())
+        shards = [shard for _, shard in _shards]
+    for shard in shards:
+        # dict.copy() and list() run under the GIL, so a concurrent writer cannot tear them
+        _merge(total, ((k, list(v) if isinstance(v, list) else v) for k, v in shard.copy().items()))
+    return total
+
+
+def _encode(snap: dict) -> list:
+    return [[name, [list(pair) for pair in labels], value] for (name, labels), value in snap.items()]
+
+
+def _decode(rows: list) -> dict:
+    return {(name, tuple(tuple(pair) for pair in labels)): value for name, labels, value in rows}
+
+
+def _gauge_values() -> dict:
+    values = {}
+    for name, fn in _gauges.items():
+        try:
+            values[(name, ())] = float(fn())
+        except Exception as e:
+            logger.warning(f"Gauge {name} failed: {e}")
+    return values
+
+
+def _flush() -> None:
+    directory = _settings["dir"]
+    path = os.path.join(directory, f"metrics-{os.getpid()}.json")
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump({"counters": _encode(snapshot()), "gauges": _encode(_gauge_values()), "written_at": time.time()}, f)
+    os.replace(tmp, path)
+
+
+def _flush_loop() -> None:
+    while True:
+        time.sleep(_settings["flush_interval"])
+        try:
+            _flush()
+        except Exception as e:
+            logger.warning(f"Metrics flush failed: {e}")
+
+
+def _pid_exited(filename: str) -> bool:
+    """True for metrics-<pid>.json of a process that is gone, or of an earlier process with our pid."""
+    pid = filename[len("metrics-"):-len(".json")]
+    if not pid.isdigit():
+        return False
+    if int(pid) == os.getpid():
+        return True  # this process has not flushed yet: the file is left over from before a restart
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except OSError:
+        pass  # PermissionError: alive, owned by another user
+    return False
+
+
+def _retire_exited_processes() -> None:
+    """Fold the counters of exited processes' files into RETIRED_FILE and remove the files."""
+    directory = _settings["dir"]
+    with open(os.path.join(directory, "metrics.lock"), "a") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)  # two workers starting together must not fold the same file twice
+        retired_path = os.path.join(directory, RETIRED_FILE)
+        try:
+            with open(retired_path) as f:
+                retired = _decode(json.load(f)["counters"])
+        except (OSError, ValueError, KeyError):
+            retired = {}
+        exited = []
+        for filename in os.listdir(directory):
+            if not filename.startswith("metrics-") or not filename.endswith(".json") or not _pid_exited(filename):
+                continue
+            path = os.path.join(directory, filename)
+            try:
+                with open(path) as f:
+                    _merge(retired, _decode(json.load(f)["counters"]).items())
+            except (OSError, ValueError, KeyError):
+                pass  # unreadable: nothing to keep
+            exited.append(path)
+        if not exited:
+            return
+        tmp = f"{retired_path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"counters": _encode(retired), "gauges": [], "written_at": 0}, f)
+        os.replace(tmp, retired_path)
+        for path in exited:
+            os.remove(path)
+    logger.info(f"Folded metrics of {len(exited)} exited processes into {RETIRED_FILE}")
+
+
+def collect() -> Tuple[dict, dict]:
+    """Return (counters and histograms, gauges) summed over every known process."""
+    totals = snapshot()
+    gauges = _gauge_values()
+    directory = _settings["dir"]
+    if directory and os.path.isdir(directory):
+        own = f"metrics-{os.getpid()}.json"
+        stale_after = _settings["flush_interval"] * 3
+        for filename in os.listdir(directory):
+            if not filename.startswith("metrics-") or not filename.endswith(".json") or filename == own:
+                continue
+            try:
+                with open(os.path.join(directory, filename)) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            # Counters of exited workers (and RETIRED_FILE) stay in the total; their gauges do not
+            _merge(totals, _decode(data["counters"]).items())
+            if time.time() - data.get("written_at", 0) < stale_after:
+                _merge(gauges, _decode(data["gauges"]).items())
+    return totals, gauges
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def render() -> str:
+    """Render all metrics in the Prometheus text exposition format (0.0.4)."""
+    totals, gauges = collect()
+    by_name: Dict[str, list] = {}
+    for (name, labels), value in list(totals.items()) + list(gauges.items()):
+        by_name.setdefault(name, []).append((labels, value))
+
+    lines = []
+    for name in sorted(by_name):
+        kind, help_text, buckets = _meta.get(name, ("untyped", "", None))
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in sorted(by_name[name]):
+            if kind == "histogram":
+                cumulative = 0
+                for bound, count in zip(buckets, value):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(labels, (('le', repr(float(bound))),))} {cumulative}")
+                cumulative += value[len(buckets)]
+                lines.append(f"{name}_bucket{_format_labels(labels, (('le', '+Inf'),))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {value[-1]}")
+                lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+            else:
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("metrics_query_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    inc("db_queries_total")
+    observe("db_query_duration_seconds", elapsed)
+    if has_app_context() and "metrics_db_queries" in g:
+        g.metrics_db_queries += 1
+        g.metrics_db_time += elapsed
+
+
+def _start_request():
+    g.metrics_started = time.perf_counter()
+    g.metrics_db_queries = 0
+    g.metrics_db_time = 0.0
+
+
+def _finish_request(response):
+    started = g.get("metrics_started")
+    if started is not None:
+        labels = {
+            "blueprint": request.blueprint or "app",
+            "endpoint": request.endpoint or "unmatched",
+        }
+        observe("http_request_duration_seconds", time.perf_counter() - started, **labels)
+        inc("http_requests_total", method=request.method, status=str(response.status_code), **labels)
+        observe("db_queries_per_request", g.metrics_db_queries, **labels)
+        observe("db_query_time_per_request_seconds", g.metrics_db_time, **labels)
+    return response
+
+
+def init_app(app) -> None:
+    """Install request timing and SQL hooks; aggregate across processes when METRICS_DIR is set."""
+    global _flusher
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+    _settings["dir"] = app.config.get("METRICS_DIR")
+    _settings["flush_interval"] = app.config.get("METRICS_FLUSH_INTERVAL", 5.0)
+    if _settings["dir"] and _flusher is None:
+        os.makedirs(_settings["dir"], exist_ok=True)
+        try:
+            _retire_exited_processes()
+        except OSError as e:
+            logger.warning(f"Retiring old metrics files failed: {e}")
+        _flusher = threading.Thread(target=_flush_loop, name="metrics-flusher", daemon=True)
+        _flusher.start()
+
+
+describe("http_requests_total", "counter", "HTTP requests by blueprint, endpoint, method and status")
+describe("http_request_duration_seconds", "histogram", "HTTP request latency by blueprint and endpoint")
+describe("db_queries_per_request", "histogram", "SQL statements issued per HTTP request", COUNT_BUCKETS)
+describe("db_query_time_per_request_seconds", "histogram", "Total SQL time per HTTP request")
+describe("db_queries_total", "counter", "SQL statements executed")
+describe("db_query_duration_seconds", "histogram", "Latency of individual SQL statements")
+describe("sentiment_inference_seconds", "histogram", "In-process sentiment pipeline call latency")
+describe("sentiment_batch_size", "histogram", "Texts per sentiment pipeline call", BATCH_BUCKETS)
+describe("sentiment_remote_seconds", "histogram", "Round trip to the sentiment inference server")
+describe("sentiment_fallbacks_total", "counter", "Sentiment requests answered by a fallback path")
+describe("sentiment_tier_total", "counter", "Sentiment requests by the tier that answered (fast or transformer)")
+describe("sentiment_fast_seconds", "histogram", "Fast-tier sentiment model latency")
+describe("password_hash_seconds", "histogram", "bcrypt hash/check latency including pool queueing")
+describe("password_hash_rejected_total", "counter", "bcrypt operations rejected by the bounded pool")
+describe("sse_events_published_total", "counter", "Server-sent events published")
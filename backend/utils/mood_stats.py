@@ -0,0 +1,352 @@
+"""Online per-user mood statistics and change detection (user_mood_stats).
+
+Each new entry updates its user's row in O(1), with no history scan:
+
+  * counts per sentiment and per UTC hour of writing;
+  * exponentially weighted mean and variance (MOOD_EWMA_ALPHA) of the
+    sentiment score and of mood_rating;
+  * a slow baseline (MOOD_BASELINE_ALPHA) and a fast recent level
+    (MOOD_TREND_ALPHA) of valence: +score POSITIVE, -score NEGATIVE, 0
+    NEUTRAL. Comparing the two gives the improving/declining trend;
+  * a two-sided CUSUM over standardised valence, clipped at 3 sd so a
+    single outlier cannot trip it. It fires when the accumulated drift
+    passes MOOD_CUSUM_H (allowance MOOD_CUSUM_K per entry), once a user has
+    MOOD_CUSUM_MIN_ENTRIES entries. A detection records last_shift,
+    re-anchors the baseline on the recent level, and publishes a
+    `mood_shift` SSE event. For SHIFT_RECENT afterwards it is the trend.
+
+/analytics/insights reads the row directly. The first read or write for a
+user without one builds it by replaying that user's history, hot and
+archived, once.
+
+The counts (entries, per sentiment, per hour, rated entries) follow edits,
+deletes and rescoring exactly. The weighted statistics and the detector are
+streaming estimates over entries as they were written: edits and deletes do
+not revise them. `python -m utils.mood_stats rebuild` replays history to
+recompute them. When folding in a new entry fails, the user's row is
+deleted so the next read rebuilds it, and mood_stats_failures_total counts it.
+"""
+import argparse
+import logging
+import math
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+
+from models import db, UserMoodStats
+from utils import metrics, partitioning, read_replica
+from utils.events import publish
+
+logger = logging.getLogger(__name__)
+
+MIN_VALENCE_SD = 0.25  # valence spans -1..1; keeps z-scores sane while the variance estimate is near zero
+MAX_Z = 3.0  # one outlying entry adds at most this much to either sum
+TREND_BAND = 0.5  # |recent - baseline| below this many valence sds is "stable"
+TREND_MIN_ENTRIES = 20
+SHIFT_RECENT = timedelta(days=14)
+
+_settings = {
+    "alpha": 0.1,
+    "baseline_alpha": 0.01,
+    "trend_alpha": 0.3,
+    "cusum_k": 0.25,
+    "cusum_h": 8.0,
+    "min_entries": 20,
+}
+_metrics = {
+    "rows_built": 0,
+    "shifts_detected": 0,
+    "failures": 0,
+}
+
+
+def valence(sentiment: str, score: float) -> float:
+    if sentiment == "POSITIVE":
+        return score
+    if sentiment == "NEGATIVE":
+        return -score
+    return 0.0
+
+
+def _ewma(mean: float, var: float, x: float, n: int, alpha: float):
+    """Weighted mean and variance after observing x, the (n+1)th value.
+
+    The weight is max(alpha, 1/(n+1)): plain running mean and variance until
+    the window is full, so the first entries do not dominate.
+    """
+    alpha = max(alpha, 1.0 / (n + 1))
+    diff = x - mean
+    increment = alpha * diff
+    return mean + increment, (1 - alpha) * (var + diff * increment)
+
+
+def _count_attr(sentiment: str) -> str:
+    return {"POSITIVE": "positive_count", "NEGATIVE": "negative_count"}.get(sentiment, "neutral_count")
+
+
+def _empty(user_id: int) -> UserMoodStats:
+    return UserMoodStats(user_id=user_id, entry_count=0, positive_count=0, negative_count=0, neutral_count=0,
+                         score_mean=0.0, score_var=0.0, valence_mean=0.0, valence_var=0.0, valence_recent=0.0,
+                         mood_count=0, mood_mean=0.0, mood_var=0.0, cusum_up=0.0, cusum_down=0.0,
+                         hour_counts=",".join(["0"] * 24))
+
+
+def apply(stats: UserMoodStats, sentiment: str, score: float, mood_rating: Optional[int],
+          timestamp: Optional[datetime]) -> Optional[str]:
+    """Fold one entry into `stats`; returns 'improving' or 'declining' when the detector fires."""
+    timestamp = timestamp or datetime.utcnow()
+
+    attr = _count_attr(sentiment)
+    setattr(stats, attr, getattr(stats, attr) + 1)
+    hours = [int(n) for n in stats.hour_counts.split(",")]
+    hours[timestamp.hour] += 1
+    stats.hour_counts = ",".join(map(str, hours))
+
+    v = valence(sentiment, score)
+    shift = None
+    # Only once the baseline has warmed up; standardised against it before this entry moves it
+    if stats.entry_count >= _settings["min_entries"]:
+        z = (v - stats.valence_mean) / max(math.sqrt(stats.valence_var), MIN_VALENCE_SD)
+        z = max(-MAX_Z, min(MAX_Z, z))
+        stats.cusum_up = max(0.0, stats.cusum_up + z - _settings["cusum_k"])
+        stats.cusum_down = max(0.0, stats.cusum_down - z - _settings["cusum_k"])
+        if stats.cusum_up > _settings["cusum_h"]:
+            shift = "improving"
+        elif stats.cusum_down > _settings["cusum_h"]:
+            shift = "declining"
+    stats.valence_mean, stats.valence_var = _ewma(stats.valence_mean, stats.valence_var, v, stats.entry_count,
+                                                  _settings["baseline_alpha"])
+    stats.valence_recent += max(_settings["trend_alpha"], 1.0 / (stats.entry_count + 1)) * (v - stats.valence_recent)
+    if shift:
+        stats.last_shift, stats.last_shift_at = shift, timestamp
+        stats.cusum_up = stats.cusum_down = 0.0
+        stats.valence_mean = stats.valence_recent
+
+    stats.score_mean, stats.score_var = _ewma(stats.score_mean, stats.score_var, score, stats.entry_count,
+                                              _settings["alpha"])
+    if mood_rating is not None:
+        stats.mood_mean, stats.mood_var = _ewma(stats.mood_mean, stats.mood_var, float(mood_rating), stats.mood_count,
+                                                _settings["alpha"])
+        stats.mood_count += 1
+    stats.entry_count += 1
+    return shift
+
+
+def build(user_id: int) -> UserMoodStats:
+    """A fresh (unsaved) row from the user's whole history, oldest first. Shifts found on the way are recorded, not published."""
+    stats = _empty(user_id)
+    history = partitioning.timeline(user_id, datetime(1970, 1, 1))
+    rows = db.session.execute(select(history.c.sentiment, history.c.score, history.c.mood_rating,
+                                     history.c.timestamp).order_by(history.c.timestamp, history.c.id))
+    for sentiment, score, mood_rating, timestamp in rows:
+        apply(stats, sentiment, score, mood_rating, timestamp)
+    metrics.inc("mood_stats_rebuilds_total")
+    _metrics["rows_built"] += 1
+    return stats
+
+
+def _create(user_id: int) -> Optional[UserMoodStats]:
+    # Built from, stored to and re-read from the primary: a replica may lag the entries and the row
+    with read_replica.primary():
+        stats = build(user_id)
+        if stats.entry_count == 0:
+            return None
+        try:
+            db.session.add(stats)
+            db.session.commit()
+        except IntegrityError:
+            # Another request built it first; theirs is as good as ours
+            db.session.rollback()
+            return db.session.get(UserMoodStats, user_id)
+        if read_replica.reading_replica():
+            db.session.refresh(stats)  # the commit expired it; reload it here, not from the replica later
+        return stats
+
+
+def get(user_id: int) -> Optional[UserMoodStats]:
+    """The user's statistics, built from history on first use; None when the user has no entries.
+
+    An existing row may be read from the replica (the analytics blueprint's
+    reads go there); only building a missing one is kept on the primary.
+    """
+    user_id = int(user_id)
+    return db.session.get(UserMoodStats, user_id) or _create(user_id)
+
+
+def _publish_shift(stats: UserMoodStats) -> None:
+    metrics.inc("mood_shifts_total", direction=stats.last_shift)
+    _metrics["shifts_detected"] += 1
+    try:
+        publish('mood_shift', {
+            'user_id': stats.user_id,
+            'direction': stats.last_shift,
+            'valence': round(stats.valence_recent, 4),
+            'detected_at': stats.last_shift_at.isoformat(),
+        })
+    except Exception as pub_err:
+        logger.warning(f"Failed to publish SSE event: {pub_err}")
+
+
+def observe(entry) -> None:
+    """Fold a just-committed entry into its user's row. Never raises: the row is derived and can be rebuilt."""
+    try:
+        stats = db.session.get(UserMoodStats, entry.user_id, with_for_update=True)
+        if stats is None:
+            _create(entry.user_id)  # the replay already includes this entry
+            return
+        shift = apply(stats, entry.sentiment, entry.score, entry.mood_rating, entry.timestamp)
+        db.session.commit()
+        if shift:
+            _publish_shift(stats)
+    except Exception as e:
+        logger.warning(f"Updating mood statistics for user {entry.user_id} failed: {e}; rebuilding on next read")
+        metrics.inc("mood_stats_failures_total")
+        _metrics["failures"] += 1
+        db.session.rollback()
+        _invalidate(entry.user_id)
+
+
+def _invalidate(user_id: int) -> None:
+    """Drop a row that missed an entry; get() rebuilds it from history, which has the entry."""
+    try:
+        db.session.execute(delete(UserMoodStats.__table__).where(UserMoodStats.user_id == int(user_id)))
+        db.session.commit()
+    except Exception as e:
+        logger.error(f"Could not drop stale mood statistics for user {user_id}: {e}")
+        db.session.rollback()
+
+
+def relabel(user_id: int, old: str, new: str, was_rated: bool = False, is_rated: bool = False) -> None:
+    """Update the counts after an edit or rescoring changed an entry's sentiment or whether it has a mood rating.
+
+    One UPDATE in the caller's transaction, so the counts commit with the
+    change itself. A user without a row yet gets it when the row is built.
+    """
+    table = UserMoodStats.__table__
+    values = {}
+    if old != new:
+        values[_count_attr(old)] = table.c[_count_attr(old)] - 1
+        values[_count_attr(new)] = table.c[_count_attr(new)] + 1
+    if was_rated != is_rated:
+        values["mood_count"] = table.c.mood_count + (1 if is_rated else -1)
+    if values:
+        db.session.execute(update(table).where(table.c.user_id == int(user_id)).values(**values))
+
+
+def forget(entry) -> None:
+    """Take a deleted entry out of its user's counts, in the caller's transaction."""
+    stats = db.session.get(UserMoodStats, int(entry.user_id), with_for_update=True)
+    if stats is None:
+        return
+    attr = _count_attr(entry.sentiment)
+    setattr(stats, attr, max(0, getattr(stats, attr) - 1))
+    stats.entry_count = max(0, stats.entry_count - 1)
+    if entry.timestamp is not None:
+        hours = [int(n) for n in stats.hour_counts.split(",")]
+        hours[entry.timestamp.hour] = max(0, hours[entry.timestamp.hour] - 1)
+        stats.hour_counts = ",".join(map(str, hours))
+    if entry.mood_rating is not None:
+        stats.mood_count = max(0, stats.mood_count - 1)
+
+
+def recent_shift(stats: UserMoodStats) -> Optional[str]:
+    """'improving' or 'declining' if the detector fired within SHIFT_RECENT."""
+    if stats.last_shift_at and stats.last_shift_at >= datetime.utcnow() - SHIFT_RECENT:
+        return stats.last_shift
+    return None
+
+
+def trend(stats: UserMoodStats) -> str:
+    # The baseline re-anchors on a detected shift, so the shift itself is the trend for a while
+    shift = recent_shift(stats)
+    if shift:
+        return shift
+    if stats.entry_count < TREND_MIN_ENTRIES:
+        return "insufficient data"
+    band = TREND_BAND * max(math.sqrt(stats.valence_var), MIN_VALENCE_SD)
+    delta = stats.valence_recent - stats.valence_mean
+    return "improving" if delta > band else "declining" if delta < -band else "stable"
+
+
+def peak_hour(stats: UserMoodStats) -> Optional[int]:
+    hours = [int(n) for n in stats.hour_counts.split(",")]
+    return hours.index(max(hours)) if any(hours) else None
+
+
+def summary(stats: UserMoodStats) -> Dict:
+    """The statistics as /analytics/insights reports them."""
+    return {
+        "entries": stats.entry_count,
+        "score": {"mean": round(stats.score_mean, 4), "sd": round(math.sqrt(stats.score_var), 4)},
+        "valence": {"baseline": round(stats.valence_mean, 4), "recent": round(stats.valence_recent, 4),
+                    "sd": round(math.sqrt(stats.valence_var), 4)},
+        "mood": {"mean": round(stats.mood_mean, 2), "sd": round(math.sqrt(stats.mood_var), 2),
+                 "rated_entries": stats.mood_count},
+        "change_detection": {
+            "cusum_up": round(stats.cusum_up, 3),
+            "cusum_down": round(stats.cusum_down, 3),
+            "threshold": _settings["cusum_h"],
+            "last_shift": stats.last_shift,
+            "last_shift_at": stats.last_shift_at.isoformat() if stats.last_shift_at else None,
+        },
+    }
+
+
+def rebuild(user_id: Optional[int] = None) -> int:
+    """Recompute rows from history (one user, or every user with entries); returns how many."""
+    from models import JournalEntry
+
+    if user_id is None:
+        users = db.session.execute(select(JournalEntry.user_id).distinct()).scalars().all()
+    else:
+        users = [int(user_id)]
+    for uid in users:
+        stats = build(uid)
+        existing = db.session.get(UserMoodStats, uid)
+        if existing is not None:
+            db.session.delete(existing)
+            db.session.flush()
+        if stats.entry_count:
+            db.session.add(stats)
+        db.session.commit()
+    return len(users)
+
+
+def stats() -> Dict:
+    return {**_metrics, "cusum_h": _settings["cusum_h"], "cusum_k": _settings["cusum_k"]}
+
+
+def init_app(app) -> None:
+    cfg = app.config
+    _settings["alpha"] = cfg.get("MOOD_EWMA_ALPHA", 0.1)
+    _settings["baseline_alpha"] = cfg.get("MOOD_BASELINE_ALPHA", 0.01)
+    _settings["trend_alpha"] = cfg.get("MOOD_TREND_ALPHA", 0.3)
+    _settings["cusum_k"] = cfg.get("MOOD_CUSUM_K", 0.25)
+    _settings["cusum_h"] = cfg.get("MOOD_CUSUM_H", 8.0)
+    _settings["min_entries"] = cfg.get("MOOD_CUSUM_MIN_ENTRIES", 20)
+
+
+metrics.describe("mood_stats_rebuilds_total", "counter", "Per-user mood statistics rebuilt from history")
+metrics.describe("mood_shifts_total", "counter", "Significant mood shifts detected by the CUSUM detector")
+metrics.describe("mood_stats_failures_total", "counter", "Entries that could not be folded into mood statistics")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-user mood statistics")
+    parser.add_argument("command", choices=("rebuild",))
+    parser.add_argument("--user", type=int, help="only this user")
+    args = parser.parse_args()
+
+    import os
+    os.environ.setdefault("BACKGROUND_JOBS_ENABLED", "false")
+    from app import app
+    from utils import mood_stats  # the instance init_app configured, not this __main__ copy
+
+    with app.app_context():
+        print(f"Rebuilt mood statistics for {mood_stats.rebuild(args.user)} users")
+
+
+if __name__ == "__main__":
+    main()
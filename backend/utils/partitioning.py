@@ -0,0 +1,371 @@
+"""Time partitioning of journal_entries and archival of cold entries.
+
+PostgreSQL: journal_entries can be converted (once, offline) into a table
+range-partitioned by month on "timestamp", named journal_entries_pYYYY_MM,
+with a default partition catching anything outside them. Partitions are
+created PARTITION_MONTHS_AHEAD months ahead on startup and by every job run.
+Any query with a bound on timestamp only scans the months it covers.
+
+Both dialects: with ARCHIVE_AFTER_MONTHS > 0, a background job moves
+entries older than that many whole months into journal_entries_archive,
+where text is zlib-compressed. On PostgreSQL, each monthly partition is
+copied and dropped in a single transaction. Elsewhere, rows move in
+batches, and each batch's insert and delete commit together, so no entry
+is ever missing or counted twice.
+
+Archived entries stay queryable. `timeline()` adds the archive to an
+analytics query only when the requested range reaches below the archive
+boundary (the SQLite counterpart of partition pruning). `archived_entries()`
+and `get_archived()` serve export and single-entry reads, and
+`count_archived()` the overview's total.
+
+Archived entries are read-only: they can be read by id and deleted, but
+not edited (PUT answers 409), and the paged listing and text search leave
+them out, so those stay on the small hot table.
+
+    python -m utils.partitioning convert   # PostgreSQL: partition an existing table
+    python -m utils.partitioning archive   # run one archival pass now
+"""
+import argparse
+import logging
+import re
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, inspect, select, text, union_all
+
+from models import db, ArchivedJournalEntry, JournalEntry
+from utils import textstore
+
+logger = logging.getLogger(__name__)
+
+PARTITION_NAME = re.compile(r"^journal_entries_p(\d{4})_(\d{2})$")
+TIMELINE_COLUMNS = ("id", "sentiment", "score", "mood_rating", "tags", "timestamp")
+
+_settings = {"after_months": 0, "interval": 3600.0, "batch_size": 1000, "months_ahead": 3}
+_metrics = {
+    "runs": 0,
+    "last_run_archived": 0,
+    "total_archived": 0,
+    "partitions_dropped": 0,
+    "last_run_seconds": 0.0,
+    "last_run_at": None,
+}
+_archive_max = {"value": None}
+_thread: Optional[threading.Thread] = None
+_stop = threading.Event()
+
+
+def month_start(value: datetime, months_back: int = 0) -> datetime:
+    index = value.year * 12 + value.month - 1 - months_back
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def _next_month(value: datetime) -> datetime:
+    index = value.year * 12 + value.month
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+# ---------------------------------------------------------- partitions ---
+
+def is_partitioned() -> bool:
+    if db.engine.dialect.name != "postgresql":
+        return False
+    return bool(db.session.execute(text(
+        "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+        "WHERE c.relname = 'journal_entries' AND pg_table_is_visible(c.oid)"
+    )).scalar())
+
+
+def _partition_ddl(month: datetime) -> str:
+    return (f'CREATE TABLE IF NOT EXISTS journal_entries_p{month:%Y_%m} PARTITION OF journal_entries '
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{_next_month(month):%Y-%m-%d}')")
+
+
+def ensure_partitions(now: Optional[datetime] = None) -> int:
+    """Create monthly partitions from last month to `months_ahead` months ahead; returns how many were missing."""
+    if not is_partitioned():
+        return 0
+    now = now or datetime.utcnow()
+    existing = set(inspect(db.engine).get_table_names())
+    created = 0
+    month = month_start(now, 1)
+    for _ in range(_settings["months_ahead"] + 2):
+        if f"journal_entries_p{month:%Y_%m}" not in existing:
+            db.session.execute(text(_partition_ddl(month)))
+            created += 1
+        month = _next_month(month)
+    db.session.commit()
+    if created:
+        logger.info(f"Created {created} journal_entries partitions")
+    return created
+
+
+def convert_to_partitioned() -> None:
+    """Rebuild journal_entries as a monthly range-partitioned table (PostgreSQL, run offline).
+
+    Runs in one transaction: the old table is renamed, a partitioned parent
+    is created with the same columns and id sequence, partitions covering
+    the existing data are added, rows are copied, and the indexes are
+    recreated on the parent so every partition gets them.
+    """
+    if db.engine.dialect.name != "postgresql":
+        raise RuntimeError("Partitioning is PostgreSQL-only; SQLite uses the archive table alone")
+    if is_partitioned():
+        logger.info("journal_entries is already partitioned")
+        return
+    conn = db.session.connection()
+    conn.execute(text("ALTER TABLE journal_entries RENAME TO journal_entries_unpartitioned"))
+    # Index names are schema-wide, so free them up for the new parent
+    conn.execute(text("ALTER TABLE journal_entries_unpartitioned "
+                      "RENAME CONSTRAINT journal_entries_pkey TO journal_entries_unpartitioned_pkey"))
+    for index in JournalEntry.__table__.indexes:
+        conn.execute(text(f'DROP INDEX IF EXISTS "{index.name}"'))
+    sequence = conn.execute(text("SELECT pg_get_serial_sequence('journal_entries_unpartitioned', 'id')")).scalar()
+    # The partition key must be part of the primary key and cannot be NULL
+    conn.execute(text(
+        'UPDATE journal_entries_unpartitioned SET "timestamp" = COALESCE(updated_at, now()) '
+        'WHERE "timestamp" IS NULL'))
+    conn.execute(text(
+        "CREATE TABLE journal_entries (LIKE journal_entries_unpartitioned INCLUDING DEFAULTS) "
+        'PARTITION BY RANGE ("timestamp")'))
+    conn.execute(text('ALTER TABLE journal_entries ADD PRIMARY KEY (id, "timestamp")'))
+    conn.execute(text(
+        "ALTER TABLE journal_entries ADD FOREIGN KEY (user_id) REFERENCES users (id)"))
+    conn.execute(text("CREATE TABLE journal_entries_default PARTITION OF journal_entries DEFAULT"))
+
+    bounds = conn.execute(text('SELECT MIN("timestamp"), MAX("timestamp") FROM journal_entries_unpartitioned')).one()
+    if bounds[0] is not None:
+        month = month_start(bounds[0])
+        while month <= bounds[1]:
+            conn.execute(text(_partition_ddl(month)))
+            month = _next_month(month)
+    conn.execute(text("INSERT INTO journal_entries SELECT * FROM journal_entries_unpartitioned"))
+    if sequence:
+        conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY journal_entries.id"))
+    conn.execute(text("DROP TABLE journal_entries_unpartitioned"))
+    for index in JournalEntry.__table__.indexes:
+        index.create(conn)
+    db.session.commit()
+    ensure_partitions()
+    logger.info("journal_entries converted to monthly partitions")
+
+
+def _old_partitions(cutoff: datetime) -> List[str]:
+    """Monthly partitions that end at or before `cutoff`."""
+    names = db.session.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = 'journal_entries'"
+    )).scalars().all()
+    old = []
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match and _next_month(datetime(int(match.group(1)), int(match.group(2)), 1)) <= cutoff:
+            old.append(name)
+    return sorted(old)
+
+
+# ------------------------------------------------------------- archival ---
+
+def _archive_rows(entries) -> List[Dict]:
+    now = datetime.utcnow()
+    # Empty inline text means the text is in journal_entry_bodies
+    bodies = textstore.load_texts(e.id for e in entries if not e.text)
+    return [{
+        "id": e.id,
+        "user_id": e.user_id,
+        "text_z": zlib.compress((e.text or bodies.get(e.id, "")).encode("utf-8"), 9),
+        "sentiment": e.sentiment,
+        "score": e.score,
+        "mood_rating": e.mood_rating,
+        "tags": e.tags,
+        "timestamp": e.timestamp or e.updated_at or now,
+        "updated_at": e.updated_at,
+        "archived_at": now,
+    } for e in entries]
+
+
+def _archive_partition(name: str) -> int:
+    """Copy one monthly partition into the archive and drop it, atomically."""
+    columns = ", ".join(f'"{c.name}"' for c in JournalEntry.__table__.c)
+    moved = 0
+    conn = db.session.connection()
+    result = conn.execution_options(stream_results=True, yield_per=_settings["batch_size"]).execute(
+        text(f"SELECT {columns} FROM {name}"))
+    for batch in result.partitions():
+        conn.execute(ArchivedJournalEntry.__table__.insert(), _archive_rows(batch))
+        textstore.delete_bodies(row.id for row in batch if not row.text)
+        moved += len(batch)
+    conn.execute(text(f"DROP TABLE {name}"))
+    db.session.commit()
+    _metrics["partitions_dropped"] += 1
+    logger.info(f"Archived partition {name} ({moved} entries)")
+    return moved
+
+
+def archive_before(cutoff: datetime) -> int:
+    """Move entries with timestamp < cutoff into the archive; returns how many moved."""
+    moved = 0
+    if is_partitioned():
+        for name in _old_partitions(cutoff):
+            moved += _archive_partition(name)
+
+    # Unpartitioned tables, and stragglers in the default partition
+    table = JournalEntry.__table__
+    while not _stop.is_set():
+        batch = db.session.execute(
+            select(*table.c).where(table.c.timestamp < cutoff).order_by(table.c.timestamp)
+            .limit(_settings["batch_size"])).all()
+        if not batch:
+            break
+        db.session.execute(ArchivedJournalEntry.__table__.insert(), _archive_rows(batch))
+        db.session.execute(table.delete().where(table.c.id.in_([row.id for row in batch])))
+        textstore.delete_bodies(row.id for row in batch if not row.text)
+        db.session.commit()
+        moved += len(batch)
+        if len(batch) < _settings["batch_size"]:
+            break
+    refresh_archive_max()
+    return moved
+
+
+def refresh_archive_max() -> None:
+    """Re-read the newest archived timestamp; runs at startup and after every archival pass."""
+    _archive_max["value"] = db.session.query(func.max(ArchivedJournalEntry.timestamp)).scalar()
+
+
+def archive_boundary() -> Optional[datetime]:
+    """Entries at or after this instant are never in the archive (None: archive is empty).
+
+    The later of the configured cutoff (what archival passes, here or in
+    another worker, may have moved since the last refresh) and the newest
+    archived row: ARCHIVE_AFTER_MONTHS may have been raised, or switched off,
+    since older passes archived newer entries.
+    """
+    latest = _archive_max["value"]
+    stored = None if latest is None else latest + timedelta(seconds=1)
+    if _settings["after_months"] <= 0:
+        return stored
+    configured = month_start(datetime.utcnow(), _settings["after_months"])
+    return configured if stored is None else max(configured, stored)
+
+
+def timeline(user_id, start_date: datetime):
+    """Subquery over a user's entries since `start_date` with TIMELINE_COLUMNS, hot and (if needed) archived.
+
+    The hot side carries the timestamp bound that PostgreSQL uses to prune
+    partitions; the archive is only unioned in when the range reaches below
+    archive_boundary().
+    """
+    hot = select(*[JournalEntry.__table__.c[name] for name in TIMELINE_COLUMNS]).where(
+        JournalEntry.user_id == user_id, JournalEntry.timestamp >= start_date)
+    boundary = archive_boundary()
+    if boundary is None or start_date >= boundary:
+        return hot.subquery("timeline")
+    cold = select(*[ArchivedJournalEntry.__table__.c[name] for name in TIMELINE_COLUMNS]).where(
+        ArchivedJournalEntry.user_id == user_id, ArchivedJournalEntry.timestamp >= start_date)
+    return union_all(hot, cold).subquery("timeline")
+
+
+def archived_entries(user_id) -> List[ArchivedJournalEntry]:
+    if archive_boundary() is None:
+        return []
+    return ArchivedJournalEntry.query.filter_by(user_id=user_id).order_by(
+        ArchivedJournalEntry.timestamp.desc()).all()
+
+
+def get_archived(entry_id: int, user_id) -> Optional[ArchivedJournalEntry]:
+    if archive_boundary() is None:
+        return None
+    return ArchivedJournalEntry.query.filter_by(id=entry_id, user_id=user_id).first()
+
+
+def count_archived(user_id) -> int:
+    if archive_boundary() is None:
+        return 0
+    return ArchivedJournalEntry.query.filter_by(user_id=user_id).count()
+
+
+def run_once() -> int:
+    started = time.perf_counter()
+    ensure_partitions()
+    moved = 0
+    if _settings["after_months"] > 0:
+        moved = archive_before(month_start(datetime.utcnow(), _settings["after_months"]))
+    else:
+        refresh_archive_max()
+    _metrics["runs"] += 1
+    _metrics["last_run_archived"] = moved
+    _metrics["total_archived"] += moved
+    _metrics["last_run_seconds"] = round(time.perf_counter() - started, 4)
+    _metrics["last_run_at"] = datetime.utcnow().isoformat()
+    if moved:
+        logger.info(f"Archived {moved} journal entries")
+    return moved
+
+
+def stats() -> Dict:
+    return {**_metrics, "archive_after_months": _settings["after_months"]}
+
+
+def _loop(app) -> None:
+    while not _stop.wait(_settings["interval"]):
+        with app.app_context():
+            try:
+                run_once()
+            except Exception as e:
+                logger.error(f"Archival run failed: {e}")
+                db.session.rollback()
+            finally:
+                db.session.remove()
+
+
+def init_app(app) -> None:
+    """Create upcoming partitions now and start the archival job."""
+    global _thread
+    cfg = app.config
+    _settings["after_months"] = cfg.get("ARCHIVE_AFTER_MONTHS", 0)
+    _settings["interval"] = cfg.get("ARCHIVE_INTERVAL", 3600.0)
+    _settings["batch_size"] = cfg.get("ARCHIVE_BATCH_SIZE", 1000)
+    _settings["months_ahead"] = cfg.get("PARTITION_MONTHS_AHEAD", 3)
+    with app.app_context():
+        try:
+            ensure_partitions()
+            refresh_archive_max()
+        except Exception as e:
+            logger.error(f"Creating journal_entries partitions failed: {e}")
+            db.session.rollback()
+
+    if cfg.get("BACKGROUND_JOBS_ENABLED", True) and _thread is None:
+        _thread = threading.Thread(target=_loop, args=(app,), name="entry-archiver", daemon=True)
+        _thread.start()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="journal_entries partitioning and archival")
+    parser.add_argument("command", choices=("convert", "ensure", "archive"))
+    parser.add_argument("--months", type=int, help="archive entries older than N whole months (default: config)")
+    args = parser.parse_args()
+
+    import os
+    os.environ.setdefault("BACKGROUND_JOBS_ENABLED", "false")
+    from app import app
+    from utils import partitioning  # the instance init_app configured, not this __main__ copy
+
+    with app.app_context():
+        if args.command == "convert":
+            partitioning.convert_to_partitioned()
+        elif args.command == "ensure":
+            print(f"Created {partitioning.ensure_partitions()} partitions")
+        else:
+            months = args.months if args.months is not None else partitioning._settings["after_months"]
+            if months <= 0:
+                parser.error("pass --months or set ARCHIVE_AFTER_MONTHS")
+            print(f"Archived {partitioning.archive_before(month_start(datetime.utcnow(), months))} entries")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""Opt-in per-request profiler for tracking down slow endpoints.
+
+When PROFILE_ENABLED is false nothing is registered, so requests pay nothing.
+When enabled, a request is profiled if it carries `X-Profile: <PROFILE_TOKEN>`
+or is picked by PROFILE_SAMPLE_RATE. A sampler thread records the request
+thread's stack every PROFILE_INTERVAL_MS, and every SQL statement is timed.
+Only the slowest PROFILE_KEEP requests are kept in PROFILE_DIR, each as:
+
+  <id>.folded  collapsed stacks, one "frame;frame;frame count" per line
+               (flamegraph.pl, speedscope, inferno)
+  <id>.json    summary: route, timings, SQL statements, hottest frames
+"""
+import heapq
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import List, Tuple
+
+from flask import g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+_settings = {"dir": "profiles", "keep": 20, "interval": 0.005, "sample_rate": 0.0, "token": None}
+_kept: List[Tuple[float, str]] = []  # min-heap of (duration_ms, profile id)
+_kept_lock = threading.Lock()
+
+
+class StackSampler:
+    """Samples one thread's Python stack on a timer and counts collapsed stacks."""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            frames = []
+            while frame is not None:
+                code = frame.f_code
+                frames.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+                frame = frame.f_back
+            if frames:
+                self.stacks[";".join(reversed(frames))] += 1
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_app_context() and "profile_sql" in g:
+        conn.info.setdefault("profile_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("profile_query_start")
+    if starts and has_app_context() and "profile_sql" in g:
+        g.profile_sql.append({
+            "statement": " ".join(statement.split())[:2000],
+            "duration_ms": round((time.perf_counter() - starts.pop()) * 1000, 3),
+        })
+
+
+def _should_profile() -> bool:
+    token = _settings["token"]
+    if token and request.headers.get("X-Profile") == token:
+        return True
+    return _settings["sample_rate"] > 0 and random.random() < _settings["sample_rate"]
+
+
+def _start():
+    if not _should_profile():
+        return
+    g.profile_sql = []
+    g.profile_started = time.perf_counter()
+    g.profile_sampler = StackSampler(threading.get_ident(), _settings["interval"])
+    g.profile_sampler.start()
+
+
+def _finish(response):
+    sampler = g.pop("profile_sampler", None)
+    if sampler is None:
+        return response
+    sampler.stop()
+    duration_ms = (time.perf_counter() - g.pop("profile_started")) * 1000
+    sql = g.pop("profile_sql", [])
+    try:
+        profile_id = _keep(duration_ms, sampler, sql, response.status_code)
+        if profile_id:
+            response.headers["X-Profile-Id"] = profile_id
+    except Exception as e:
+        logger.warning(f"Failed to write request profile: {e}")
+    return response
+
+
+def _keep(duration_ms: float, sampler: StackSampler, sql: list, status: int):
+    with _kept_lock:
+        if len(_kept) >= _settings["keep"] and duration_ms <= _kept[0][0]:
+            return None
+        endpoint = re.sub(r"[^A-Za-z0-9_.-]", "_", request.endpoint or "unmatched")
+        profile_id = f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')}-{endpoint}-{int(duration_ms)}ms"
+        evicted = heapq.heappushpop(_kept, (duration_ms, profile_id)) if len(_kept) >= _settings["keep"] else None
+        if evicted is None:
+            heapq.heappush(_kept, (duration_ms, profile_id))
+
+    base = os.path.join(_settings["dir"], profile_id)
+    with open(f"{base}.folded", "w") as f:
+        for stack, count in sampler.stacks.most_common():
+            f.write(f"{stack} {count}\n")
+
+    leaf_counts = Counter()
+    for stack, count in sampler.stacks.items():
+        leaf_counts[stack.rsplit(";", 1)[-1]] += count
+    with open(f"{base}.json", "w") as f:
+        json.dump({
+            "id": profile_id,
+            "method": request.method,
+            "path": request.full_path.rstrip("?"),
+            "endpoint": request.endpoint,
+            "status": status,
+            "duration_ms": round(duration_ms, 3),
+            "sample_interval_ms": _settings["interval"] * 1000,
+            "samples": sum(sampler.stacks.values()),
+            "sql_count": len(sql),
+            "sql_total_ms": round(sum(q["duration_ms"] for q in sql), 3),
+            "sql": sorted(sql, key=lambda q: q["duration_ms"], reverse=True),
+            "hottest_frames": [{"frame": frame, "samples": n} for frame, n in leaf_counts.most_common(15)],
+        }, f, indent=2)
+
+    if evicted is not None:
+        for ext in (".folded", ".json"):
+            try:
+                os.remove(os.path.join(_settings["dir"], evicted[1] + ext))
+            except OSError:
+                pass
+    return profile_id
+
+
+def _load_existing() -> None:
+    # Keep honouring the slowest-N limit across restarts
+    for filename in os.listdir(_settings["dir"]):
+        if not filename.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(_settings["dir"], filename)) as f:
+                summary = json.load(f)
+            _kept.append((summary["duration_ms"], summary["id"]))
+        except (OSError, ValueError, KeyError):
+            continue
+    heapq.heapify(_kept)
+    while len(_kept) > _settings["keep"]:
+        _, profile_id = heapq.heappop(_kept)
+        for ext in (".folded", ".json"):
+            try:
+                os.remove(os.path.join(_settings["dir"], profile_id + ext))
+            except OSError:
+                pass
+
+
+def init_app(app) -> None:
+    cfg = app.config
+    if not cfg.get("PROFILE_ENABLED"):
+        return
+    _settings["dir"] = cfg.get("PROFILE_DIR", "profiles")
+    _settings["keep"] = cfg.get("PROFILE_KEEP", 20)
+    _settings["interval"] = cfg.get("PROFILE_INTERVAL_MS", 5) / 1000
+    _settings["sample_rate"] = cfg.get("PROFILE_SAMPLE_RATE", 0.0)
+    _settings["token"] = cfg.get("PROFILE_TOKEN")
+    os.makedirs(_settings["dir"], exist_ok=True)
+    _load_existing()
+
+    app.before_request(_start)
+    app.after_request(_finish)
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    logger.info(f"Request profiling enabled (sample_rate={_settings['sample_rate']}, dir={_settings['dir']})")
@@ -0,0 +1,216 @@
+"""Optional read-replica routing for read-only requests.
+
+With DATABASE_READ_URL set, the replica is registered as the "replica" bind
+and `RoutingSession.get_bind` sends SELECTs there when all of these hold:
+
+  * the request is a GET/HEAD to a blueprint in READ_REPLICA_BLUEPRINTS, or
+    to a view decorated with @prefer_replica;
+  * the JWT has already been verified (so revocation checks during
+    verification always read the primary);
+  * the session has not flushed anything in this request;
+  * the same user has not committed a write in the last
+    READ_REPLICA_STALENESS seconds (read-your-writes).
+
+Read-your-writes has to hold across worker processes, so it is carried by
+the client: a request that commits a write for its user answers with an
+X-Last-Write header (Unix time of the commit), and a request that sends a
+recent X-Last-Write back reads the primary. The header only ever moves the
+sender's own reads to the primary, so a forged value costs nothing. Writes
+made in this process are also remembered, for clients that do not echo it.
+
+Everything else, including all writes, goes to the primary. Code that
+reads in order to write (e.g. building a row on first use) wraps both in
+`with primary():`, so it never derives what it stores from a stale replica.
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from flask import current_app, g, has_request_context, request
+from flask_jwt_extended import get_jwt_identity
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+
+LAST_WRITE_HEADER = "X-Last-Write"
+
+_settings = {"enabled": False, "blueprints": frozenset(), "staleness": 5.0}
+_last_write: Dict[str, float] = {}
+_last_write_lock = threading.Lock()
+
+
+def _current_identity() -> Optional[str]:
+    try:
+        identity = get_jwt_identity()
+    except RuntimeError:
+        # No JWT verified yet in this request
+        return None
+    return str(identity) if identity is not None else None
+
+
+def recently_wrote(user_id) -> bool:
+    written_at = _last_write.get(str(user_id))
+    return written_at is not None and time.monotonic() - written_at < _settings["staleness"]
+
+
+def _client_wrote_recently() -> bool:
+    """True when the request echoes an X-Last-Write inside the staleness window."""
+    try:
+        written_at = float(request.headers.get(LAST_WRITE_HEADER, ""))
+    except ValueError:
+        return False
+    return time.time() - written_at < _settings["staleness"]
+
+
+def _mark_written(user_ids) -> None:
+    now = time.monotonic()
+    with _last_write_lock:
+        for user_id in user_ids:
+            _last_write[user_id] = now
+        if len(_last_write) > 10000:
+            cutoff = now - _settings["staleness"]
+            for user_id in [u for u, t in _last_write.items() if t < cutoff]:
+                del _last_write[user_id]
+
+
+def _replica_allowed() -> bool:
+    """Decide once per request (after JWT verification) whether reads may use the replica."""
+    decision = g.get("read_replica")
+    if decision is not None:
+        return decision
+    if request.method not in ("GET", "HEAD"):
+        g.read_replica = False
+        return False
+    view = current_app.view_functions.get(request.endpoint)
+    if request.blueprint not in _settings["blueprints"] and not getattr(view, "prefer_replica", False):
+        g.read_replica = False
+        return False
+    identity = _current_identity()
+    if identity is None:
+        return False  # undecided until the JWT is verified
+    g.read_replica = not (_client_wrote_recently() or recently_wrote(identity))
+    if not g.read_replica:
+        metrics.inc("db_replica_skipped_total", reason="recent_write")
+    return g.read_replica
+
+
+class RoutingSession(Session):
+    """Flask-SQLAlchemy session that reads from the replica bind when the request allows it."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and _settings["enabled"] and not self._flushing
+                and getattr(clause, "is_select", False) and not self.info.get("replica_writers")
+                and not self.info.get("primary_pins")
+                and has_request_context() and _replica_allowed()):
+            replica = self._db.engines.get("replica")
+            if replica is not None:
+                metrics.inc("db_replica_reads_total")
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _record_writers(session, flush_context):
+    writers = session.info.setdefault("replica_writers", set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        user_id = getattr(obj, "user_id", None)
+        if user_id is not None:
+            writers.add(str(user_id))
+    if has_request_context():
+        identity = _current_identity()
+        if identity is not None:
+            writers.add(identity)
+    if not writers:
+        # Still pin the rest of this transaction to the primary
+        writers.add("")
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _after_commit(session):
+    writers = session.info.pop("replica_writers", None)
+    if writers and _settings["enabled"]:
+        _mark_written(w for w in writers if w)
+        if has_request_context():
+            identity = _current_identity()
+            if identity is not None and identity in writers:
+                g.read_replica_written_at = time.time()
+
+
+def _stamp_response(response):
+    written_at = g.get("read_replica_written_at")
+    if written_at is not None:
+        response.headers[LAST_WRITE_HEADER] = f"{written_at:.3f}"
+    return response
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _after_rollback(session):
+    session.info.pop("replica_writers", None)
+
+
+def reading_replica() -> bool:
+    """True when this request's reads are going to the replica."""
+    return _settings["enabled"] and has_request_context() and bool(g.get("read_replica"))
+
+
+@contextmanager
+def primary():
+    """Send every statement in the block to the primary, including across commits and rollbacks."""
+    from models import db  # models imports this module for RoutingSession
+
+    info = db.session.info
+    info["primary_pins"] = info.get("primary_pins", 0) + 1
+    try:
+        yield
+    finally:
+        info["primary_pins"] -= 1
+
+
+def prefer_replica(view):
+    """Let a GET view outside READ_REPLICA_BLUEPRINTS read from the replica.
+
+    Other decorators built with functools.wraps (e.g. jwt_required) carry the
+    flag through, so the order below @route does not matter.
+    """
+    view.prefer_replica = True
+    return view
+
+
+def init_app(app) -> None:
+    """Register the replica bind; call after db_engine.init_app and before db.init_app."""
+    from utils.db_engine import engine_options, normalize_url
+
+    cfg = app.config
+    url = cfg.get("DATABASE_READ_URL")
+    _settings["blueprints"] = frozenset(b.strip() for b in cfg.get("READ_REPLICA_BLUEPRINTS", "").split(",")
+                                        if b.strip())
+    _settings["staleness"] = cfg.get("READ_REPLICA_STALENESS", 5.0)
+    app.after_request(_stamp_response)
+    if not url:
+        _settings["enabled"] = False
+        return
+    url = normalize_url(url)
+    binds = dict(cfg.get("SQLALCHEMY_BINDS") or {})
+    binds["replica"] = {"url": url, **engine_options(cfg, url)}
+    cfg["SQLALCHEMY_BINDS"] = binds
+    _settings["enabled"] = True
+    logger.info(f"Read replica enabled for blueprints {sorted(_settings['blueprints'])} "
+                f"(staleness window {_settings['staleness']}s)")
+
+
+def stats() -> Dict:
+    return {
+        "enabled": _settings["enabled"],
+        "blueprints": sorted(_settings["blueprints"]),
+        "staleness_seconds": _settings["staleness"],
+        "recent_writers": sum(1 for user_id in list(_last_write) if recently_wrote(user_id)),
+    }
+
+
+metrics.describe("db_replica_reads_total", "counter", "Statements routed to the read replica")
+metrics.describe("db_replica_skipped_total", "counter", "Replica-eligible requests kept on the primary")
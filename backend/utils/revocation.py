@@ -0,0 +1,197 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict
+
+from sqlalchemy import func
+
+from models import db, UserSession
+from utils.bloom import BloomFilter
+
+logger = logging.getLogger(__name__)
+
+# Revoked JWT ids live in user_sessions (session_token = jti, is_active = False).
+# Every process keeps a Bloom filter of them so the common "not revoked" answer
+# needs no lookup by jti; only filter hits fall through to the table.
+# Revocations made by other worker processes are pulled in on a filter miss:
+# at most once per REVOCATION_SYNC_INTERVAL, one indexed range query fetches
+# the rows revoked since the last sync (revoked_at). That interval bounds how
+# long another worker can accept a revoked token; 0 syncs on every miss.
+# The filter is rebuilt (dropping expired revocations) by the session sweeper,
+# and by sync itself once it holds more than its capacity, so it stays bounded
+# when background jobs are off.
+SYNC_OVERLAP = timedelta(seconds=5)  # re-reads a little history so slow commits are not missed
+
+_filter = BloomFilter(1024)
+_added_during_rebuild = set()  # only filled while a rebuild is running
+_rebuilding = False
+_lock = threading.Lock()
+_sync_lock = threading.Lock()
+_counters_lock = threading.Lock()
+# The newest revoked_at seen. It comes from the stored rows, so it is compared
+# only with other stored values, never with this host's clock.
+_synced = {"at": None, "monotonic": 0.0}
+_settings = {"capacity": 10000, "error_rate": 0.001, "sync_interval": 1.0}
+_counters = {"checks": 0, "filter_hits": 0, "revoked_hits": 0, "rebuilds": 0, "syncs": 0, "synced_tokens": 0}
+
+
+def _count(name: str, n: int = 1) -> None:
+    with _counters_lock:
+        _counters[name] += n
+
+
+def record_session(user_id: int, jti: str, expires_at: datetime) -> None:
+    """Add a session row for a newly issued token; the caller commits."""
+    db.session.add(UserSession(
+        user_id=user_id,
+        session_token=jti,
+        expires_at=expires_at,
+        is_active=True
+    ))
+
+
+def revoke(user_id: int, jti: str, expires_at: datetime) -> None:
+    """Mark a token as revoked and add it to the local filter; the caller commits."""
+    session = UserSession.query.filter_by(session_token=jti).first()
+    if session:
+        session.is_active = False
+        session.revoked_at = datetime.utcnow()
+    else:
+        # Tokens issued before sessions were recorded have no row yet
+        db.session.add(UserSession(
+            user_id=user_id,
+            session_token=jti,
+            expires_at=expires_at,
+            is_active=False,
+            revoked_at=datetime.utcnow()
+        ))
+    _add(jti)
+
+
+def _add(jti: str) -> None:
+    with _lock:
+        _filter.add(jti)
+        if _rebuilding:
+            _added_during_rebuild.add(jti)
+
+
+def revoke_all_for_user(user_id: int) -> int:
+    """Revoke every live session of a user (e.g. after a password reset); the caller commits."""
+    sessions = UserSession.query.filter(
+        UserSession.user_id == user_id,
+        UserSession.is_active.is_(True),
+        UserSession.expires_at > datetime.utcnow()
+    ).all()
+    now = datetime.utcnow()
+    for session in sessions:
+        session.is_active = False
+        session.revoked_at = now
+        _add(session.session_token)
+    return len(sessions)
+
+
+def sync() -> int:
+    """Add tokens revoked (by any process) since the last sync to the local filter."""
+    since = _synced["at"]
+    query = db.session.query(UserSession.session_token, UserSession.revoked_at).filter(
+        UserSession.revoked_at.isnot(None))
+    if since is not None:
+        query = query.filter(UserSession.revoked_at > since - SYNC_OVERLAP)
+    rows = query.all()
+    for (jti, _) in rows:
+        if jti not in _filter:  # the overlap re-reads rows already added
+            _add(jti)
+    if rows:
+        newest = max(revoked_at for _, revoked_at in rows)
+        _synced["at"] = newest if since is None else max(since, newest)
+    _synced["monotonic"] = time.monotonic()
+    _count("syncs")
+    _count("synced_tokens", len(rows))
+    if len(_filter) > _filter.capacity:
+        rebuild()
+    return len(rows)
+
+
+def _sync_due() -> bool:
+    return time.monotonic() - _synced["monotonic"] >= _settings["sync_interval"]
+
+
+def is_revoked(jti: str) -> bool:
+    _count("checks")
+    if jti not in _filter and _sync_due():
+        with _sync_lock:
+            if _sync_due():
+                sync()
+    if jti not in _filter:
+        return False
+    _count("filter_hits")
+    revoked = db.session.query(UserSession.id).filter(
+        UserSession.session_token == jti,
+        UserSession.is_active.is_(False)
+    ).first() is not None
+    if revoked:
+        _count("revoked_hits")
+    return revoked
+
+
+def rebuild() -> int:
+    """Reload the filter from unexpired revocations in the database."""
+    global _filter, _rebuilding
+    with _lock:
+        _added_during_rebuild.clear()
+        _rebuilding = True
+    try:
+        watermark = db.session.query(func.max(UserSession.revoked_at)).scalar()
+        rows = db.session.query(UserSession.session_token).filter(
+            UserSession.is_active.is_(False),
+            UserSession.expires_at > datetime.utcnow()
+        ).all()
+        fresh = BloomFilter(max(_settings["capacity"], len(rows) * 2), _settings["error_rate"])
+        for (jti,) in rows:
+            fresh.add(jti)
+        with _lock:
+            # Local revocations committed after the query above must not be lost
+            for jti in _added_during_rebuild:
+                fresh.add(jti)
+            _filter = fresh
+    finally:
+        with _lock:
+            _rebuilding = False
+            _added_during_rebuild.clear()
+    if watermark is not None:
+        _synced["at"] = watermark
+    _synced["monotonic"] = time.monotonic()
+    _count("rebuilds")
+    return len(rows)
+
+
+def stats() -> Dict:
+    with _counters_lock:
+        counters = dict(_counters)
+    return {
+        **counters,
+        "filter_items": len(_filter),
+        "filter_bits": _filter.num_bits,
+        "filter_hashes": _filter.num_hashes,
+        "sync_interval": _settings["sync_interval"],
+    }
+
+
+def init_app(app) -> None:
+    """Build the filter from the database at startup.
+
+    Periodic rebuilds (and deletion of expired revocations) are driven by
+    utils.session_sweeper.
+    """
+    _settings["capacity"] = app.config.get("REVOCATION_FILTER_CAPACITY", 10000)
+    _settings["error_rate"] = app.config.get("REVOCATION_FILTER_ERROR_RATE", 0.001)
+    _settings["sync_interval"] = app.config.get("REVOCATION_SYNC_INTERVAL", 1.0)
+
+    with app.app_context():
+        try:
+            count = rebuild()
+            logger.info(f"Revocation filter built with {count} revoked tokens")
+        except Exception as e:
+            logger.error(f"Revocation filter build failed: {e}")
+
@@ -0,0 +1,71 @@
+import logging
+
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateColumn, CreateIndex
+
+from models import db
+
+logger = logging.getLogger(__name__)
+
+
+def _add_missing_columns(inspector) -> None:
+    """ALTER TABLE ... ADD COLUMN for nullable model columns that an existing table lacks."""
+    preparer = db.engine.dialect.identifier_preparer
+    for table in db.metadata.sorted_tables:
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            if not column.nullable and column.server_default is None:
+                logger.warning(f"Cannot add NOT NULL column {table.name}.{column.name} without a default; migrate by hand")
+                continue
+            ddl = CreateColumn(column).compile(dialect=db.engine.dialect)
+            with db.engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {ddl}"))
+            logger.info(f"Added column {column.name} to {table.name}")
+
+
+def _create_index(index) -> None:
+    """CREATE INDEX, without blocking writes to the table on PostgreSQL.
+
+    A plain CREATE INDEX holds a lock that stops inserts and updates until the
+    build finishes, which on a large table (user_sessions) stalls logins on
+    every worker while the first one starts. PostgreSQL builds it
+    CONCURRENTLY instead, which cannot run inside a transaction; a failed
+    concurrent build leaves an INVALID index behind, so it is dropped again
+    for the next start to retry.
+    """
+    if db.engine.dialect.name != "postgresql":
+        index.create(db.engine, checkfirst=True)
+        return
+    options = index.dialect_options["postgresql"]
+    concurrently = options["concurrently"]
+    options["concurrently"] = True
+    try:
+        ddl = CreateIndex(index).compile(dialect=db.engine.dialect)
+    finally:
+        options["concurrently"] = concurrently
+    preparer = db.engine.dialect.identifier_preparer
+    with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        try:
+            conn.execute(text(str(ddl)))
+        except Exception:
+            conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {preparer.quote(index.name)}"))
+            raise
+
+
+def ensure_schema() -> None:
+    """Create missing tables, then any columns and indexes declared on tables that already exist.
+
+    `create_all` skips existing tables entirely, so columns and indexes added
+    to a model later would otherwise never reach deployed databases.
+    """
+    db.create_all()
+    _add_missing_columns(inspect(db.engine))
+    inspector = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        existing = {ix["name"] for ix in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                _create_index(index)
+                logger.info(f"Created index {index.name} on {table.name}")
@@ -1,12 +1,40 @@
 import os
 import logging
-from typing import Tuple
+import re
+import threading
+import time
+from typing import List, Optional, Tuple
 
-from transformers import pipeline, AutoTokenizer, AutoModelForSequenceClassification
+from utils import metrics
+
+# transformers/torch are imported inside _load_pipeline: they cost seconds and
+# hundreds of MB, which processes that never run inference should not pay.
 
 logger = logging.getLogger(__name__)
 
 _nlp_pipeline = None
+_load_lock = threading.Lock()
+
+# Out-of-process inference (see utils/inference_server.py). When the socket is
+# unreachable, SENTIMENT_FALLBACK chooses between loading the model locally
+# ('local') and answering NEUTRAL ('neutral').
+#
+# Fast first tier: a linear model over hashed n-grams, distilled from the
+# transformer's labels (train with `python -m utils.sentiment train`). Texts it
+# scores below SENTIMENT_FAST_THRESHOLD escalate to the transformer; without a
+# trained model file (or scikit-learn) every text goes to the transformer.
+DEFAULT_FAST_MODEL = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'instance', 'sentiment_fast.joblib'))
+_settings = {
+    "socket": None,
+    "socket_timeout": 2.0,
+    "socket_pool_size": 8,
+    "fallback": "neutral",
+    "fast_model": DEFAULT_FAST_MODEL,
+    "fast_threshold": 0.9,
+}
+
+_fast_model = None
+_fast_checked = False
 
 def _load_pipeline():
     """Lazy-load and cache a Transformers sentiment pipeline.
@@ -18,101 +46,457 @@ def _load_pipeline():
     if _nlp_pipeline is not None:
         return _nlp_pipeline
 
+    with _load_lock:
+        if _nlp_pipeline is None:
+            _nlp_pipeline = _build_pipeline()
+    return _nlp_pipeline
+
+
+def _build_pipeline():
     # From backend/utils -> ../../dataset/model_out
     model_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'dataset', 'model_out'))
     model_name = None
 
     try:
+        from transformers import pipeline, AutoTokenizer, AutoModelForSequenceClassification
+
         if os.path.isdir(model_dir) and os.path.exists(os.path.join(model_dir, 'config.json')):
             logger.info(f"Loading local fine-tuned model from: {model_dir}")
             tokenizer = AutoTokenizer.from_pretrained(model_dir)
             model = AutoModelForSequenceClassification.from_pretrained(model_dir)
-            _nlp_pipeline = pipeline('sentiment-analysis', model=model, tokenizer=tokenizer)
+            return pipeline('sentiment-analysis', model=model, tokenizer=tokenizer)
         else:
             model_name = 'distilbert-base-uncased-finetuned-sst-2-english'
             logger.info(f"Loading fallback model: {model_name}")
-            _nlp_pipeline = pipeline('sentiment-analysis', model=model_name)
+            return pipeline('sentiment-analysis', model=model_name)
     except Exception as e:
         logger.exception(f"Failed to initialize sentiment pipeline (model={model_name or model_dir}). Falling back to simple rule-based neutral.")
-        _nlp_pipeline = None
+        return None
 
-    return _nlp_pipeline
 
+_POSITIVE_WORDS = ('happy', 'happiness', 'great', 'good', 'grateful', 'excited', 'joy', 'joyful', 'wonderful', 'celebrat')
+_NEGATIVE_WORDS = ('sad', 'angry', 'upset', 'anxious', 'anxiety', 'stress', 'stressed', 'worried', 'fear', 'panic', 'depress')
+_NEUTRAL_WORDS = (
+    'routine','average','ordinary','okay','ok','fine','neutral','typical','usual','standard',
+    'balanced','normal','uneventful','nothing special','as usual','regular','usual schedule','got through'
+)
 
-def analyze_text(text: str) -> Tuple[str, float]:
-    """Analyze sentiment using a BERT-like model via Hugging Face Transformers.
 
-    Returns a tuple: (sentiment_label, confidence)
-    sentiment_label: 'POSITIVE' | 'NEGATIVE' | 'NEUTRAL'
-    confidence: 0..1
-    """
-    if not text or not text.strip():
-        return "NEUTRAL", 0.5
+def _postprocess(text: str, raw: dict) -> Tuple[str, float]:
+    """Map one raw pipeline output like {'label': 'POSITIVE', 'score': 0.997} to our labels."""
+    label = str(raw.get('label', 'NEUTRAL')).upper()
+    score = float(raw.get('score', 0.5))
+    # Normalize labels to POSITIVE/NEGATIVE/NEUTRAL
+    if 'NEUTRAL' in label:
+        label = 'NEUTRAL'
+    elif 'POS' in label:
+        label = 'POSITIVE'
+    elif 'NEG' in label:
+        label = 'NEGATIVE'
+    else:
+        # Unknown label from a custom head - map by threshold
+        label = 'POSITIVE' if score >= 0.6 else 'NEGATIVE' if score <= 0.4 else 'NEUTRAL'
+
+    # If the model is binary (POSITIVE/NEGATIVE only), treat near-mid outputs as NEUTRAL
+    # Wider neutral band around 0.5 to respect neutral statements.
+    if label in ('POSITIVE', 'NEGATIVE') and 0.45 <= score <= 0.55:
+        label = 'NEUTRAL'
+
+    # Light lexical heuristic to correct obvious misclassifications at low confidence
+    tl = (text or '').lower()
+    pos_words, neg_words, neu_words = _POSITIVE_WORDS, _NEGATIVE_WORDS, _NEUTRAL_WORDS
+    if label == 'NEGATIVE' and score < 0.7 and any(w in tl for w in pos_words):
+        label = 'POSITIVE'
+        score = max(score, 0.65)
+    elif label == 'POSITIVE' and score < 0.7 and any(w in tl for w in neg_words):
+        label = 'NEGATIVE'
+        score = max(score, 0.65)
+    elif label == 'NEUTRAL':
+        # Flip NEUTRAL to POSITIVE if any positive word is present, unless strong negative words are also present
+        if any(w in tl for w in pos_words) and not any(w in tl for w in neg_words):
+            label = 'POSITIVE'
+            score = max(score, 0.8)  # More confident
+        elif any(w in tl for w in neg_words) and not any(w in tl for w in pos_words):
+            label = 'NEGATIVE'
+            score = max(score, 0.8)
+        elif any(w in tl for w in neu_words):
+            label = 'NEUTRAL'
+            score = 0.5
+
+    # If text explicitly contains neutral cues and model confidence is not strong, force NEUTRAL
+    if any(w in tl for w in neu_words) and score < 0.7 and label in ('POSITIVE','NEGATIVE'):
+        label = 'NEUTRAL'
+        score = 0.5
+
+    logger.debug(f"BERT sentiment: label={label}, score={score:.4f}")
+    return label, max(0.0, min(1.0, score))
+
+
+def analyze_batch(texts: List[str]) -> List[Tuple[str, float]]:
+    """Run the in-process model over several texts in a single pipeline call."""
+    results = [("NEUTRAL", 0.5)] * len(texts)
+    indices = [i for i, text in enumerate(texts) if text and text.strip()]
+    if not indices:
+        return results
 
     nlp = _load_pipeline()
     if nlp is None:
         # Extremely defensive fallback if model failed to load
         logger.warning("Sentiment pipeline unavailable; returning NEUTRAL fallback")
-        return "NEUTRAL", 0.5
+        metrics.inc("sentiment_fallbacks_total", reason="model_unavailable")
+        return results
 
     try:
-        result = nlp(text[:4096])  # avoid excessively long inputs
-        # result is typically a list like: [{'label': 'POSITIVE', 'score': 0.997}]
-        if isinstance(result, list) and len(result) > 0:
-            label = result[0].get('label', 'NEUTRAL').upper()
-            score = float(result[0].get('score', 0.5))
-            # Normalize labels to POSITIVE/NEGATIVE/NEUTRAL
-            if 'NEUTRAL' in label:
-                label = 'NEUTRAL'
-            elif 'POS' in label:
-                label = 'POSITIVE'
-            elif 'NEG' in label:
-                label = 'NEGATIVE'
-            else:
-                # Unknown label from a custom head - map by threshold
-                label = 'POSITIVE' if score >= 0.6 else 'NEGATIVE' if score <= 0.4 else 'NEUTRAL'
-
-            # If the model is binary (POSITIVE/NEGATIVE only), treat near-mid outputs as NEUTRAL
-            # Wider neutral band around 0.5 to respect neutral statements.
-            if label in ('POSITIVE', 'NEGATIVE') and 0.45 <= score <= 0.55:
-                label = 'NEUTRAL'
-
-            # Light lexical heuristic to correct obvious misclassifications at low confidence
-            tl = (text or '').lower()
-            pos_words = ('happy', 'happiness', 'great', 'good', 'grateful', 'excited', 'joy', 'joyful', 'wonderful', 'celebrat')
-            neg_words = ('sad', 'angry', 'upset', 'anxious', 'anxiety', 'stress', 'stressed', 'worried', 'fear', 'panic', 'depress')
-            neu_words = (
-                'routine','average','ordinary','okay','ok','fine','neutral','typical','usual','standard',
-                'balanced','normal','uneventful','nothing special','as usual','regular','usual schedule','got through'
-            )
-            if label == 'NEGATIVE' and score < 0.7 and any(w in tl for w in pos_words):
-                label = 'POSITIVE'
-                score = max(score, 0.65)
-            elif label == 'POSITIVE' and score < 0.7 and any(w in tl for w in neg_words):
-                label = 'NEGATIVE'
-                score = max(score, 0.65)
-            elif label == 'NEUTRAL':
-                # Flip NEUTRAL to POSITIVE if any positive word is present, unless strong negative words are also present
-                if any(w in tl for w in pos_words) and not any(w in tl for w in neg_words):
-                    label = 'POSITIVE'
-                    score = max(score, 0.8)  # More confident
-                elif any(w in tl for w in neg_words) and not any(w in tl for w in pos_words):
-                    label = 'NEGATIVE'
-                    score = max(score, 0.8)
-                elif any(w in tl for w in neu_words):
-                    label = 'NEUTRAL'
-                    score = 0.5
-
-            # If text explicitly contains neutral cues and model confidence is not strong, force NEUTRAL
-            if any(w in tl for w in neu_words) and score < 0.7 and label in ('POSITIVE','NEGATIVE'):
-                label = 'NEUTRAL'
-                score = 0.5
-
-            logger.info(f"BERT sentiment: label={label}, score={score:.4f}")
-            return label, max(0.0, min(1.0, score))
+        started = time.perf_counter()
+        # avoid excessively long inputs
+        raw = nlp([texts[i][:4096] for i in indices], truncation=True)
+        metrics.observe("sentiment_inference_seconds", time.perf_counter() - started)
+        metrics.observe("sentiment_batch_size", len(indices))
+        for i, item in zip(indices, raw):
+            results[i] = _postprocess(texts[i], item)
     except Exception as e:
         logger.exception(f"Sentiment inference failed: {e}")
+    return results
+
+
+def _analyze_remote(text: str) -> Tuple[str, float]:
+    from utils.inference_server import get_client, InferenceUnavailable
+
+    started = time.perf_counter()
+    try:
+        client = get_client(_settings["socket"], timeout=_settings["socket_timeout"],
+                            pool_size=_settings["socket_pool_size"])
+        result = client.analyze([text])[0]
+        metrics.observe("sentiment_remote_seconds", time.perf_counter() - started)
+        return result
+    except InferenceUnavailable as e:
+        metrics.inc("sentiment_fallbacks_total", reason="server_unavailable")
+        if _settings["fallback"] == 'local':
+            logger.warning(f"Inference server unavailable ({e}); running model in-process")
+            return analyze_batch([text])[0]
+        logger.warning(f"Inference server unavailable ({e}); returning NEUTRAL fallback")
+        return "NEUTRAL", 0.5
+
+
+_TOKEN = re.compile(r"(?u)\b\w\w+\b")  # HashingVectorizer's default token_pattern
+
+
+def build_fast_model(n_features: int = 2 ** 18):
+    """Untrained scikit-learn pipeline for the fast tier: hashed word 1-2 grams into logistic regression."""
+    from sklearn.feature_extraction.text import HashingVectorizer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import make_pipeline
+
+    return make_pipeline(
+        HashingVectorizer(ngram_range=(1, 2), n_features=n_features, alternate_sign=False, norm="l2"),
+        LogisticRegression(C=4.0, max_iter=1000),
+    )
+
+
+class FastSentimentModel:
+    """Compact predictor equivalent to a fitted build_fast_model() pipeline.
+
+    scikit-learn spends hundreds of microseconds validating a single-text
+    call; this hashes the n-grams itself (the same murmurhash3 and indexing
+    as HashingVectorizer) and takes the dot product with the weight rows
+    directly.
+    """
+
+    def __init__(self, classes, weights, intercept, ngram_range=(1, 2)):
+        import numpy as np
+
+        self.classes = [str(c) for c in classes]
+        self.weights = np.asarray(weights, dtype=np.float32)  # (n_features, n_classes)
+        self.intercept = np.asarray(intercept, dtype=np.float32)
+        self.n_features = self.weights.shape[0]
+        self.ngram_range = tuple(ngram_range)
+
+    @classmethod
+    def from_pipeline(cls, pipeline) -> "FastSentimentModel":
+        import numpy as np
+
+        vectorizer, classifier = pipeline.steps[0][1], pipeline.steps[-1][1]
+        coef, intercept = classifier.coef_, classifier.intercept_
+        if coef.shape[0] == 1:
+            # Binary logistic regression stores one row; split it across both classes for the softmax
+            coef, intercept = np.vstack([-coef[0] / 2, coef[0] / 2]), np.array([-intercept[0] / 2, intercept[0] / 2])
+        return cls(classifier.classes_, coef.T, intercept, vectorizer.ngram_range)
+
+    def to_dict(self) -> dict:
+        return {"classes": self.classes, "weights": self.weights, "intercept": self.intercept,
+                "ngram_range": self.ngram_range}
+
+    def _features(self, text: str):
+        from sklearn.utils import murmurhash3_32
+
+        tokens = _TOKEN.findall(text.lower())
+        counts = {}
+        low, high = self.ngram_range
+        for n in range(low, high + 1):
+            for i in range(len(tokens) - n + 1):
+                gram = tokens[i] if n == 1 else " ".join(tokens[i:i + n])
+                index = abs(murmurhash3_32(gram, seed=0)) % self.n_features
+                counts[index] = counts.get(index, 0) + 1
+        return counts
+
+    def predict(self, texts: List[str]) -> List[Tuple[str, float]]:
+        import numpy as np
+
+        results = []
+        for text in texts:
+            counts = self._features(text[:4096])
+            logits = self.intercept.astype(np.float64)
+            if counts:
+                values = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+                values /= np.sqrt(values @ values)
+                logits = logits + values @ self.weights[list(counts)]
+            exp = np.exp(logits - logits.max())
+            best = int(exp.argmax())
+            results.append((self.classes[best], float(exp[best] / exp.sum())))
+        return results
+
+
+def _load_fast_model():
+    """Load the fast tier once; None when there is no trained model or numpy/scikit-learn is missing."""
+    global _fast_model, _fast_checked
+    if _fast_checked:
+        return _fast_model
+
+    with _load_lock:
+        if not _fast_checked:
+            path = _settings["fast_model"]
+            if path and os.path.exists(path):
+                try:
+                    import joblib
+                    _fast_model = FastSentimentModel(**joblib.load(path))
+                    logger.info(f"Loaded fast sentiment model from {path} "
+                                f"(threshold {_settings['fast_threshold']})")
+                except Exception as e:
+                    logger.error(f"Fast sentiment model unavailable ({e}); using the transformer only")
+            _fast_checked = True
+    return _fast_model
 
+
+def fast_predict(texts: List[str], model: Optional[FastSentimentModel] = None) -> List[Tuple[str, float]]:
+    """Fast-tier (label, probability) for each text; `model` defaults to the loaded one."""
+    return (model or _load_fast_model()).predict(texts)
+
+
+def analyze_fast(text: str) -> Optional[Tuple[str, float]]:
+    """The fast tier's answer when it is confident enough, else None (escalate)."""
+    if _load_fast_model() is None:
+        return None
+    started = time.perf_counter()
+    label, probability = fast_predict([text])[0]
+    metrics.observe("sentiment_fast_seconds", time.perf_counter() - started)
+    if probability < _settings["fast_threshold"]:
+        return None
+    metrics.inc("sentiment_tier_total", tier="fast")
+    return label, probability
+
+
+def analyze_model(text: str) -> Tuple[str, float]:
+    """The transformer alone: in-process, or through the inference server when SENTIMENT_SOCKET is set."""
+    if _fast_model is not None:
+        metrics.inc("sentiment_tier_total", tier="transformer")
+    if _settings["socket"]:
+        return _analyze_remote(text)
+    return analyze_batch([text])[0]
+
+
+def analyze_lexical(text: str) -> Tuple[str, float]:
+    """Degraded scoring that never touches the transformer (see utils/admission.py).
+
+    Uses the fast tier's best guess whatever its confidence, or a keyword vote
+    when no fast model is trained.
+    """
+    if not text or not text.strip():
+        return "NEUTRAL", 0.5
+    if _load_fast_model() is not None:
+        return fast_predict([text])[0]
+    tl = text.lower()
+    positive = sum(1 for w in _POSITIVE_WORDS if w in tl)
+    negative = sum(1 for w in _NEGATIVE_WORDS if w in tl)
+    if positive > negative:
+        return "POSITIVE", 0.6
+    if negative > positive:
+        return "NEGATIVE", 0.6
     return "NEUTRAL", 0.5
 
 
+def analyze_text(text: str) -> Tuple[str, float]:
+    """Analyze sentiment using a BERT-like model via Hugging Face Transformers.
+
+    The fast tier answers first when a trained model is present; only texts
+    it is unsure about reach the transformer, which runs in-process, or through
+    the inference server (utils.inference_server) when SENTIMENT_SOCKET is set.
+
+    Returns a tuple: (sentiment_label, confidence)
+    sentiment_label: 'POSITIVE' | 'NEGATIVE' | 'NEUTRAL'
+    confidence: 0..1
+    """
+    if not text or not text.strip():
+        return "NEUTRAL", 0.5
+
+    fast = analyze_fast(text)
+    if fast is not None:
+        return fast
+    return analyze_model(text)
+
+
+def init_app(app) -> None:
+    global _fast_model, _fast_checked
+    cfg = app.config
+    _settings["socket"] = cfg.get("SENTIMENT_SOCKET")
+    _settings["socket_timeout"] = cfg.get("SENTIMENT_SOCKET_TIMEOUT", 2.0)
+    _settings["socket_pool_size"] = cfg.get("SENTIMENT_SOCKET_POOL_SIZE", 8)
+    _settings["fallback"] = (cfg.get("SENTIMENT_FALLBACK") or "neutral").lower()
+    fast_model = cfg.get("SENTIMENT_FAST_MODEL")
+    # Unset means the default path; an empty string turns the fast tier off
+    _settings["fast_model"] = DEFAULT_FAST_MODEL if fast_model is None else fast_model
+    _settings["fast_threshold"] = cfg.get("SENTIMENT_FAST_THRESHOLD", 0.9)
+    with _load_lock:
+        _fast_model, _fast_checked = None, False
+
+
+# ------------------------------------------------------ fast-tier training ---
+
+REPORT_THRESHOLDS = (0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95, 0.98, 0.99)
+
+
+def _training_corpus(limit: int, labels: str, log=print):
+    """(texts, labels, is_holdout) from journal_entries; every fifth entry id is held out."""
+    from app import app
+    from models import JournalEntry
+    from utils import entry_records
+
+    with app.app_context():
+        stmt = entry_records.entry_select().order_by(JournalEntry.id.desc()).limit(limit)
+        records = [r for r in entry_records.fetch(stmt) if r.text and r.text.strip()]
+    texts = [r.text for r in records]
+    holdout = [r.id % 5 == 0 for r in records]
+    if labels == "stored":
+        return texts, [r.sentiment for r in records], holdout
+
+    if _load_pipeline() is None:
+        raise RuntimeError("Transformer unavailable; use --labels stored to train on the labels already in the database")
+    targets = []
+    for start in range(0, len(texts), 32):
+        targets.extend(label for label, _ in analyze_batch(texts[start:start + 32]))
+        log(f"Labelled {len(targets)}/{len(texts)} entries with the transformer")
+    return texts, targets, holdout
+
+
+def _transformer_ms(texts: List[str]) -> Optional[float]:
+    """Per-text latency of single-text transformer calls, as the API makes them (None if unavailable)."""
+    if _load_pipeline() is None or not texts:
+        return None
+    sample = texts[:50]
+    analyze_batch(sample[:1])  # warm up
+    started = time.perf_counter()
+    for text in sample:
+        analyze_batch([text])
+    return (time.perf_counter() - started) * 1000 / len(sample)
+
+
+def tier_report(model, texts: List[str], labels: List[str], transformer_ms: float) -> List[dict]:
+    """Accuracy and throughput of the two tiers at each REPORT_THRESHOLDS value.
+
+    Accuracy is measured against the transformer's labels, so escalated texts
+    count as correct; `fast_accuracy` is the fast tier alone on what it answers.
+    """
+    started = time.perf_counter()
+    for text in texts[:500]:
+        fast_predict([text], model)
+    fast_ms = (time.perf_counter() - started) * 1000 / min(len(texts), 500)
+    predictions = fast_predict(texts, model)
+
+    rows = []
+    for threshold in REPORT_THRESHOLDS:
+        answered = [(p, y) for p, y in zip(predictions, labels) if p[1] >= threshold]
+        correct = sum(1 for (label, _), y in answered if label == y)
+        escalation = 1 - len(answered) / len(texts)
+        per_text_ms = fast_ms + escalation * transformer_ms
+        rows.append({
+            "threshold": threshold,
+            "escalation_rate": round(escalation, 4),
+            "fast_accuracy": round(correct / len(answered), 4) if answered else None,
+            "accuracy": round((correct + len(texts) - len(answered)) / len(texts), 4),
+            "per_text_ms": round(per_text_ms, 3),
+            "texts_per_s": round(1000 / per_text_ms, 1),
+        })
+    rows.append({"threshold": None, "escalation_rate": 1.0, "fast_accuracy": None, "accuracy": 1.0,
+                 "per_text_ms": round(transformer_ms, 3), "texts_per_s": round(1000 / transformer_ms, 1)})
+    return rows
+
+
+def _print_report(rows: List[dict], fast_ms_note: str) -> None:
+    print(f"\n{'threshold':>9} {'escalated':>10} {'fast acc':>9} {'accuracy':>9} {'ms/text':>8} {'texts/s':>9}")
+    for row in rows:
+        name = "BERT only" if row["threshold"] is None else f"{row['threshold']:.2f}"
+        fast_acc = f"{row['fast_accuracy']:.3f}" if row["fast_accuracy"] is not None else "-"
+        print(f"{name:>9} {row['escalation_rate']:>10.1%} {fast_acc:>9} {row['accuracy']:>9.3f} "
+              f"{row['per_text_ms']:>8.3f} {row['texts_per_s']:>9.1f}")
+    print(fast_ms_note)
+
+
+def main(argv=None) -> int:
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Train and evaluate the fast sentiment tier")
+    parser.add_argument("command", choices=("train", "report"))
+    parser.add_argument("--labels", choices=("model", "stored"), default="model",
+                        help="targets: fresh transformer labels, or the sentiment already stored per entry")
+    parser.add_argument("--limit", type=int, default=200000, help="newest entries to use")
+    parser.add_argument("--output", help="model file (default: SENTIMENT_FAST_MODEL)")
+    parser.add_argument("--transformer-ms", type=float,
+                        help="per-text transformer latency for the report (default: measured)")
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("BACKGROUND_JOBS_ENABLED", "false")
+    from app import app
+    args.output = args.output or app.config.get("SENTIMENT_FAST_MODEL") or DEFAULT_FAST_MODEL
+    texts, labels, holdout = _training_corpus(args.limit, args.labels)
+    train_x = [t for t, h in zip(texts, holdout) if not h]
+    train_y = [y for y, h in zip(labels, holdout) if not h]
+    test_x = [t for t, h in zip(texts, holdout) if h]
+    test_y = [y for y, h in zip(labels, holdout) if h]
+    if not test_x or len(set(train_y)) < 2:
+        print("Not enough labelled entries to train and evaluate")
+        return 1
+
+    import joblib
+    if args.command == "train":
+        pipeline = build_fast_model()
+        started = time.perf_counter()
+        pipeline.fit(train_x, train_y)
+        print(f"Trained on {len(train_x)} entries in {time.perf_counter() - started:.1f}s")
+        model = FastSentimentModel.from_pipeline(pipeline)
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        # A plain dict of arrays, so loading does not depend on how this module was imported
+        joblib.dump(model.to_dict(), args.output, compress=3)
+        print(f"Saved {args.output}")
+    else:
+        model = FastSentimentModel(**joblib.load(args.output))
+
+    transformer_ms = args.transformer_ms or _transformer_ms(test_x)
+    note = f"Evaluated on {len(test_x)} held-out entries ({args.labels} labels)"
+    if transformer_ms is None:
+        transformer_ms = 25.0
+        note += "; transformer unavailable, assuming 25 ms/text (set --transformer-ms)"
+    else:
+        note += f"; transformer {transformer_ms:.1f} ms/text"
+    rows = tier_report(model, test_x, test_y, transformer_ms)
+    _print_report(rows, note)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"labels": args.labels, "holdout": len(test_x), "transformer_ms": transformer_ms,
+                       "rows": rows}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(main())
@@ -0,0 +1,91 @@
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlalchemy import func
+
+from models import db, UserSession
+from utils import revocation
+
+logger = logging.getLogger(__name__)
+
+_settings = {"interval": 60.0, "batch_size": 500, "max_batches": 100, "batch_pause": 0.05}
+_metrics = {
+    "runs": 0,
+    "last_run_swept": 0,
+    "total_swept": 0,
+    "last_run_seconds": 0.0,
+    "last_run_at": None,
+    "table_rows": None,
+}
+_thread: Optional[threading.Thread] = None
+_stop = threading.Event()
+
+
+def sweep_expired() -> int:
+    """Delete expired user_sessions rows in small batches, one transaction per batch.
+
+    Short transactions keep row locks brief so logins and logouts are never
+    queued behind a large DELETE. A run stops after `max_batches`; the rest
+    is picked up next time.
+    """
+    swept = 0
+    for _ in range(_settings["max_batches"]):
+        ids = [row.id for row in db.session.query(UserSession.id).filter(
+            UserSession.expires_at <= datetime.utcnow()
+        ).limit(_settings["batch_size"]).all()]
+        if not ids:
+            break
+        UserSession.query.filter(UserSession.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+        swept += len(ids)
+        if len(ids) < _settings["batch_size"]:
+            break
+        time.sleep(_settings["batch_pause"])
+    return swept
+
+
+def run_once() -> int:
+    started = time.perf_counter()
+    swept = sweep_expired()
+    _metrics["runs"] += 1
+    _metrics["last_run_swept"] = swept
+    _metrics["total_swept"] += swept
+    _metrics["last_run_seconds"] = round(time.perf_counter() - started, 4)
+    _metrics["last_run_at"] = datetime.utcnow().isoformat()
+    _metrics["table_rows"] = db.session.query(func.count(UserSession.id)).scalar()
+    # Expired revocations are gone now; rebuilding drops them from the filter
+    # (revocations by other workers arrive through revocation.sync()).
+    revocation.rebuild()
+    if swept:
+        logger.info(f"Session sweep removed {swept} expired rows ({_metrics['table_rows']} remain)")
+    return swept
+
+
+def stats() -> Dict:
+    return dict(_metrics)
+
+
+def _loop(app) -> None:
+    while not _stop.wait(_settings["interval"]):
+        with app.app_context():
+            try:
+                run_once()
+            except Exception as e:
+                logger.error(f"Session sweep failed: {e}")
+                db.session.rollback()
+            finally:
+                db.session.remove()
+
+
+def init_app(app) -> None:
+    global _thread
+    _settings["interval"] = app.config.get("SESSION_SWEEP_INTERVAL", 60.0)
+    _settings["batch_size"] = app.config.get("SESSION_SWEEP_BATCH_SIZE", 500)
+    _settings["max_batches"] = app.config.get("SESSION_SWEEP_MAX_BATCHES", 100)
+
+    if app.config.get("BACKGROUND_JOBS_ENABLED", True) and _thread is None:
+        _thread = threading.Thread(target=_loop, args=(app,), name="session-sweeper", daemon=True)
+        _thread.start()
@@ -0,0 +1,361 @@
+"""Opt-in compressed storage for journal entry text.
+
+With TEXT_COMPRESSION_ENABLED, entry text of at least TEXT_COMPRESSION_MIN_BYTES
+is stored compressed in journal_entry_bodies, and journal_entries.text is left
+as ''. This keeps the rows that listing and aggregate queries scan small. The
+codec is zstd with a shared dictionary trained from existing entries. When
+the optional zstandard package is missing, it is raw deflate with the same
+dictionary as a preset (zlib only uses the last 32 KiB of it). Every body
+records its codec and dictionary, so rows written under older settings stay
+readable.
+
+Bodies are only loaded when something needs the text: JournalEntry.text
+reads the inline column when it is non-empty, and otherwise the `body`
+relationship. Routes that serialize many entries wrap their query in
+`with_bodies()` so all bodies arrive in one extra SELECT. Each body is
+decompressed only when its text is accessed.
+
+Reads never depend on this process's settings: empty inline text always
+means "look for a body", so `migrate` can run while workers serve traffic.
+Writes are compressed only by workers started with TEXT_COMPRESSION_ENABLED,
+and `migrate` refuses to run without it. Enable it everywhere and restart
+the workers before migrating, or new long entries stay inline. A newly
+trained dictionary is used for writes by the process that trained it, and
+by other workers after their next restart; any worker can read it.
+
+    python -m utils.textstore train      # train a dictionary from existing entries
+    python -m utils.textstore migrate    # compress existing inline text
+    python -m utils.textstore inline     # undo: move text back into journal_entries
+"""
+import argparse
+import logging
+import threading
+import zlib
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import bindparam, event, exists, func, select
+from sqlalchemy.orm import selectinload
+
+try:
+    import zstandard
+except ImportError:  # optional; deflate with a preset dictionary is used instead
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+ZLIB_WINDOW = 32 * 1024
+
+_settings = {"enabled": False, "level": 3, "min_bytes": 256, "dictionary_size": 32768, "samples": 10000}
+_state = {"dictionary_id": None}
+_metrics = {"compressed": 0, "raw_bytes": 0, "stored_bytes": 0, "decompressed": 0,
+            "migrate_skipped": 0, "migrate_changed": 0}
+_dictionaries: Dict[int, bytes] = {}
+_local = threading.local()
+
+
+def available_codec() -> str:
+    return "zstd" if zstandard is not None else "zlib"
+
+
+def _dictionary(dictionary_id: Optional[int]) -> Optional[bytes]:
+    if dictionary_id is None:
+        return None
+    data = _dictionaries.get(dictionary_id)
+    if data is None:
+        from models import db, TextDictionary
+        row = db.session.get(TextDictionary, dictionary_id)
+        if row is None:
+            raise LookupError(f"Text dictionary {dictionary_id} is missing")
+        data = _dictionaries[dictionary_id] = row.data
+    return data
+
+
+def _zstd(kind: str, dictionary_id: Optional[int], level: int = 0):
+    # zstd (de)compressors are not thread-safe; keep one per thread, dictionary and level
+    cache = getattr(_local, "zstd", None)
+    if cache is None:
+        cache = _local.zstd = {}
+    key = (kind, dictionary_id, level)
+    codec = cache.get(key)
+    if codec is None:
+        data = _dictionary(dictionary_id)
+        zdict = zstandard.ZstdCompressionDict(data) if data else None
+        if kind == "c":
+            codec = zstandard.ZstdCompressor(level=level, dict_data=zdict)
+        else:
+            codec = zstandard.ZstdDecompressor(dict_data=zdict)
+        cache[key] = codec
+    return codec
+
+
+def compress(value: str) -> Tuple[str, Optional[int], bytes]:
+    """(codec, dictionary id, payload) for `value` using the current dictionary."""
+    raw = value.encode("utf-8")
+    dictionary_id = _state["dictionary_id"]
+    if zstandard is not None:
+        codec, data = "zstd", _zstd("c", dictionary_id, _settings["level"]).compress(raw)
+    else:
+        zdict = _dictionary(dictionary_id)
+        compressor = zlib.compressobj(min(_settings["level"] * 2, 9), zlib.DEFLATED, -15,
+                                      **({"zdict": zdict[-ZLIB_WINDOW:]} if zdict else {}))
+        codec, data = "zlib", compressor.compress(raw) + compressor.flush()
+    _metrics["compressed"] += 1
+    _metrics["raw_bytes"] += len(raw)
+    _metrics["stored_bytes"] += len(data)
+    return codec, dictionary_id, data
+
+
+def decompress(codec: str, dictionary_id: Optional[int], data: bytes) -> str:
+    _metrics["decompressed"] += 1
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Entry body is zstd-compressed but the zstandard package is not installed")
+        return _zstd("d", dictionary_id).decompress(data).decode("utf-8")
+    if codec == "zlib":
+        zdict = _dictionary(dictionary_id)
+        decompressor = zlib.decompressobj(-15, **({"zdict": zdict[-ZLIB_WINDOW:]} if zdict else {}))
+        return (decompressor.decompress(data) + decompressor.flush()).decode("utf-8")
+    raise ValueError(f"Unknown text codec {codec!r}")
+
+
+def store(entry, value: str) -> None:
+    """JournalEntry.text setter: inline when disabled or short, otherwise compressed into entry.body."""
+    from models import JournalEntryBody
+
+    # Only a persisted entry with empty inline text can already have a body
+    compressed_before = entry.id is not None and not entry._text
+    if not _settings["enabled"] or len(value.encode("utf-8")) < _settings["min_bytes"]:
+        entry._text = value
+        if compressed_before:
+            entry.body = None  # delete-orphan removes the old row
+        return
+    codec, dictionary_id, data = compress(value)
+    body = entry.body if compressed_before else None
+    if body is None:
+        entry.body = JournalEntryBody(codec=codec, dictionary_id=dictionary_id, data=data)
+    else:
+        body.codec, body.dictionary_id, body.data = codec, dictionary_id, data
+    entry._text = ""
+
+
+def with_bodies(query):
+    """Eager-load bodies for a query whose entries will all be serialized (one extra SELECT)."""
+    from models import JournalEntry
+    return query.options(selectinload(JournalEntry.body))
+
+
+def load_texts(entry_ids: Iterable[int]) -> Dict[int, str]:
+    """Decompressed text for those of `entry_ids` that have a body; pass only ids with empty inline text."""
+    entry_ids = list(entry_ids)
+    if not entry_ids:
+        return {}
+    from models import db, JournalEntryBody
+    rows = db.session.query(JournalEntryBody).filter(JournalEntryBody.entry_id.in_(entry_ids)).all()
+    return {row.entry_id: row.text for row in rows}
+
+
+def delete_bodies(entry_ids: Iterable[int]) -> None:
+    """Delete the bodies of `entry_ids`; pass only ids with empty inline text."""
+    entry_ids = list(entry_ids)
+    if not entry_ids:
+        return
+    from models import db, JournalEntryBody
+    db.session.execute(JournalEntryBody.__table__.delete().where(JournalEntryBody.entry_id.in_(entry_ids)))
+
+
+def _delete_body(mapper, connection, target):
+    # The bodies table has no foreign key (journal_entries may be partitioned), so clean up here
+    if not target._text:
+        from models import JournalEntryBody
+        table = JournalEntryBody.__table__
+        connection.execute(table.delete().where(table.c.entry_id == target.id))
+
+
+# ------------------------------------------------------------- dictionary ---
+
+def _heuristic_dictionary(samples: List[bytes], size: int) -> bytes:
+    """Raw-content dictionary of the most frequent words, most frequent last (deflate favours recent bytes)."""
+    counts = Counter(word for sample in samples for word in sample.split())
+    words, used = [], 0
+    for word, count in counts.most_common():
+        if count < 2 or used + len(word) + 1 > size:
+            break
+        words.append(word)
+        used += len(word) + 1
+    return b" ".join(reversed(words)) + b" "
+
+
+def train(sample_limit: Optional[int] = None, size: Optional[int] = None):
+    """Train a dictionary from the newest entries, store it and make it current; returns the row."""
+    from models import db, JournalEntry, TextDictionary
+
+    sample_limit = sample_limit or _settings["samples"]
+    size = size or _settings["dictionary_size"]
+    rows = db.session.query(JournalEntry.id, JournalEntry.text).order_by(
+        JournalEntry.id.desc()).limit(sample_limit).all()
+    bodies = load_texts(entry_id for entry_id, text in rows if not text)
+    samples = [(text or bodies.get(entry_id, "")).encode("utf-8") for entry_id, text in rows]
+    samples = [s for s in samples if s]
+    if not samples:
+        raise RuntimeError("No journal entries to train a dictionary from")
+
+    kind = "raw"
+    data = None
+    if zstandard is not None:
+        try:
+            data = zstandard.train_dictionary(size, samples).as_bytes()
+            kind = "zstd"
+        except zstandard.ZstdError as e:
+            logger.warning(f"zstd dictionary training failed ({e}); using a word-frequency dictionary")
+    if data is None:
+        data = _heuristic_dictionary(samples, size)
+
+    row = TextDictionary(kind=kind, data=data, sample_count=len(samples))
+    db.session.add(row)
+    db.session.commit()
+    _dictionaries[row.id] = row.data
+    _state["dictionary_id"] = row.id
+    logger.info(f"Trained {kind} text dictionary {row.id}: {len(data)} bytes from {len(samples)} entries")
+    return row
+
+
+# -------------------------------------------------------------- migration ---
+
+def migrate(batch_size: int = 1000, log=print) -> int:
+    """Compress existing inline text into bodies, one transaction per batch; returns rows converted.
+
+    Workers keep serving edits meanwhile, so the inline text is only cleared
+    where it still equals what was compressed; an entry edited in between
+    keeps its new text and gets no body. Entries that already have a body
+    (left by an interrupted run or an older write path) are skipped.
+    """
+    from models import db, JournalEntry, JournalEntryBody
+
+    if not _settings["enabled"]:
+        raise RuntimeError("TEXT_COMPRESSION_ENABLED is off; enable it (and restart the workers) before migrating")
+    entries = JournalEntry.__table__
+    bodies_table = JournalEntryBody.__table__
+    has_body = exists().where(bodies_table.c.entry_id == entries.c.id)
+    clear = entries.update().where(entries.c.id == bindparam("b_id"), entries.c.text == bindparam("b_text")) \
+        .values(text="")
+    converted, skipped, changed, last_id = 0, 0, 0, 0
+    while True:
+        rows = db.session.execute(
+            select(entries.c.id, entries.c.text, has_body.label("has_body"))
+            .where(entries.c.id > last_id, func.length(entries.c.text) >= _settings["min_bytes"])
+            .order_by(entries.c.id).limit(batch_size)).all()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        pending = {entry_id: text for entry_id, text, present in rows if not present}
+        skipped += len(rows) - len(pending)
+        bodies = {}
+        for entry_id, text in pending.items():
+            codec, dictionary_id, data = compress(text)
+            bodies[entry_id] = {"entry_id": entry_id, "codec": codec, "dictionary_id": dictionary_id, "data": data}
+        if pending:
+            db.session.execute(clear, [{"b_id": entry_id, "b_text": text} for entry_id, text in pending.items()])
+            # Cleared by this transaction: empty now, and no body yet (an edit that compressed wrote one)
+            cleared = db.session.execute(
+                select(entries.c.id).where(entries.c.id.in_(list(pending)), entries.c.text == "", ~has_body)
+            ).scalars().all()
+            changed += len(pending) - len(cleared)
+            if cleared:
+                db.session.execute(bodies_table.insert(), [bodies[entry_id] for entry_id in cleared])
+            converted += len(cleared)
+        db.session.commit()
+        log(f"Compressed {converted} entries (up to id {last_id})")
+    _metrics["migrate_skipped"] += skipped
+    _metrics["migrate_changed"] += changed
+    if skipped or changed:
+        log(f"Skipped {skipped} entries that already had a body and {changed} edited during the migration")
+    return converted
+
+
+def inline(batch_size: int = 1000, log=print) -> int:
+    """Move every body back into journal_entries.text; returns rows converted."""
+    from models import db, JournalEntry, JournalEntryBody
+
+    entries = JournalEntry.__table__
+    restore = entries.update().where(entries.c.id == bindparam("b_id")).values(text=bindparam("b_text"))
+    converted = 0
+    while True:
+        bodies = db.session.query(JournalEntryBody).order_by(JournalEntryBody.entry_id).limit(batch_size).all()
+        if not bodies:
+            break
+        db.session.execute(restore, [{"b_id": b.entry_id, "b_text": b.text} for b in bodies])
+        db.session.execute(JournalEntryBody.__table__.delete().where(
+            JournalEntryBody.entry_id.in_([b.entry_id for b in bodies])))
+        db.session.commit()
+        db.session.expunge_all()
+        converted += len(bodies)
+        log(f"Restored {converted} entries")
+    return converted
+
+
+def stats() -> Dict:
+    ratio = _metrics["stored_bytes"] / _metrics["raw_bytes"] if _metrics["raw_bytes"] else None
+    return {
+        **_metrics,
+        "enabled": _settings["enabled"],
+        "codec": available_codec(),
+        "dictionary_id": _state["dictionary_id"],
+        "compression_ratio": round(ratio, 3) if ratio is not None else None,
+    }
+
+
+def init_app(app) -> None:
+    """Load the current dictionary; call after the schema exists."""
+    from models import db, JournalEntry, TextDictionary
+
+    cfg = app.config
+    _settings["enabled"] = cfg.get("TEXT_COMPRESSION_ENABLED", False)
+    _settings["level"] = cfg.get("TEXT_COMPRESSION_LEVEL", 3)
+    _settings["min_bytes"] = cfg.get("TEXT_COMPRESSION_MIN_BYTES", 256)
+    _settings["dictionary_size"] = cfg.get("TEXT_DICTIONARY_SIZE", 32768)
+    _settings["samples"] = cfg.get("TEXT_DICTIONARY_SAMPLES", 10000)
+    if not event.contains(JournalEntry, "after_delete", _delete_body):
+        event.listen(JournalEntry, "after_delete", _delete_body)
+
+    with app.app_context():
+        try:
+            _state["dictionary_id"] = db.session.query(func.max(TextDictionary.id)).scalar()
+        except Exception as e:
+            logger.error(f"Text store initialization failed: {e}")
+            db.session.rollback()
+        finally:
+            db.session.remove()
+    if _settings["enabled"]:
+        logger.info(f"Text compression enabled ({available_codec()}, dictionary {_state['dictionary_id']})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compressed journal text storage")
+    parser.add_argument("command", choices=("train", "migrate", "inline"))
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--samples", type=int, help="entries to train on (default: TEXT_DICTIONARY_SAMPLES)")
+    args = parser.parse_args()
+
+    import os
+    os.environ.setdefault("BACKGROUND_JOBS_ENABLED", "false")
+    from app import app
+    from utils import textstore  # the instance init_app configured, not this __main__ copy
+
+    with app.app_context():
+        if args.command == "train":
+            textstore.train(args.samples)
+        elif args.command == "migrate":
+            if not textstore._settings["enabled"]:
+                print("TEXT_COMPRESSION_ENABLED is off; enable it (and restart the workers) before migrating")
+                return
+            if textstore._state["dictionary_id"] is None:
+                print("No dictionary trained yet; training one first")
+                textstore.train(args.samples)
+            print(f"Compressed {textstore.migrate(args.batch_size)} entries")
+        else:
+            print(f"Restored {textstore.inline(args.batch_size)} entries")
+
+
+if __name__ == "__main__":
+    main()
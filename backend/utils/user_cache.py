@@ -0,0 +1,111 @@
+"""Per-process cache of serialized users for profile reads (/auth/profile, /auth/me).
+
+Changes committed through this process drop its entry at once. Other
+worker processes keep serving their copy until it expires, so
+USER_CACHE_TTL is the staleness bound across workers; keep it short.
+Nothing that decides access (login, deactivation, token revocation)
+reads from this cache.
+"""
+import logging
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import db, User
+
+logger = logging.getLogger(__name__)
+
+_entries: "OrderedDict[str, tuple]" = OrderedDict()
+_lock = Lock()
+_settings = {"ttl": 30.0, "max_size": 10000}
+_counters = {"hits": 0, "misses": 0, "invalidations": 0, "evictions": 0}
+
+
+def init_app(app) -> None:
+    _settings["ttl"] = app.config.get("USER_CACHE_TTL", 30.0)
+    _settings["max_size"] = app.config.get("USER_CACHE_MAX_SIZE", 10000)
+
+
+def get_user(user_id) -> Optional[Dict]:
+    """Return the serialized user for a JWT identity, hitting the DB only on a miss.
+
+    Values are `User.to_dict()` snapshots, never ORM instances, so they are safe
+    to share across requests and sessions.
+    """
+    key = str(user_id)
+    now = time.monotonic()
+    with _lock:
+        cached = _entries.get(key)
+        if cached is not None and cached[0] > now:
+            _entries.move_to_end(key)
+            _counters["hits"] += 1
+            return cached[1]
+        _counters["misses"] += 1
+
+    user = db.session.get(User, int(key))
+    if user is None:
+        return None
+
+    data = user.to_dict()
+    with _lock:
+        _entries[key] = (now + _settings["ttl"], data)
+        _entries.move_to_end(key)
+        while len(_entries) > _settings["max_size"]:
+            _entries.popitem(last=False)
+            _counters["evictions"] += 1
+    return data
+
+
+def invalidate(user_id) -> None:
+    with _lock:
+        if _entries.pop(str(user_id), None) is not None:
+            _counters["invalidations"] += 1
+
+
+def clear() -> None:
+    with _lock:
+        _entries.clear()
+
+
+def stats() -> Dict:
+    with _lock:
+        lookups = _counters["hits"] + _counters["misses"]
+        return {
+            **_counters,
+            "size": len(_entries),
+            "max_size": _settings["max_size"],
+            "ttl_seconds": _settings["ttl"],
+            "hit_rate": round(_counters["hits"] / lookups, 4) if lookups else 0.0,
+        }
+
+
+# Any committed change to a user row (login updating last_login, password
+# resets, deactivation) drops the cached snapshot. Ids are collected at flush
+# time and invalidated both then and after commit, so a concurrent miss cannot
+# re-cache the pre-commit row for a full TTL.
+def _track_user_change(mapper, connection, target):
+    if target.id is None:
+        return
+    invalidate(target.id)
+    session = Session.object_session(target)
+    if session is not None:
+        session.info.setdefault("user_cache_dirty", set()).add(target.id)
+
+
+event.listen(User, "after_update", _track_user_change)
+event.listen(User, "after_delete", _track_user_change)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session):
+    for user_id in session.info.pop("user_cache_dirty", ()):
+        invalidate(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_dirty(session):
+    session.info.pop("user_cache_dirty", None)
@@ -0,0 +1,593 @@
+"""Per-user vector index for "entries like this one" (/journal/similar/<id>).
+
+Each user's entries are embedded at write time and appended to one file,
+<VECTOR_INDEX_DIR>/<user_id>.vec. The file is a flat array of records:
+an int64 entry id followed by an L2-normalised float16 vector. Searches
+memory-map the file and score every vector with one matrix-vector product
+(cosine similarity). A 10k-entry user is about 10 MB on disk.
+
+NumPy converts float16 slowly (~25 ms for 10k x 512 here), so each process keeps
+float32 copies of recently searched users' vectors, up to VECTOR_CACHE_MB.
+A copy is converted once and extended by only the appended rows, which
+leaves a warm search at about a millisecond and a half.
+
+Edits and deletes overwrite the old record's id with -1 (a tombstone);
+edits then append the new vector. A file is rewritten without its
+tombstones once they make up more than half of it.
+
+EMBEDDING_BACKEND chooses the vector space:
+  transformer  the in-process sentiment model's last hidden layer, mean-pooled,
+               so paraphrases land close together. It runs only when an
+               inference slot is free (utils/admission.py); entries written
+               under load are added by the backfill.
+  hashed       signed feature hashing of word 1-2 grams into EMBEDDING_DIM
+               buckets. Cheap and always available, but lexical: it finds
+               entries sharing words and phrases, not paraphrases.
+  auto         (default) the backend an existing index was built with; for a
+               new index or a full --rebuild, transformer when transformers
+               and torch are installed and the model runs in-process (no
+               SENTIMENT_SOCKET), otherwise the hashed fallback.
+
+The transformer's dimension is its hidden size, known only once the model
+is loaded, so it is taken from _meta.json at startup and checked against
+the model on the first embedding. NumPy and the model load on first use,
+keeping both off the `import app` path (benchmarks/import_time.py).
+
+Deleting a User deletes their vector file once the delete commits.
+
+The backend and dimension are recorded in _meta.json. After changing
+either, the index is stale until `python -m utils.vector_index backfill
+--rebuild`; until then, writes are skipped and searches fail.
+
+    python -m utils.vector_index backfill            # index entries missing from the files
+    python -m utils.vector_index backfill --rebuild  # re-embed everything
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import object_session
+
+from models import db, JournalEntry, User
+from utils import admission, entry_records, metrics, sentiment
+from utils.read_replica import RoutingSession
+
+try:
+    import fcntl
+except ImportError:  # Windows: in-process locking only
+    fcntl = None
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_TOKEN = re.compile(r"(?u)\b\w\w+\b")
+_STOP_WORDS = frozenset((
+    "the", "and", "for", "that", "this", "with", "was", "but", "are", "not", "have", "had", "has", "you",
+    "all", "its", "it's", "just", "about", "from", "they", "them", "then", "than", "there", "were", "been",
+    "our", "out", "into", "over", "some", "what", "when", "which", "who", "would", "could", "very", "too",
+    "also", "again", "after", "before", "because", "while", "did", "does", "got", "get", "she", "him", "her",
+))
+
+_settings = {
+    "enabled": True,
+    "dir": "",
+    "backend": "hashed",
+    "auto": False,
+    "preferred": "hashed",  # what EMBEDDING_BACKEND=auto picks for a new index
+    "hashed_dim": 512,
+    "dim": 512,
+    "cache_bytes": 256 * 1024 * 1024,
+}
+_metrics = {
+    "searches": 0,
+    "cache_hits": 0,
+    "writes": 0,
+    "skipped_writes": 0,
+    "compactions": 0,
+}
+_state = {"stale": False}
+_dim_lock = threading.Lock()
+
+_locks: Dict[int, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+# user_id -> ((st_dev, st_ino), float32 matrix); most recently used last
+_cache: "OrderedDict[int, Tuple[Tuple[int, int], np.ndarray]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+class IndexUnavailable(Exception):
+    """Raised when the index is disabled or was built with a different embedding backend."""
+
+
+# --------------------------------------------------------------- embedding ---
+
+def _embed_hashed(texts: Sequence[str]) -> "np.ndarray":
+    import numpy as np
+
+    dim = _settings["dim"]
+    out = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        tokens = [t for t in _TOKEN.findall(text[:4096].lower()) if t not in _STOP_WORDS]
+        grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        for gram in grams:
+            h = zlib.crc32(gram.encode("utf-8"))
+            out[row, h % dim] += 1.0 if h & 0x80000000 else -1.0
+    return out
+
+
+def _embed_transformer(texts: Sequence[str]) -> "np.ndarray":
+    import numpy as np
+    import torch
+
+    nlp = sentiment._load_pipeline()
+    if nlp is None:
+        raise IndexUnavailable("Transformer unavailable for embeddings")
+    encoded = nlp.tokenizer([t[:4096] for t in texts], truncation=True, padding=True, return_tensors="pt")
+    with torch.no_grad():
+        hidden = nlp.model(**encoded, output_hidden_states=True).hidden_states[-1]
+    mask = encoded["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+    vectors = ((hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)).numpy().astype(np.float32)
+    if vectors.shape[1] != _dim():
+        _state["stale"] = True
+        logger.warning(f"The model's hidden size is {vectors.shape[1]} but the index holds {_settings['dim']}-d "
+                       f"vectors; similarity search is off until `python -m utils.vector_index backfill --rebuild`")
+        raise IndexUnavailable("Similarity index was built with another model; run the backfill")
+    return vectors
+
+
+def embed(texts: Sequence[str]) -> "np.ndarray":
+    """L2-normalised float32 vectors for `texts` with the configured backend."""
+    import numpy as np
+
+    started = time.perf_counter()
+    vectors = _embed_transformer(texts) if _settings["backend"] == "transformer" else _embed_hashed(texts)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors /= np.where(norms > 0, norms, 1.0)
+    metrics.observe("vector_embed_seconds", time.perf_counter() - started, backend=_settings["backend"])
+    return vectors
+
+
+def _transformer_dim() -> Optional[int]:
+    nlp = sentiment._load_pipeline()
+    return nlp.model.config.hidden_size if nlp is not None else None
+
+
+def _dim() -> int:
+    """Vector dimension; the transformer's comes from _meta.json, or from loading the model before the first index."""
+    if _settings["dim"] is None:
+        with _dim_lock:
+            if _settings["dim"] is None:
+                dim = _transformer_dim()
+                if dim is None:
+                    raise IndexUnavailable("Transformer unavailable for embeddings")
+                _settings["dim"] = dim
+                if not os.path.exists(_meta_path()):
+                    _write_meta()
+    return _settings["dim"]
+
+
+# ------------------------------------------------------------------ files ---
+
+def _record_dtype(dim: int) -> "np.dtype":
+    import numpy as np
+
+    return np.dtype([("id", "<i8"), ("v", "<f2", (dim,))])
+
+
+def _path(user_id: int) -> str:
+    return os.path.join(_settings["dir"], f"{int(user_id)}.vec")
+
+
+def _meta_path() -> str:
+    return os.path.join(_settings["dir"], "_meta.json")
+
+
+def _user_lock(user_id: int) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(int(user_id), threading.Lock())
+
+
+class _Locked:
+    """In-process lock plus an flock on the user's file, so other workers' writes do not interleave."""
+
+    def __init__(self, user_id: int):
+        self.lock = _user_lock(user_id)
+        self.path = _path(user_id)
+        self.handle = None
+
+    def __enter__(self):
+        self.lock.acquire()
+        if fcntl is not None:
+            self.handle = open(self.path + ".lock", "a")
+            fcntl.flock(self.handle, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self.handle is not None:
+            fcntl.flock(self.handle, fcntl.LOCK_UN)
+            self.handle.close()
+        self.lock.release()
+
+
+def _open(user_id: int, mode: str = "r") -> Optional["np.memmap"]:
+    import numpy as np
+
+    dtype = _record_dtype(_dim())
+    try:
+        count = os.path.getsize(_path(user_id)) // dtype.itemsize
+    except OSError:
+        return None
+    if count == 0:
+        return None
+    return np.memmap(_path(user_id), dtype=dtype, mode=mode, shape=(count,))
+
+
+def _tombstone(user_id: int, entry_id: int) -> int:
+    """Mark the records of `entry_id` deleted (caller holds the lock); returns how many were live."""
+    import numpy as np
+
+    records = _open(user_id, "r+")
+    if records is None:
+        return 0
+    rows = np.flatnonzero(records["id"] == entry_id)
+    if rows.size:
+        records["id"][rows] = -1
+        records.flush()
+    return int(rows.size)
+
+
+def _append(user_id: int, ids: Sequence[int], vectors: "np.ndarray") -> None:
+    """Append records in a single write (caller holds the lock)."""
+    import numpy as np
+
+    batch = np.empty(len(ids), dtype=_record_dtype(_dim()))
+    batch["id"] = ids
+    batch["v"] = vectors.astype(np.float16)
+    with open(_path(user_id), "ab") as f:
+        f.write(batch.tobytes())
+
+
+def _maybe_compact(user_id: int) -> None:
+    """Rewrite the file without tombstones once they are the majority (caller holds the lock)."""
+    import numpy as np
+
+    records = _open(user_id)
+    if records is None:
+        return
+    live = records["id"] >= 0
+    if live.sum() * 2 >= len(records):
+        return
+    tmp = _path(user_id) + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(np.ascontiguousarray(records[live]).tobytes())
+    del records
+    os.replace(tmp, _path(user_id))  # open memmaps keep reading the old file
+    _metrics["compactions"] += 1
+
+
+def _writable() -> bool:
+    if not _settings["enabled"] or _state["stale"]:
+        _metrics["skipped_writes"] += 1
+        return False
+    return True
+
+
+# ------------------------------------------------------------------ public ---
+
+def _store(user_id: int, entry_id: int, vectors: "np.ndarray") -> bool:
+    """Replace the entry's record with `vectors` (one row). Never raises."""
+    try:
+        with _Locked(user_id):
+            _tombstone(user_id, entry_id)
+            _append(user_id, [entry_id], vectors)
+            _maybe_compact(user_id)
+        _metrics["writes"] += 1
+        metrics.inc("vector_index_writes_total", op="add")
+        return True
+    except Exception as e:
+        logger.warning(f"Indexing entry {entry_id} failed: {e}")
+        return False
+
+
+def add(user_id: int, entry_id: int, text: str) -> bool:
+    """Index (or re-index after an edit) one entry. Never raises; False when it was skipped."""
+    if not _writable():
+        return False
+    try:
+        if _settings["backend"] == "transformer":
+            vectors = admission.run_if_idle(embed, [text])
+            if vectors is None:
+                _metrics["skipped_writes"] += 1  # the backfill picks it up
+                return False
+        else:
+            vectors = embed([text])
+    except Exception as e:
+        logger.warning(f"Indexing entry {entry_id} failed: {e}")
+        return False
+    return _store(user_id, entry_id, vectors)
+
+
+def remove(user_id: int, entry_id: int) -> None:
+    if not _settings["enabled"]:
+        return
+    try:
+        with _Locked(user_id):
+            if _tombstone(user_id, entry_id):
+                _maybe_compact(user_id)
+        metrics.inc("vector_index_writes_total", op="remove")
+    except Exception as e:
+        logger.warning(f"Removing entry {entry_id} from the index failed: {e}")
+
+
+def _file_id(user_id: int) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(_path(user_id))
+    except OSError:
+        return None
+    return st.st_dev, st.st_ino
+
+
+def _vectors(user_id: int) -> Optional[Tuple["np.ndarray", "np.ndarray"]]:
+    """(ids, float32 vectors) for the user, from the cache where the file has only grown since."""
+    import numpy as np
+
+    user_id = int(user_id)
+    file_id = _file_id(user_id)
+    records = _open(user_id)
+    if records is None:
+        return None
+    ids = np.array(records["id"])
+    with _cache_lock:
+        cached = _cache.pop(user_id, None)
+    if cached is not None and cached[0] == file_id and len(cached[1]) <= len(records):
+        matrix = cached[1]
+        if len(matrix) < len(records):
+            matrix = np.concatenate([matrix, records["v"][len(matrix):].astype(np.float32)])
+        else:
+            _metrics["cache_hits"] += 1
+    else:
+        matrix = records["v"].astype(np.float32)
+    if file_id is None or _file_id(user_id) != file_id:
+        return ids, matrix  # compacted while we read it: use this copy once, do not cache it
+
+    with _cache_lock:
+        _cache[user_id] = (file_id, matrix)
+        total = sum(m.nbytes for _, m in _cache.values())
+        while total > _settings["cache_bytes"] and len(_cache) > 1:
+            total -= _cache.popitem(last=False)[1][1].nbytes
+    return ids, matrix
+
+
+def _top_k(ids: "np.ndarray", matrix: "np.ndarray", vector: "np.ndarray", k: int,
+           exclude: Iterable[int]) -> List[Tuple[int, float]]:
+    import numpy as np
+
+    scores = matrix @ vector.astype(np.float32)
+    scores[ids < 0] = -np.inf
+    for entry_id in exclude:
+        scores[ids == entry_id] = -np.inf
+    k = min(k, len(scores))
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top])]
+    # Nothing in common (or excluded) is not "similar"
+    return [(int(ids[i]), float(scores[i])) for i in top if scores[i] > 0]
+
+
+def search(user_id: int, vector: "np.ndarray", k: int, exclude: Iterable[int] = ()) -> List[Tuple[int, float]]:
+    """Top-k (entry_id, cosine similarity) for `vector` among the user's indexed entries."""
+    started = time.perf_counter()
+    loaded = _vectors(user_id)
+    if loaded is None or k <= 0:
+        return []
+    results = _top_k(*loaded, vector, k, exclude)
+    _metrics["searches"] += 1
+    metrics.observe("vector_search_seconds", time.perf_counter() - started)
+    return results
+
+
+def similar(user_id: int, entry_id: int, text: str, k: int = 10) -> List[Tuple[int, float]]:
+    """Entries most similar to `entry_id` (which is excluded). Indexes the entry first if it is missing."""
+    import numpy as np
+
+    if not _settings["enabled"]:
+        raise IndexUnavailable("Similarity search is disabled")
+    if _state["stale"]:
+        raise IndexUnavailable("Similarity index was built with another embedding backend; run the backfill")
+    started = time.perf_counter()
+    loaded = _vectors(user_id)
+    rows = np.flatnonzero(loaded[0] == entry_id) if loaded is not None else []
+    if not len(rows):
+        # Embedded once: indexed for next time, and searched with now
+        vectors = embed([text])
+        if _writable():
+            _store(user_id, entry_id, vectors)
+        return search(user_id, vectors[0], k, exclude=(entry_id,))
+    results = _top_k(*loaded, loaded[1][rows[-1]], k, (entry_id,)) if k > 0 else []
+    _metrics["searches"] += 1
+    metrics.observe("vector_search_seconds", time.perf_counter() - started)
+    return results
+
+
+def backfill(user_id: Optional[int] = None, rebuild: bool = False, batch_size: int = 256, log=print) -> int:
+    """Embed entries that are not in the index yet (everything, with `rebuild`); returns how many."""
+    os.makedirs(_settings["dir"], exist_ok=True)
+    if rebuild:
+        for name in os.listdir(_settings["dir"]):
+            if name.endswith((".vec", ".tmp")) and (user_id is None or name == f"{int(user_id)}.vec"):
+                os.remove(os.path.join(_settings["dir"], name))
+        if user_id is None:
+            if _settings["auto"]:
+                _settings["backend"] = _settings["preferred"]
+                _settings["dim"] = _settings["hashed_dim"]
+            if _settings["backend"] == "transformer":
+                _settings["dim"] = None  # re-read from the model, which may not be the one the old files used
+            _write_meta()
+    elif _state["stale"]:
+        raise IndexUnavailable("The index was built with another embedding backend; pass --rebuild")
+
+    table = JournalEntry.__table__
+    if user_id is None:
+        users = db.session.execute(select(table.c.user_id).distinct().order_by(table.c.user_id)).scalars().all()
+    else:
+        users = [int(user_id)]
+
+    total = 0
+    for uid in users:
+        records = _open(uid)
+        indexed = set(records["id"].tolist()) if records is not None else set()
+        del records
+        stmt = entry_records.entry_select(table.c.user_id == uid).order_by(table.c.id)
+        pending = [(r.id, r.text) for r in entry_records.fetch(stmt) if r.id not in indexed and r.text]
+        for start in range(0, len(pending), batch_size):
+            chunk = pending[start:start + batch_size]
+            vectors = embed([text for _, text in chunk])
+            with _Locked(uid):
+                _append(uid, [entry_id for entry_id, _ in chunk], vectors)
+            total += len(chunk)
+        if pending:
+            log(f"User {uid}: indexed {len(pending)} entries")
+    metrics.inc("vector_index_writes_total", total, op="backfill")
+    return total
+
+
+def _write_meta() -> None:
+    with open(_meta_path(), "w") as f:
+        json.dump({"backend": _settings["backend"], "dim": _dim()}, f)
+    _state["stale"] = False
+
+
+def _check_meta() -> None:
+    """Mark the index stale if it was built with another backend or dimension; adopt it if new."""
+    os.makedirs(_settings["dir"], exist_ok=True)
+    try:
+        with open(_meta_path()) as f:
+            meta = json.load(f)
+    except FileNotFoundError:
+        if _settings["dim"] is not None:
+            _write_meta()  # otherwise once the model gives the transformer's dimension (_dim)
+        return
+    if _settings["dim"] is None and meta.get("backend") == _settings["backend"]:
+        _settings["dim"] = meta["dim"]  # the model's hidden size, checked against it on the first embedding
+    _state["stale"] = meta != {"backend": _settings["backend"], "dim": _settings["dim"]}
+    if _state["stale"]:
+        logger.warning(f"Vector index at {_settings['dir']} was built with {meta}; similarity search is off "
+                       f"until `python -m utils.vector_index backfill --rebuild`")
+
+
+def stats() -> Dict:
+    with _cache_lock:
+        cached = sum(m.nbytes for _, m in _cache.values())
+    return {**_metrics, **_state, "enabled": _settings["enabled"], "backend": _settings["backend"],
+            "dim": _settings["dim"], "cache_users": len(_cache), "cache_mb": round(cached / 1048576, 1)}
+
+
+def drop_user(user_id: int) -> None:
+    """Delete a user's vector file and this process's cached copy."""
+    user_id = int(user_id)
+    with _Locked(user_id):
+        for path in (_path(user_id), _path(user_id) + ".tmp"):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+    try:
+        os.remove(_path(user_id) + ".lock")
+    except FileNotFoundError:
+        pass
+    with _cache_lock:
+        _cache.pop(user_id, None)
+
+
+def _user_deleted(mapper, connection, target):
+    # The files go once the delete commits; a rollback keeps them
+    object_session(target).info.setdefault("vector_index_dropped_users", set()).add(target.id)
+
+
+def _drop_deleted_users(session):
+    for user_id in session.info.pop("vector_index_dropped_users", ()):
+        try:
+            drop_user(user_id)
+        except OSError as e:
+            logger.warning(f"Deleting the vector file of user {user_id} failed: {e}")
+
+
+def _keep_deleted_users(session):
+    session.info.pop("vector_index_dropped_users", None)
+
+
+def _preferred_backend(cfg) -> str:
+    """transformer when the model can run in-process; found without importing it."""
+    from importlib.util import find_spec
+
+    if cfg.get("SENTIMENT_SOCKET") or find_spec("transformers") is None or find_spec("torch") is None:
+        return "hashed"
+    return "transformer"
+
+
+def _stored_backend() -> Optional[str]:
+    try:
+        with open(_meta_path()) as f:
+            return json.load(f).get("backend")
+    except (OSError, ValueError):
+        return None
+
+
+def init_app(app) -> None:
+    cfg = app.config
+    _settings["enabled"] = cfg.get("VECTOR_INDEX_ENABLED", True)
+    _settings["dir"] = cfg.get("VECTOR_INDEX_DIR") or os.path.join(app.instance_path, "vectors")
+    _settings["hashed_dim"] = _settings["dim"] = cfg.get("EMBEDDING_DIM", 512)
+    _settings["cache_bytes"] = cfg.get("VECTOR_CACHE_MB", 256) * 1024 * 1024
+    backend = cfg.get("EMBEDDING_BACKEND", "auto")
+    _settings["auto"] = backend == "auto"
+    _settings["preferred"] = _preferred_backend(cfg) if _settings["auto"] else backend
+    _settings["backend"] = (_stored_backend() or _settings["preferred"]) if _settings["auto"] else backend
+    if not event.contains(User, "after_delete", _user_deleted):
+        event.listen(User, "after_delete", _user_deleted)
+        event.listen(RoutingSession, "after_commit", _drop_deleted_users)
+        event.listen(RoutingSession, "after_rollback", _keep_deleted_users)
+    if not _settings["enabled"]:
+        return
+    if _settings["backend"] == "transformer":
+        _settings["dim"] = None  # the model's hidden size: from _meta.json, or the model on first use
+    try:
+        _check_meta()
+    except OSError as e:
+        logger.error(f"Vector index directory unusable ({e}); similarity search is off")
+        _settings["enabled"] = False
+
+
+metrics.describe("vector_embed_seconds", "histogram", "Time to embed texts for the vector index")
+metrics.describe("vector_search_seconds", "histogram", "Brute-force similarity search latency")
+metrics.describe("vector_index_writes_total", "counter", "Vector index records written or tombstoned")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Similar-entry vector index")
+    parser.add_argument("command", choices=("backfill",))
+    parser.add_argument("--rebuild", action="store_true", help="drop the index files and re-embed every entry")
+    parser.add_argument("--user", type=int, help="only this user")
+    parser.add_argument("--batch", type=int, default=256)
+    args = parser.parse_args()
+
+    os.environ.setdefault("BACKGROUND_JOBS_ENABLED", "false")
+    from app import app
+    from utils import vector_index  # the instance init_app configured, not this __main__ copy
+
+    with app.app_context():
+        print(f"Indexed {vector_index.backfill(args.user, args.rebuild, args.batch)} entries")
+
+
+if __name__ == "__main__":
+    main()
@@ -42,7 +42,17 @@ class MentalHealthAPI {
             config.headers['Authorization'] = `Bearer ${freshToken}`;
         }
 
+        // Echo the time of our last write so reads right after it skip a lagging read replica
+        const lastWrite = localStorage.getItem('lastWrite');
+        if (lastWrite) {
+            config.headers['X-Last-Write'] = lastWrite;
+        }
+
         const response = await fetch(url, config);
+        const wroteAt = response.headers.get('X-Last-Write');
+        if (wroteAt) {
+            localStorage.setItem('lastWrite', wroteAt);
+        }
         if (!response.ok) {
             let message = response.statusText;
             try {
@@ -104,6 +114,7 @@ class MentalHealthAPI {
         localStorage.removeItem('userEmail');
         localStorage.removeItem('userName');
         localStorage.removeItem('userType');
+        localStorage.removeItem('lastWrite');
     }
 
     // Check authentication and redirect if needed